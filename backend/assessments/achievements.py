@@ -0,0 +1,168 @@
+"""
+Achievement rule engine.
+
+Badges are declared once below as Rule rows and indexed by the event that can
+earn them. Rules are evaluated against ProgressSnapshots built for a whole
+batch of users with one GROUP BY query, so the same code serves the per-save
+signal (a batch of one) and the award_achievements backfill (thousands of
+users per chunk, a handful of queries each).
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db.models import Count
+
+from .catalog import get_catalog
+from .models import Achievement, UserAchievement, UserProgress
+
+MILESTONE_COMPLETED = 'milestone_completed'
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    One badge. `title` and `description` may use {path}; a per_path rule is
+    evaluated once for every path the user has progress in.
+    """
+    key: str
+    trigger: str
+    title: str
+    description: str
+    badge_icon: str
+    points: int
+    min_completed: int
+    per_path: bool = False
+
+
+RULES = (
+    Rule(
+        key='first_step', trigger=MILESTONE_COMPLETED,
+        title="First Step Taken",
+        description="You've successfully completed your first roadmap milestone!",
+        badge_icon="Award", points=50, min_completed=1,
+    ),
+    Rule(
+        key='path_specialist', trigger=MILESTONE_COMPLETED,
+        title="{path} Specialist",
+        description="Mastered 3 core milestones in {path}.",
+        badge_icon="ShieldCheck", points=150, min_completed=3, per_path=True,
+    ),
+)
+
+RULES_BY_KEY = {rule.key: rule for rule in RULES}
+RULES_BY_TRIGGER = {}
+for _rule in RULES:
+    RULES_BY_TRIGGER.setdefault(_rule.trigger, []).append(_rule)
+RULES_BY_TRIGGER = {trigger: tuple(rules) for trigger, rules in RULES_BY_TRIGGER.items()}
+
+
+@dataclass
+class ProgressSnapshot:
+    """What the rules can see of one user: completed milestones per path."""
+    user_id: object
+    completed_by_path: dict = field(default_factory=dict)
+
+    @property
+    def completed(self):
+        return sum(self.completed_by_path.values())
+
+
+def build_snapshots(user_ids):
+    """{user_id: ProgressSnapshot} for a batch of users, in one query."""
+    snapshots = {user_id: ProgressSnapshot(user_id) for user_id in user_ids}
+    rows = (
+        UserProgress.objects.filter(user_id__in=snapshots, status='COMPLETED')
+        .values_list('user_id', 'milestone__path_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for user_id, path_id, n in rows:
+        snapshots[user_id].completed_by_path[path_id] = n
+    return snapshots
+
+
+def select_rules(trigger=None, keys=None):
+    """Rules for a trigger (all of them if None), optionally narrowed to some keys."""
+    rules = RULES_BY_TRIGGER.get(trigger, ()) if trigger else RULES
+    if keys:
+        unknown = set(keys) - set(RULES_BY_KEY)
+        if unknown:
+            raise ValueError(f"Unknown achievement rules: {', '.join(sorted(unknown))}")
+        rules = tuple(rule for rule in rules if rule.key in keys)
+    return rules
+
+
+def evaluate(rule, snapshot, catalog):
+    """Yields (title, description) for every badge `rule` grants this snapshot."""
+    if not rule.per_path:
+        if snapshot.completed >= rule.min_completed:
+            yield rule.title, rule.description
+        return
+    for path_id, completed in snapshot.completed_by_path.items():
+        path = catalog.paths_by_id.get(path_id)
+        if path and completed >= rule.min_completed:
+            yield rule.title.format(path=path.title), rule.description.format(path=path.title)
+
+
+def _achievements_for(specs):
+    """{title: Achievement}, creating the badges nobody has earned before."""
+    achievements = {a.title: a for a in Achievement.objects.filter(title__in=specs)}
+    for title, (rule, description) in specs.items():
+        if title not in achievements:
+            achievements[title], _ = Achievement.objects.get_or_create(title=title, defaults={
+                "description": description,
+                "badge_icon": rule.badge_icon,
+                "points": rule.points,
+            })
+    return achievements
+
+
+def award(user_ids, trigger=None, keys=None, dry_run=False):
+    """
+    Evaluates the rules for a batch of users and inserts the badges they don't
+    hold yet. Returns {user_id: [Achievement]} of what was newly earned.
+
+    Uses bulk_create, so the per-row XP signal does not fire; callers grant
+    the points (see check_user and the award_achievements command).
+    """
+    rules = select_rules(trigger, keys)
+    if not rules or not user_ids:
+        return {}
+
+    catalog = get_catalog()
+    earned = defaultdict(set)
+    specs = {}
+    for user_id, snapshot in build_snapshots(user_ids).items():
+        for rule in rules:
+            for title, description in evaluate(rule, snapshot, catalog):
+                earned[user_id].add(title)
+                specs.setdefault(title, (rule, description))
+    if not specs:
+        return {}
+
+    achievements = _achievements_for(specs)
+    held = set(UserAchievement.objects.filter(
+        user_id__in=earned, achievement__in=achievements.values()
+    ).values_list('user_id', 'achievement_id'))
+
+    new = defaultdict(list)
+    for user_id, titles in earned.items():
+        for title in sorted(titles):
+            achievement = achievements[title]
+            if (user_id, achievement.id) not in held:
+                new[user_id].append(achievement)
+
+    if not dry_run:
+        UserAchievement.objects.bulk_create(
+            [UserAchievement(user_id=user_id, achievement=a) for user_id, badges in new.items() for a in badges],
+            batch_size=2000, ignore_conflicts=True,
+        )
+    return dict(new)
+
+
+def check_user(user, trigger=MILESTONE_COMPLETED):
+    """Per-event entry point: awards what `trigger` can earn and grants the XP on `user`."""
+    badges = award([user.id], trigger).get(user.id, [])
+    for achievement in badges:
+        user.add_xp(achievement.points, 'badge', achievement.id)
+    return badges
@@ -1,25 +1,25 @@
-from openai import OpenAI
-from django.conf import settings
+from .llm import get_provider, async_slot, sync_slot
+from .mentor_cache import mentor_cache
+from .models import ChatMessage, ChatSummary
+from .prompting import HISTORY_WINDOW, build_prompt, prompt_metrics, summarize_turns
+
+# Backlog turns read per query when catching the summary up
+SUMMARY_BATCH = 200
 
 class CareerMentorService:
     @staticmethod
-    def get_response(user, user_message, chat_history, roadmap_data):
-        # Professional practice: ensure key exists
-        api_key = getattr(settings, "OPENAI_API_KEY", None)
-        if not api_key:
-            raise ValueError("OpenAI API Key not found in settings.")
-
-        client = OpenAI(api_key=api_key)
-        
+    def top_trait(user):
         # Safe extraction of trait to prevent 500 errors
         result = user.assessmentresult_set.first()
-        top_trait = result.top_trait if result else "General Tech"
-        
+        return result.top_trait if result else "General Tech"
+
+    @staticmethod
+    def build_system_prompt(top_trait, roadmap_data):
         # Context from roadmap
         path_title = roadmap_data.get('title', 'Exploration')
         milestones = [m['title'] for m in roadmap_data.get('milestones', [])]
 
-        system_prompt = f"""
+        return f"""
         You are an expert Tech Career Mentor. 
         User Trait: {top_trait}.
         Career Path: {path_title}.
@@ -29,15 +29,91 @@ class CareerMentorService:
         If 'Artistic', focus on UI/UX and creativity. Use Markdown for code blocks.
         """
 
-        messages = [{"role": "system", "content": system_prompt}]
-        for msg in chat_history:
-            messages.append({"role": msg.role, "content": msg.content})
-        messages.append({"role": "user", "content": user_message})
+    @staticmethod
+    def load_history(user):
+        """
+        (summary, recent turns not yet folded into it, oldest first).
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
\ No newline at end of file
+        Turns older than the window that the summary doesn't cover yet are
+        folded into it first, so nothing between covered_until and the window
+        is skipped when the mark moves.
+        """
+        summary = ChatSummary.objects.filter(user=user).first()
+        covered_until = summary.covered_until if summary else 0
+        history = list(reversed(
+            ChatMessage.objects.filter(user=user, id__gt=covered_until).order_by('-created_at', '-id')[:HISTORY_WINDOW]
+        ))
+        # A short window means there is no backlog behind it
+        if len(history) < HISTORY_WINDOW:
+            return summary, history
+
+        summary_text = summary.content if summary else ""
+        last_id = covered_until
+        while True:
+            batch = list(
+                ChatMessage.objects.filter(user=user, id__gt=last_id, id__lt=history[0].id).order_by('id')[:SUMMARY_BATCH]
+            )
+            if not batch:
+                break
+            summary_text = summarize_turns(summary_text, batch)
+            last_id = batch[-1].id
+
+        if last_id != covered_until:
+            summary, _ = ChatSummary.objects.update_or_create(
+                user=user, defaults={"content": summary_text, "covered_until": last_id}
+            )
+        return summary, history
+
+    @staticmethod
+    def prepare(user, user_message, roadmap_data):
+        """
+        Shared by the sync view, the async view and the streaming socket.
+        Returns (messages, cache_key, cached_response, prompt_stats); on a cache
+        hit cached_response is set and no completion is needed at all.
+        """
+        summary, history = CareerMentorService.load_history(user)
+        top_trait = CareerMentorService.top_trait(user)
+        summary_text = summary.content if summary else ""
+        cache_key = mentor_cache.key_for(top_trait, roadmap_data, user_message, history, summary_text)
+        cached = mentor_cache.get(cache_key)
+        if cached is not None:
+            return None, cache_key, cached, None
+
+        system_prompt = CareerMentorService.build_system_prompt(top_trait, roadmap_data)
+        messages, overflow, stats = build_prompt(system_prompt, history, user_message, summary_text)
+
+        # Turns that fell out of the budget go into the stored summary
+        # instead of disappearing; this prompt already has room reserved for it.
+        if overflow:
+            summary_text = summarize_turns(summary_text, overflow)
+            ChatSummary.objects.update_or_create(
+                user=user, defaults={"content": summary_text, "covered_until": overflow[-1].id}
+            )
+            messages, _, stats = build_prompt(system_prompt, history[len(overflow):], user_message, summary_text)
+            stats["turns_summarized"] = len(overflow)
+
+        prompt_metrics.record(stats)
+        return messages, cache_key, None, stats
+
+    @staticmethod
+    def get_response(user, user_message, roadmap_data):
+        messages, cache_key, cached, _ = CareerMentorService.prepare(user, user_message, roadmap_data)
+        if cached is not None:
+            return cached
+        return CareerMentorService.complete(messages, cache_key)
+
+    @staticmethod
+    def complete(messages, cache_key=None):
+        # The slot bounds concurrent upstream calls, whatever the provider
+        with sync_slot():
+            content = get_provider().complete(messages)
+        mentor_cache.set(cache_key, content)
+        return content
+
+    @staticmethod
+    async def aget_response(messages, cache_key=None):
+        """Async counterpart of complete; takes the output of prepare()."""
+        async with async_slot():
+            content = await get_provider().acomplete(messages)
+        mentor_cache.set(cache_key, content)
+        return content
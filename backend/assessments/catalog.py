@@ -0,0 +1,245 @@
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CareerPath, Milestone, LearningResource
+
+RIASEC_CODES = ('R', 'I', 'A', 'S', 'E', 'C')
+CATALOG_VERSION_KEY = "catalog:version"
+# Weight of the second letter when a path's profile is derived from trait_type
+DERIVED_SECONDARY_WEIGHT = 0.5
+MATCH_TOP_K = getattr(settings, 'PATH_MATCH_TOP_K', 3)
+
+
+@dataclass(frozen=True)
+class ResourceEntry:
+    id: int
+    milestone_id: int
+    title: str
+    url: str
+    category: str
+    resource_type: str
+    trait_alignment: str
+
+    def to_dict(self):
+        # Same shape as LearningResourceSerializer
+        return {
+            "id": self.id, "title": self.title, "url": self.url, "category": self.category,
+            "resource_type": self.resource_type, "trait_alignment": self.trait_alignment,
+        }
+
+
+@dataclass(frozen=True)
+class MilestoneEntry:
+    id: int
+    path_id: int
+    title: str
+    order: int
+    resources: tuple
+
+    def to_dict(self):
+        # Same shape as MilestoneSerializer
+        return {
+            "id": self.id, "path": self.path_id, "title": self.title, "order": self.order,
+            "resources": [r.to_dict() for r in self.resources],
+        }
+
+
+@dataclass(frozen=True)
+class PathEntry:
+    id: int
+    trait_type: str
+    title: str
+    description: str
+    duration: str
+    milestones: tuple
+    # Unit-length RIASEC vector (R, I, A, S, E, C); all zeros if the path has none
+    profile: tuple
+    # CareerPath.profile as stored ({} when derived from trait_type), for the admin API
+    raw_profile: MappingProxyType
+
+    @property
+    def milestone_ids(self):
+        return tuple(m.id for m in self.milestones)
+
+    @property
+    def resources(self):
+        return tuple(r for m in self.milestones for r in m.resources)
+
+    def to_dict(self):
+        # Same shape as CareerPathSerializer
+        return {
+            "id": self.id, "title": self.title, "trait_type": self.trait_type, "duration": self.duration,
+            "profile": dict(self.raw_profile), "milestones": [m.to_dict() for m in self.milestones],
+        }
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Read-only snapshot of every CareerPath -> Milestone -> LearningResource.
+    Built once per process and swapped whole when the catalog version moves.
+    """
+    version: object
+    paths: tuple
+    paths_by_id: MappingProxyType
+    paths_by_trait: MappingProxyType
+    milestones_by_id: MappingProxyType
+    # Every blended RIASEC code ("RI", "AA", ...) -> PathEntry or None
+    resolution: MappingProxyType
+    # paths x 6 matrix of the unit profiles, row i is paths[i]
+    profiles: np.ndarray
+
+    def resolve(self, trait_code):
+        """Blended code -> path: exact match first, then the primary letter."""
+        if not trait_code:
+            return None
+        if trait_code in self.resolution:
+            return self.resolution[trait_code]
+        return self.paths_by_trait.get(trait_code) or self.paths_by_trait.get(trait_code[0])
+
+    def nearest(self, scores, k=MATCH_TOP_K):
+        """
+        Ranks paths by cosine similarity to a {"R": 10, ...} score dict.
+        Returns up to k (PathEntry, similarity) pairs, best first; ties keep path id order.
+        """
+        user = np.array([float((scores or {}).get(code) or 0) for code in RIASEC_CODES])
+        norm = np.linalg.norm(user)
+        if not norm or not self.paths:
+            return []
+        similarity = self.profiles @ (user / norm)
+        order = np.argsort(-similarity, kind='stable')[:k]
+        return [(self.paths[i], float(similarity[i])) for i in order if similarity[i] > 0]
+
+    def match(self, trait_code, scores):
+        """The user's path: exact blended code first, then the nearest profile, then resolve()."""
+        if trait_code in self.paths_by_trait:
+            return self.paths_by_trait[trait_code]
+        ranked = self.nearest(scores, k=1)
+        return ranked[0][0] if ranked else self.resolve(trait_code)
+
+    def path_for_milestone(self, milestone_id):
+        milestone = self.milestones_by_id.get(milestone_id)
+        return self.paths_by_id.get(milestone.path_id) if milestone else None
+
+
+def _profile_vector(trait_type, profile):
+    """Unit-length vector from an explicit profile, else from the trait code's letters."""
+    if profile:
+        vector = np.array([float(profile.get(code) or 0) for code in RIASEC_CODES])
+    else:
+        vector = np.zeros(len(RIASEC_CODES))
+        for position, letter in enumerate(trait_type[:2]):
+            if letter in RIASEC_CODES:
+                vector[RIASEC_CODES.index(letter)] += 1.0 if position == 0 else DERIVED_SECONDARY_WEIGHT
+    norm = np.linalg.norm(vector)
+    return tuple(vector / norm) if norm else tuple(vector)
+
+
+def _build_catalog(version):
+    # Three flat queries for the whole tree
+    resources_by_milestone = {}
+    for r in LearningResource.objects.filter(milestone__isnull=False).order_by('id'):
+        resources_by_milestone.setdefault(r.milestone_id, []).append(ResourceEntry(
+            id=r.id, milestone_id=r.milestone_id, title=r.title, url=r.url,
+            category=r.category, resource_type=r.resource_type, trait_alignment=r.trait_alignment,
+        ))
+
+    milestones_by_path = {}
+    milestones_by_id = {}
+    for m in Milestone.objects.order_by('order', 'id'):
+        entry = MilestoneEntry(
+            id=m.id, path_id=m.path_id, title=m.title, order=m.order,
+            resources=tuple(resources_by_milestone.get(m.id, ())),
+        )
+        milestones_by_path.setdefault(m.path_id, []).append(entry)
+        milestones_by_id[m.id] = entry
+
+    paths = tuple(
+        PathEntry(
+            id=p.id, trait_type=p.trait_type, title=p.title, description=p.description,
+            duration=p.duration, milestones=tuple(milestones_by_path.get(p.id, ())),
+            profile=_profile_vector(p.trait_type, p.profile),
+            raw_profile=MappingProxyType(dict(p.profile or {})),
+        )
+        for p in CareerPath.objects.order_by('id')
+    )
+    paths_by_trait = {p.trait_type: p for p in paths}
+
+    # Precompute all 36 ordered pairs so lookups never fall back at request time
+    resolution = {}
+    for primary in RIASEC_CODES:
+        for secondary in RIASEC_CODES:
+            code = primary + secondary
+            resolution[code] = paths_by_trait.get(code) or paths_by_trait.get(primary)
+
+    return Catalog(
+        version=version,
+        paths=paths,
+        paths_by_id=MappingProxyType({p.id: p for p in paths}),
+        paths_by_trait=MappingProxyType(paths_by_trait),
+        milestones_by_id=MappingProxyType(milestones_by_id),
+        resolution=MappingProxyType(resolution),
+        profiles=np.array([p.profile for p in paths], dtype=np.float64).reshape(-1, len(RIASEC_CODES)),
+    )
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_catalog_version():
+    return cache.get(CATALOG_VERSION_KEY)
+
+
+def get_catalog():
+    """
+    Returns the process-wide Catalog, reloading it only when another
+    worker (or this one) has bumped the shared catalog version.
+    """
+    global _catalog
+    version = get_catalog_version()
+    current = _catalog
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = _build_catalog(version)
+        return _catalog
+
+
+def bump_version(key):
+    # Seeded with a timestamp so an evicted counter never comes back as an old value
+    if not cache.add(key, time.time_ns(), timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_version_now_and_on_commit(key):
+    # Bump immediately so this process sees its own write, and again after
+    # commit so another worker can't cache pre-commit rows under the new version.
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def bump_versions_now_and_on_commit(keys):
+    # Bulk form for batch writers: a fresh timestamp is newer than any counter
+    # seeded above, so one set_many retires every key without a per-key incr.
+    keys = list(keys)
+    if not keys:
+        return
+    cache.set_many({key: time.time_ns() for key in keys}, timeout=None)
+    transaction.on_commit(lambda: cache.set_many({key: time.time_ns() for key in keys}, timeout=None))
+
+
+def invalidate_catalog():
+    """Call after any CareerPath / Milestone / LearningResource write."""
+    bump_version_now_and_on_commit(CATALOG_VERSION_KEY)
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import logging
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .ai_service import CareerMentorService
+from .llm import async_slot, get_provider
+from .mentor_cache import mentor_cache
+from .models import ChatMessage
+from .roadmap import get_user_roadmap_context
+
+logger = logging.getLogger(__name__)
+
+
+class MentorStreamConsumer(AsyncWebsocketConsumer):
+    """
+    Streaming version of ChatWithMentorView.
+
+    Client frames: {"type": "ask", "message": "..."} and {"type": "cancel"}.
+    Server frames: start, token {"content"}, done {"response"}, cancelled, error.
+    The ChatMessage pair is stored only when a stream finishes; a cancelled
+    or disconnected stream leaves no history behind.
+    """
+
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.stream_task = None
+        if self.user.is_authenticated:
+            await self.accept()
+        else:
+            await self.close()
+
+    async def disconnect(self, close_code):
+        # Stop generating for a client that is no longer listening
+        if self.stream_task is not None:
+            self.stream_task.cancel()
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+
+        if data.get('type') == 'cancel':
+            if self.stream_task is not None:
+                self.stream_task.cancel()
+            return
+
+        if data.get('type') != 'ask' or not data.get('message'):
+            return
+        if self.stream_task is not None:
+            await self.send_json({"type": "error", "error": "A response is already streaming."})
+            return
+
+        prepared = await self.prepare(data['message'])
+        if prepared is None:
+            await self.send_json({"type": "error", "error": "Please complete assessment."})
+            return
+        self.stream_task = asyncio.create_task(self.run_stream(data['message'], *prepared))
+
+    async def run_stream(self, user_message, messages, cache_key, cached, prompt_stats):
+        tokens = []
+        try:
+            await self.send_json({"type": "start"})
+            if cached is not None:
+                # Cache hit: the whole answer goes out as one token
+                tokens.append(cached)
+                await self.send_json({"type": "token", "content": cached})
+            else:
+                async with async_slot():
+                    async for token in get_provider().stream(messages):
+                        tokens.append(token)
+                        await self.send_json({"type": "token", "content": token})
+
+            response = "".join(tokens)
+            mentor_cache.set(cache_key, response)
+            await self.save_exchange(user_message, response)
+            await self.send_json({"type": "done", "response": response})
+        except asyncio.CancelledError:
+            await self.send_json({"type": "cancelled"})
+        except Exception as e:
+            logger.exception("Mentor stream failed")
+            if "insufficient_quota" in str(e):
+                await self.send_json({"type": "error", "error": "I'm currently recharging (OpenAI Quota)."})
+            else:
+                await self.send_json({"type": "error", "error": "Mentor service unavailable."})
+        finally:
+            self.stream_task = None
+
+    async def send_json(self, content):
+        try:
+            await self.send(text_data=json.dumps(content))
+        except Exception:
+            # Socket already gone (cancel on disconnect); nothing to tell
+            pass
+
+    @database_sync_to_async
+    def prepare(self, user_message):
+        roadmap_data = get_user_roadmap_context(self.user)
+        if not roadmap_data:
+            return None
+        return CareerMentorService.prepare(self.user, user_message, roadmap_data)
+
+    @database_sync_to_async
+    def save_exchange(self, user_message, response):
+        ChatMessage.objects.bulk_create([
+            ChatMessage(user=self.user, role='user', content=user_message),
+            ChatMessage(user=self.user, role='assistant', content=response),
+        ])
@@ -0,0 +1,161 @@
+"""
+Bulk cohort ingestion: many (user, answers) rows in one request.
+
+Rows are parsed straight off the request stream (JSON lines or CSV), users are
+resolved in a few IN queries, everything is scored in one vectorised pass and
+inserted with bulk_create. Each input row gets a status entry in the report.
+"""
+import csv
+import json
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AssessmentResult, Question
+from .roadmap import invalidate_user_roadmaps
+from .services import RIASECService, TYPE_INDEX
+
+MAX_ROWS = getattr(settings, 'BULK_ASSESSMENT_MAX_ROWS', 20000)
+LOOKUP_CHUNK = 2000
+INSERT_BATCH = 1000
+
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+class IngestError(ValueError):
+    """The upload as a whole is unusable (as opposed to a bad row)."""
+
+
+def _lines(stream):
+    for raw in stream:
+        yield raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+
+
+def _check_answers(answers):
+    if not isinstance(answers, list) or not answers:
+        return "answers must be a non-empty list"
+    for answer in answers:
+        if not isinstance(answer, dict) or answer.get('type') not in TYPE_INDEX:
+            return "each answer needs a type of R, I, A, S, E or C"
+        value = answer.get('value', 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return "answer values must be numbers"
+    return None
+
+
+def parse_jsonl(stream):
+    """Yields (line, user, answers, error) for {"user": ..., "answers": [...]} lines."""
+    for line_no, line in enumerate(_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, None, "invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, None, "expected an object"
+            continue
+        user, answers = row.get('user'), row.get('answers')
+        yield line_no, user, answers, _check_answers(answers) or (None if user else "user is required")
+
+
+def _column_types(header):
+    """CSV columns after `user` are RIASEC letters or Question ids."""
+    question_types = dict(Question.objects.values_list('id', 'riasec_type'))
+    types = []
+    for cell in header[1:]:
+        cell = cell.strip()
+        if cell.upper() in TYPE_INDEX:
+            types.append(cell.upper())
+        elif cell.isdigit() and int(cell) in question_types:
+            types.append(question_types[int(cell)])
+        else:
+            raise IngestError(f"Unknown CSV column '{cell}': use R/I/A/S/E/C or a question id")
+    return types
+
+
+def parse_csv(stream):
+    """Yields (line, user, answers, error) for a `user,<col>,<col>...` CSV."""
+    reader = csv.reader(_lines(stream))
+    header = next(reader, None)
+    if not header or header[0].strip().lower() != 'user':
+        raise IngestError("CSV must start with a header whose first column is 'user'")
+    types = _column_types(header)
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        line_no = reader.line_num
+        if len(row) != len(header):
+            yield line_no, None, None, f"expected {len(header)} columns, got {len(row)}"
+            continue
+        try:
+            answers = [{"type": t, "value": float(v) if '.' in v else int(v)} for t, v in zip(types, row[1:]) if v.strip()]
+        except ValueError:
+            yield line_no, row[0], None, "answer values must be numbers"
+            continue
+        yield line_no, row[0].strip(), answers, _check_answers(answers) or (None if row[0].strip() else "user is required")
+
+
+def _resolve_users(identifiers):
+    """Maps each identifier (email, username or id) to a user id, a few queries per 2000."""
+    User = get_user_model()
+    identifiers = list({str(i) for i in identifiers})
+    found = {}
+    for start in range(0, len(identifiers), LOOKUP_CHUNK):
+        chunk = identifiers[start:start + LOOKUP_CHUNK]
+        ids = []
+        for ident in chunk:
+            try:
+                ids.append(uuid.UUID(ident))
+            except ValueError:
+                pass
+        rows = User.objects.filter(Q(email__in=chunk) | Q(username__in=chunk) | Q(id__in=ids)).values_list('id', 'email', 'username')
+        for user_id, email, username in rows:
+            for key in (str(user_id), email, username):
+                found.setdefault(key, user_id)
+    return found
+
+
+def ingest(stream, content_type):
+    """Parses, scores and inserts an upload; returns the per-row report."""
+    parser = parse_csv if content_type.split(';')[0].strip() in CSV_TYPES else parse_jsonl
+    report, pending = [], []
+    for line_no, user, answers, error in parser(stream):
+        if len(report) >= MAX_ROWS:
+            raise IngestError(f"Uploads are limited to {MAX_ROWS} rows")
+        entry = {"line": line_no, "user": user, "status": "error" if error else "created"}
+        if error:
+            entry["error"] = error
+        else:
+            pending.append((entry, answers))
+        report.append(entry)
+
+    user_ids = _resolve_users(entry["user"] for entry, _ in pending)
+    valid = []
+    for entry, answers in pending:
+        user_id = user_ids.get(str(entry["user"]))
+        if user_id is None:
+            entry.update(status="error", error="unknown user")
+        else:
+            valid.append((entry, user_id, answers))
+
+    if valid:
+        types, values = RIASECService.answers_to_arrays([answers for _, _, answers in valid])
+        totals, codes = RIASECService.calculate_scores_batch(types, values)
+        results = []
+        for (entry, user_id, answers), scores, code in zip(valid, RIASECService.scores_to_dicts(totals), codes):
+            entry["code"] = code
+            results.append(AssessmentResult(user_id=user_id, scores=scores, top_trait=code, answers=answers))
+
+        with transaction.atomic():
+            AssessmentResult.objects.bulk_create(results, batch_size=INSERT_BATCH)
+            # bulk_create skips post_save, so retire the roadmap snapshots here
+            invalidate_user_roadmaps(user_id for _, user_id, _ in valid)
+
+    created = len(valid)
+    return {"created": created, "failed": len(report) - created, "rows": report}
@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from django.conf import settings
+from django.utils.module_loading import import_string
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+
+class LLMBusyError(Exception):
+    """Raised when no completion slot frees up within AI_MENTOR_QUEUE_TIMEOUT."""
+
+
+# One pooled client per process (per event loop for the async one: httpx
+# connection pools can't be shared across loops). Built lazily from settings.
+_sync_client = None
+_sync_slots = None
+_async_clients = weakref.WeakKeyDictionary()
+_async_slots = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _client_options():
+    api_key = getattr(settings, "OPENAI_API_KEY", None)
+    if not api_key:
+        raise ValueError("OpenAI API Key not found in settings.")
+    return {
+        "api_key": api_key,
+        "base_url": getattr(settings, "OPENAI_BASE_URL", None),
+        "timeout": httpx.Timeout(
+            getattr(settings, "OPENAI_TIMEOUT", 30.0),
+            connect=getattr(settings, "OPENAI_CONNECT_TIMEOUT", 5.0),
+        ),
+        "max_retries": getattr(settings, "OPENAI_MAX_RETRIES", 2),
+    }
+
+
+def _limits():
+    size = getattr(settings, "OPENAI_MAX_CONNECTIONS", 20)
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size)
+
+
+def _max_concurrency():
+    return getattr(settings, "AI_MENTOR_MAX_CONCURRENCY", 20)
+
+
+def get_client():
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = OpenAI(http_client=DefaultHttpxClient(limits=_limits()), **_client_options())
+    return _sync_client
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(http_client=DefaultAsyncHttpxClient(limits=_limits()), **_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def reset_clients():
+    """Drops the pooled clients so the next call picks up changed settings."""
+    global _sync_client, _sync_slots
+    with _lock:
+        _sync_client = None
+        _sync_slots = None
+        _async_clients.clear()
+        _async_slots.clear()
+
+
+@contextmanager
+def sync_slot():
+    """Caps concurrent blocking completions so a slow upstream can't take every worker thread."""
+    global _sync_slots
+    if _sync_slots is None:
+        with _lock:
+            if _sync_slots is None:
+                _sync_slots = threading.BoundedSemaphore(_max_concurrency())
+    if not _sync_slots.acquire(timeout=getattr(settings, "AI_MENTOR_QUEUE_TIMEOUT", 10)):
+        raise LLMBusyError("Too many mentor requests in flight.")
+    try:
+        yield
+    finally:
+        _sync_slots.release()
+
+
+@asynccontextmanager
+async def async_slot():
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.get(loop)
+    if slots is None:
+        slots = _async_slots[loop] = asyncio.Semaphore(_max_concurrency())
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=getattr(settings, "AI_MENTOR_QUEUE_TIMEOUT", 10))
+    except asyncio.TimeoutError:
+        raise LLMBusyError("Too many mentor requests in flight.")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+class OpenAIProvider:
+    """Chat completions from OpenAI (or anything speaking its API via OPENAI_BASE_URL)."""
+
+    def __init__(self, model=None, temperature=0.7):
+        self.model = model or getattr(settings, 'AI_MENTOR_MODEL', 'gpt-3.5-turbo')
+        self.temperature = temperature
+
+    def complete(self, messages):
+        response = get_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature
+        )
+        return response.choices[0].message.content
+
+    async def acomplete(self, messages):
+        response = await get_async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, messages):
+        stream = await get_async_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True,
+        )
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            # Stops the upstream generation too when our consumer is cancelled
+            await stream.close()
+
+
+class LocalProvider:
+    """
+    Deterministic offline backend for tests, local development and load
+    tests. The reply depends only on the prompt; it takes `latency` seconds
+    to the first token and then streams at `tokens_per_second`.
+    """
+
+    def __init__(self, latency=None, tokens_per_second=None):
+        self.latency = getattr(settings, 'AI_MENTOR_LOCAL_LATENCY', 0.0) if latency is None else latency
+        self.tokens_per_second = tokens_per_second or getattr(settings, 'AI_MENTOR_LOCAL_TOKEN_RATE', 0)
+
+    def reply_for(self, messages):
+        question = " ".join(messages[-1]['content'].split())[:120]
+        return f"Great question. For \"{question}\", start with the next milestone on your roadmap."
+
+    def tokens_for(self, messages):
+        words = self.reply_for(messages).split(" ")
+        return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
+
+    def _duration(self, token_count):
+        return self.latency + (token_count / self.tokens_per_second if self.tokens_per_second else 0)
+
+    def complete(self, messages):
+        tokens = self.tokens_for(messages)
+        time.sleep(self._duration(len(tokens)))
+        return "".join(tokens)
+
+    async def acomplete(self, messages):
+        tokens = self.tokens_for(messages)
+        await asyncio.sleep(self._duration(len(tokens)))
+        return "".join(tokens)
+
+    async def stream(self, messages):
+        await asyncio.sleep(self.latency)
+        gap = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for token in self.tokens_for(messages):
+            await asyncio.sleep(gap)
+            yield token
+
+
+PROVIDERS = {
+    'openai': OpenAIProvider,
+    'local': LocalProvider,
+}
+
+
+def get_provider():
+    """
+    AI_MENTOR_PROVIDER picks the backend: 'openai' (default), 'local', or a
+    dotted path to any class with complete / acomplete / stream.
+    """
+    name = getattr(settings, 'AI_MENTOR_PROVIDER', 'openai')
+    provider_class = PROVIDERS.get(name) or import_string(name)
+    return provider_class()
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from assessments.achievements import award, select_rules
+from assessments.models import UserProgress
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Evaluate the achievement rules for every user with completed milestones and award missing badges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=2000, help='Users evaluated and written per batch')
+        parser.add_argument('--rule', action='append', dest='rules', help='Only this rule key (repeatable), e.g. to backfill a new badge')
+        parser.add_argument('--dry-run', action='store_true', help='Evaluate and report without writing')
+
+    def handle(self, *args, **options):
+        try:
+            rules = select_rules(keys=options['rules'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        keys = [rule.key for rule in rules]
+
+        start = time.perf_counter()
+        completed = UserProgress.objects.filter(status='COMPLETED').order_by('user_id').values_list('user_id', flat=True).distinct()
+        users = badges = 0
+        last_id = None
+
+        # Keyset over users who have completed anything; nobody else can earn a badge
+        while True:
+            page = completed if last_id is None else completed.filter(user_id__gt=last_id)
+            user_ids = list(page[:options['chunk']])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            with transaction.atomic():
+                new = award(user_ids, keys=keys, dry_run=options['dry_run'])
+                if not options['dry_run']:
+                    CustomUser.add_xp_many([
+                        (user_id, a.points, 'badge', a.id) for user_id, earned in new.items() for a in earned
+                    ])
+
+            users += len(user_ids)
+            badges += sum(len(earned) for earned in new.values())
+
+        verb = 'Would award' if options['dry_run'] else 'Awarded'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {badges} badges across {users} users in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from assessments.models import AssessmentResult, CareerPath, Milestone
+from assessments.views import DashboardSummaryView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: DashboardSummaryView latency and query count against a seeded user table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Users to seed')
+        parser.add_argument('--requests', type=int, default=500, help='Dashboard requests to time')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            students = self.seed(options['users'])
+            self.run(students, options['requests'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Seeded rows rolled back (use --keep to retain them).'))
+
+    def seed(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        start = time.perf_counter()
+        users = [
+            User(username=f"bench_user_{i}", email=f"bench_user_{i}@bench.local", password=password,
+                 role='STUDENT', xp_total=random.randint(0, 5000))
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=2000)
+
+        codes = ['RI', 'IA', 'AS', 'SE', 'EC', 'CR']
+        for code in codes:
+            path, _ = CareerPath.objects.get_or_create(trait_type=code, defaults={'title': f"Bench {code}", 'duration': '8 Weeks'})
+            if not path.milestones.exists():
+                Milestone.objects.bulk_create([Milestone(path=path, title=f"Step {n}", order=n) for n in range(6)])
+
+        # Only a sample needs assessments; the point is a realistically sized users table
+        sample = users[:min(count, 2000)]
+        AssessmentResult.objects.bulk_create([
+            AssessmentResult(user=u, top_trait=random.choice(codes), scores={c: random.randint(0, 25) for c in 'RIASEC'})
+            for u in sample
+        ], batch_size=2000)
+        self.stdout.write(f"Seeded {count} users in {time.perf_counter() - start:.1f}s")
+        return sample
+
+    def run(self, students, requests):
+        factory = APIRequestFactory()
+        view = DashboardSummaryView.as_view()
+
+        def hit(user):
+            request = factory.get('/api/v1/assessments/dashboard-summary/')
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                view(request)
+                elapsed = (time.perf_counter() - t0) * 1000
+            return elapsed, len(ctx.captured_queries)
+
+        for label in ('cold', 'warm'):
+            timings, queries = [], []
+            for i in range(requests):
+                elapsed, n = hit(students[i % len(students)])
+                timings.append(elapsed)
+                queries.append(n)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{label:<5} p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms "
+                f"queries/request min={min(queries)} max={max(queries)}"
+            )
@@ -0,0 +1,132 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from assessments.mentor_cache import mentor_cache
+from assessments.models import AssessmentResult, CareerPath, Milestone
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: mentor chat latency (p50/p95/p99) at N concurrent users against the local LLM provider'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Concurrent users')
+        parser.add_argument('--requests', type=int, default=5, help='Chat messages per user')
+        parser.add_argument('--mode', choices=['sync', 'async'], default='sync',
+                            help='sync: /chat/ on a thread per user; async: /chat/async/ on one loop. '
+                                 'Both go through the full handler and middleware stack')
+        parser.add_argument('--latency', type=float, default=0.5, help='Local provider time to first token (s)')
+        parser.add_argument('--rate', type=float, default=50, help='Local provider tokens per second')
+        parser.add_argument('--provider', default='local', help="Provider to drive (default 'local'; 'openai' spends quota)")
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users instead of deleting them')
+
+    def handle(self, *args, **options):
+        # Rows are committed (worker threads use their own connections), so
+        # clean-up is a delete rather than a rollback.
+        users, seeded_path = self.seed(options['users'])
+        mentor_cache.clear()
+        try:
+            with override_settings(
+                AI_MENTOR_PROVIDER=options['provider'],
+                AI_MENTOR_LOCAL_LATENCY=options['latency'],
+                AI_MENTOR_LOCAL_TOKEN_RATE=options['rate'],
+                ALLOWED_HOSTS=['testserver'],
+            ):
+                run = self.run_sync if options['mode'] == 'sync' else self.run_async
+                started = time.perf_counter()
+                timings, errors = run(users, options['requests'])
+                wall = time.perf_counter() - started
+            self.report(options, timings, errors, wall)
+        finally:
+            if not options['keep']:
+                get_user_model().objects.filter(id__in=[u.id for u in users]).delete()
+                if seeded_path is not None:
+                    # Left behind, it would become the exact-code match for every real IR student
+                    seeded_path.delete()
+                self.stdout.write(self.style.WARNING('Seeded users and path deleted (use --keep to retain them).'))
+
+    def seed(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        # Reuse a real IR path when there is one; otherwise seed a throwaway path the clean-up removes
+        path = CareerPath.objects.filter(trait_type='IR').first()
+        seeded_path = None
+        if path is None:
+            path = seeded_path = CareerPath.objects.create(trait_type='IR', title='Bench Data Path', duration='8 Weeks')
+            Milestone.objects.bulk_create([Milestone(path=path, title=f"Step {n}", order=n) for n in range(6)])
+
+        stamp = int(time.time())
+        users = User.objects.bulk_create([
+            User(username=f"bench_chat_{stamp}_{i}", email=f"bench_chat_{stamp}_{i}@bench.local", password=password, role='STUDENT')
+            for i in range(count)
+        ])
+        AssessmentResult.objects.bulk_create([
+            AssessmentResult(user=u, top_trait='IR', scores={'I': 20, 'R': 15}) for u in users
+        ])
+        return users, seeded_path
+
+    def run_sync(self, users, requests):
+        def session(user):
+            # A real request through the WSGI-style handler: middleware, URL routing, JWT auth
+            client = Client()
+            headers = {'Authorization': f"Bearer {AccessToken.for_user(user)}"}
+            timings, errors = [], 0
+            try:
+                for i in range(requests):
+                    # Distinct questions so the answer cache doesn't short-circuit the provider
+                    t0 = time.perf_counter()
+                    response = client.post('/api/v1/assessments/chat/', {'message': f"{user.username} question {i}"},
+                                           content_type='application/json', headers=headers)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                    errors += response.status_code != 200
+            finally:
+                close_old_connections()
+            return timings, errors
+
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            results = list(pool.map(session, users))
+        return [t for timings, _ in results for t in timings], sum(e for _, e in results)
+
+    def run_async(self, users, requests):
+        async def session(user):
+            # The ASGI handler with the whole middleware chain, as Daphne runs it
+            client = AsyncClient()
+            headers = {'Authorization': f"Bearer {AccessToken.for_user(user)}"}
+            timings, errors = [], 0
+            for i in range(requests):
+                t0 = time.perf_counter()
+                response = await client.post('/api/v1/assessments/chat/async/', {'message': f"{user.username} question {i}"},
+                                             content_type='application/json', headers=headers)
+                timings.append((time.perf_counter() - t0) * 1000)
+                errors += response.status_code != 200
+            return timings, errors
+
+        async def main():
+            return await asyncio.gather(*[session(u) for u in users])
+
+        results = asyncio.run(main())
+        return [t for timings, _ in results for t in timings], sum(e for _, e in results)
+
+    def report(self, options, timings, errors, wall):
+        timings.sort()
+        self.stdout.write(
+            f"{options['mode']} users={options['users']} requests={len(timings)} errors={errors} "
+            f"provider={options['provider']} latency={options['latency']}s rate={options['rate']}tok/s"
+        )
+        self.stdout.write(
+            f"p50={statistics.median(timings):.0f}ms p95={percentile(timings, 95):.0f}ms "
+            f"p99={percentile(timings, 99):.0f}ms throughput={len(timings) / wall:.1f} req/s"
+        )
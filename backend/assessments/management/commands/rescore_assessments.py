@@ -0,0 +1,129 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assessments.models import AssessmentResult
+from assessments.roadmap import invalidate_user_roadmaps
+from assessments.services import RIASECService, RIASEC_ORDER
+
+
+class Command(BaseCommand):
+    help = 'Re-score every AssessmentResult with the vectorised RIASEC engine, chunk by chunk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=2000, help='Rows scored and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Score and report without writing')
+        parser.add_argument('--benchmark', action='store_true', help='Also time the per-row calculate_scores loop on each chunk')
+        parser.add_argument('--seed', type=int, default=0, help='Seed N synthetic results first (rolled back afterwards)')
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            self.rescore(options)
+            return
+        with transaction.atomic():
+            self.seed(options['seed'])
+            self.rescore(options)
+            transaction.set_rollback(True)
+            self.stdout.write(self.style.WARNING('Seeded rows rolled back.'))
+
+    def seed(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        users = [
+            User(username=f"rescore_user_{i}", email=f"rescore_user_{i}@bench.local", password=password, role='STUDENT')
+            for i in range(min(count, 500))
+        ]
+        User.objects.bulk_create(users, batch_size=2000)
+        AssessmentResult.objects.bulk_create([
+            AssessmentResult(
+                user=users[i % len(users)], scores={}, top_trait='',
+                answers=[{'type': code, 'value': random.randint(1, 5)} for code in RIASEC_ORDER for _ in range(5)],
+            )
+            for i in range(count)
+        ], batch_size=2000)
+        self.stdout.write(f"Seeded {count} assessment results")
+
+    def rescore(self, options):
+        scanned = changed = 0
+        vector_time = loop_time = 0.0
+        self.kernel_time = 0.0
+        last_pk = None
+
+        # Keyset over the primary key, so no cursor stays open across the writes
+        while True:
+            qs = AssessmentResult.objects.only('id', 'user_id', 'scores', 'top_trait', 'answers').order_by('pk')
+            if last_pk is not None:
+                qs = qs.filter(pk__gt=last_pk)
+            rows = list(qs[:options['chunk']])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            scanned += len(rows)
+
+            start = time.perf_counter()
+            results = self.score_chunk(rows)
+            vector_time += time.perf_counter() - start
+
+            if options['benchmark']:
+                start = time.perf_counter()
+                expected = [self.score_row(row) for row in rows]
+                loop_time += time.perf_counter() - start
+                if expected != results:
+                    self.stderr.write(self.style.ERROR(f"Batch and per-row scores disagree in chunk ending {last_pk}"))
+
+            dirty = []
+            for row, (scores, code) in zip(rows, results):
+                # A trait missing from stored scores already counts as 0, so that alone is no change
+                stored = row.scores or {}
+                if row.top_trait != code or any(stored.get(c, 0) != v for c, v in scores.items()):
+                    row.scores, row.top_trait = scores, code
+                    dirty.append(row)
+            changed += len(dirty)
+
+            if dirty and not options['dry_run']:
+                # bulk_update skips post_save, so retire the roadmap snapshots by hand
+                with transaction.atomic():
+                    AssessmentResult.objects.bulk_update(dirty, ['scores', 'top_trait'])
+                    invalidate_user_roadmaps(row.user_id for row in dirty)
+
+        verb = 'would change' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} results, {verb} {changed}"))
+        if scanned:
+            self.stdout.write(f"Vectorised scoring: {vector_time * 1000:.1f}ms ({scanned / max(vector_time, 1e-9):,.0f} rows/s), "
+                              f"of which {self.kernel_time * 1000:.1f}ms NumPy kernel, the rest JSON packing")
+        if options['benchmark'] and scanned:
+            self.stdout.write(f"Per-row loop:       {loop_time * 1000:.1f}ms ({scanned / max(loop_time, 1e-9):,.0f} rows/s)")
+            self.stdout.write(f"Speed-up: {loop_time / max(vector_time, 1e-9):.1f}x end to end, "
+                              f"{loop_time / max(self.kernel_time, 1e-9):.1f}x kernel only")
+
+    def score_chunk(self, rows):
+        """(scores, code) per row; rows predating stored answers keep their totals and only re-derive the code."""
+        results = [None] * len(rows)
+        with_answers = [i for i, row in enumerate(rows) if row.answers]
+        without = [i for i, row in enumerate(rows) if not row.answers]
+
+        if with_answers:
+            types, values = RIASECService.answers_to_arrays([rows[i].answers for i in with_answers])
+            start = time.perf_counter()
+            totals, codes = RIASECService.calculate_scores_batch(types, values)
+            self.kernel_time += time.perf_counter() - start
+            for i, scores, code in zip(with_answers, RIASECService.scores_to_dicts(totals), codes):
+                results[i] = (scores, code)
+        if without:
+            totals = RIASECService.scores_to_matrix([rows[i].scores or {} for i in without])
+            start = time.perf_counter()
+            codes = RIASECService.codes_from_totals(totals)
+            self.kernel_time += time.perf_counter() - start
+            for i, scores, code in zip(without, RIASECService.scores_to_dicts(totals), codes):
+                results[i] = (scores, code)
+        return results
+
+    @staticmethod
+    def score_row(row):
+        answers = row.answers or [{'type': code, 'value': value} for code, value in (row.scores or {}).items()]
+        totals, _, code = RIASECService.calculate_scores(answers)
+        return totals, code
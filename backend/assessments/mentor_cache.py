@@ -0,0 +1,83 @@
+import hashlib
+import json
+import re
+import threading
+
+from django.conf import settings
+
+from config.lru import TTLCache
+
+# Longer turns are usually pasted code or personal detail: never cached
+MAX_CACHEABLE_CHARS = getattr(settings, 'AI_MENTOR_CACHE_MAX_CHARS', 280)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_PERSONAL_MARKERS = ("```", "http://", "https://", "@")
+
+
+def normalize_message(text):
+    """'What should I learn FIRST??' and 'what should i learn first' share a key."""
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def is_personal(text):
+    text = text or ""
+    return len(text) > MAX_CACHEABLE_CHARS or any(marker in text for marker in _PERSONAL_MARKERS)
+
+
+class MentorResponseCache:
+    """
+    Process-local LRU/TTL cache of mentor answers, keyed by
+    (top_trait, path title, milestone set, normalized message, summary,
+    whole history window) - everything the prompt is built from, so an answer
+    is only ever shared between conversations with identical context.
+
+    key_for() returns None when the exchange is personal; get(None) counts
+    a bypass so the hit rate only reflects cacheable traffic.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._cache = TTLCache(
+            maxsize=maxsize or getattr(settings, 'AI_MENTOR_CACHE_SIZE', 2000),
+            ttl=ttl or getattr(settings, 'AI_MENTOR_CACHE_TTL', 6 * 60 * 60),
+        )
+        self._lock = threading.Lock()
+        self.bypassed = 0
+
+    def key_for(self, top_trait, roadmap_data, user_message, chat_history, summary=""):
+        history = list(chat_history)
+        if is_personal(user_message) or any(m.role == 'user' and is_personal(m.content) for m in history):
+            return None
+
+        raw = json.dumps([
+            top_trait,
+            roadmap_data.get('title', ''),
+            sorted(m['title'] for m in roadmap_data.get('milestones', [])),
+            normalize_message(user_message),
+            summary or "",
+            [(m.role, m.content) for m in history],
+        ])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        return self._cache.get(key)
+
+    def set(self, key, response):
+        if key is not None and response:
+            self._cache.set(key, response)
+
+    def clear(self):
+        self._cache.clear()
+        with self._lock:
+            self.bypassed = 0
+
+    def get_stats(self):
+        return dict(self._cache.stats(), bypassed=self.bypassed)
+
+
+mentor_cache = MentorResponseCache()
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0009_userachievement_is_notified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessmentresult',
+            index=models.Index(fields=['user', '-created_at'], name='assess_user_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0011_chatsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessmentresult',
+            name='answers',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0012_assessmentresult_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='careerpath',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
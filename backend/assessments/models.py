@@ -26,8 +26,16 @@ class AssessmentResult(models.Model):
     # Storing scores like: {"R": 10, "I": 25, "A": 5, ...}
     scores = models.JSONField()
     top_trait = models.CharField(max_length=50)
+    # Raw [{type, value}] answers, kept so rows can be re-scored when the rules change
+    answers = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # "Latest result for a user" is looked up on almost every page
+            models.Index(fields=['user', '-created_at'], name='assess_user_latest_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.top_trait} ({self.created_at.date()})"
 
@@ -69,6 +77,9 @@ class CareerPath(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     duration = models.CharField(max_length=50) # e.g., "12 Weeks"
+    # RIASEC weights used for nearest-path matching, e.g. {"I": 1, "R": 0.6}.
+    # Left empty, the catalog derives one from trait_type.
+    profile = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
         return f"{self.trait_type} - {self.title}"
@@ -107,6 +118,13 @@ class UserProgress(models.Model):
     class Meta:
         unique_together = ('user', 'milestone')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the achievement signal act only on the move to COMPLETED, not on re-saves
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def __str__(self):
         return f"{self.user.username} - {self.milestone.title} ({self.status})"
     
@@ -119,6 +137,17 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+
+
+class ChatSummary(models.Model):
+    """
+    Rolling summary of a user's mentor chat turns that no longer fit the
+    prompt budget. covered_until is the last ChatMessage id folded in.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_summary')
+    content = models.TextField(blank=True)
+    covered_until = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
         
         
 class Achievement(models.Model):
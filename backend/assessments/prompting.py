@@ -0,0 +1,139 @@
+import math
+import re
+import threading
+
+from django.conf import settings
+
+# Whole prompt, in (estimated) tokens, including the reply-less user message
+PROMPT_BUDGET = getattr(settings, 'AI_MENTOR_PROMPT_BUDGET', 2000)
+# Room kept for the rolling summary of turns that no longer fit
+SUMMARY_BUDGET = getattr(settings, 'AI_MENTOR_SUMMARY_BUDGET', 300)
+# No single history turn may take more than this (pasted code, logs...)
+MAX_TURN_TOKENS = getattr(settings, 'AI_MENTOR_MAX_TURN_TOKENS', 400)
+# Unsummarized messages loaded per request; the budget decides how many are sent
+HISTORY_WINDOW = getattr(settings, 'AI_MENTOR_HISTORY_WINDOW', 20)
+
+# Chat format overhead per message (role, separators)
+MESSAGE_OVERHEAD = 4
+TRUNCATION_MARK = " …[truncated]"
+SUMMARY_LINE_CHARS = 120
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+_CODE_BLOCK = re.compile(r"```.*?(?:```|$)", re.S)
+
+
+def count_tokens(text):
+    """
+    Local BPE estimate: each punctuation mark is a token, each word costs one
+    token per ~5 characters. Close enough to budget with, no tokenizer needed.
+    """
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text or ""))
+
+
+def _piece_tokens(piece):
+    return max(1, math.ceil(len(piece) / 5))
+
+
+def message_tokens(content):
+    return MESSAGE_OVERHEAD + count_tokens(content)
+
+
+def truncate_to_tokens(text, limit):
+    used = 0
+    for match in _PIECES.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > limit:
+            return text[:match.start()].rstrip() + TRUNCATION_MARK
+    return text
+
+
+def summarize_turns(summary, turns, limit=SUMMARY_BUDGET):
+    """
+    Folds turns into the running summary: one short line per turn, oldest
+    lines dropped first once the summary outgrows its budget.
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        # Code is what blows budgets; the summary only notes that there was some
+        first_line = " ".join(_CODE_BLOCK.sub(" [code] ", turn.content).split())[:SUMMARY_LINE_CHARS]
+        speaker = "Student" if turn.role == 'user' else "Mentor"
+        lines.append(f"- {speaker}: {first_line}")
+    while lines and count_tokens("\n".join(lines)) > limit:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def build_prompt(system_prompt, history, user_message, summary="", budget=None):
+    """
+    Packs history newest-first into whatever the budget leaves after the
+    system prompt, the summary reserve and the new message.
+
+    Returns (messages, overflow, stats); overflow holds the oldest history
+    turns that didn't fit, for the caller to fold into the summary.
+    """
+    budget = budget or PROMPT_BUDGET
+    system_tokens = message_tokens(system_prompt)
+    user_tokens = message_tokens(user_message)
+    remaining = budget - system_tokens - user_tokens - SUMMARY_BUDGET
+
+    kept, truncated = [], 0
+    cut = len(history)
+    for index in range(len(history) - 1, -1, -1):
+        turn = history[index]
+        content = turn.content
+        if count_tokens(content) > MAX_TURN_TOKENS:
+            content = truncate_to_tokens(content, MAX_TURN_TOKENS)
+            truncated += 1
+        cost = message_tokens(content)
+        if cost > remaining:
+            break
+        remaining -= cost
+        kept.append({"role": turn.role, "content": content})
+        cut = index
+    kept.reverse()
+    overflow = history[:cut]
+
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    messages.extend(kept)
+    messages.append({"role": "user", "content": user_message})
+
+    stats = {
+        "budget": budget,
+        "system_tokens": system_tokens,
+        "summary_tokens": message_tokens(summary) if summary else 0,
+        "history_tokens": sum(message_tokens(m["content"]) for m in kept),
+        "message_tokens": user_tokens,
+        "turns_sent": len(kept),
+        "turns_summarized": len(overflow),
+        "turns_truncated": truncated,
+    }
+    stats["total_tokens"] = (
+        stats["system_tokens"] + stats["summary_tokens"] + stats["history_tokens"] + stats["message_tokens"]
+    )
+    return messages, overflow, stats
+
+
+class PromptMetrics:
+    """Per-worker prompt-size counters, shown in the system health payload."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"prompts": 0, "total_tokens": 0, "max_tokens": 0, "turns_truncated": 0, "turns_summarized": 0}
+
+    def record(self, prompt_stats):
+        with self._lock:
+            self.stats["prompts"] += 1
+            self.stats["total_tokens"] += prompt_stats["total_tokens"]
+            self.stats["max_tokens"] = max(self.stats["max_tokens"], prompt_stats["total_tokens"])
+            self.stats["turns_truncated"] += prompt_stats["turns_truncated"]
+            self.stats["turns_summarized"] += prompt_stats["turns_summarized"]
+
+    def get_stats(self):
+        with self._lock:
+            prompts = self.stats["prompts"]
+            return dict(self.stats, avg_tokens=round(self.stats["total_tokens"] / prompts, 1) if prompts else 0.0)
+
+
+prompt_metrics = PromptMetrics()
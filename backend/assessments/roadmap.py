@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .catalog import get_catalog, bump_version_now_and_on_commit, bump_versions_now_and_on_commit
+from .models import AssessmentResult, UserProgress
+
+# Snapshots are invalidated by version bumps, the TTL is only a memory bound
+SNAPSHOT_TTL = getattr(settings, 'ROADMAP_SNAPSHOT_TTL', 60 * 60)
+
+
+def _user_version_key(user_id):
+    return f"roadmap:user_version:{user_id}"
+
+
+def invalidate_user_roadmap(user_id):
+    """Call after any UserProgress / AssessmentResult write for this user."""
+    bump_version_now_and_on_commit(_user_version_key(user_id))
+
+
+def invalidate_user_roadmaps(user_ids):
+    """Batch form for bulk_create / bulk_update writers, which skip the signals."""
+    bump_versions_now_and_on_commit(_user_version_key(user_id) for user_id in set(user_ids))
+
+
+def build_user_snapshot(user, catalog=None):
+    """Uncached: latest assessment plus the milestone/progress tree for its path."""
+    catalog = catalog or get_catalog()
+    latest_result = AssessmentResult.objects.filter(user=user).order_by('-created_at').first()
+    if not latest_result:
+        return {"assessment": None, "roadmap": None, "matches": []}
+
+    assessment = {"top_trait": latest_result.top_trait, "scores": latest_result.scores}
+    matches = path_matches(catalog, latest_result.scores)
+
+    # Exact blended code, then the nearest path profile to the scores
+    path = catalog.match(latest_result.top_trait, latest_result.scores)
+    if not path:
+        return {"assessment": assessment, "roadmap": None, "matches": matches}
+
+    # Fetch all progress for this user in one hit to avoid querying inside the loop
+    user_progress_map = {
+        p.milestone_id: p for p in UserProgress.objects.filter(user=user, milestone_id__in=path.milestone_ids)
+    }
+
+    milestone_details = []
+    completed_count = 0
+
+    for m in path.milestones:
+        progress = user_progress_map.get(m.id)
+        current_status = progress.status if progress else 'IN_PROGRESS'
+        is_done = (current_status == 'COMPLETED')
+
+        if is_done: completed_count += 1
+
+        milestone_details.append({
+            "id": m.id,
+            "title": m.title,
+            "order": m.order,
+            "status": current_status,
+            "is_completed": is_done,
+            "submission_url": progress.submission_url if progress else None,
+            "feedback": progress.mentor_feedback if progress else None,
+            "resources": [{"title": r.title, "url": r.url, "resource_type": r.resource_type} for r in m.resources]
+        })
+
+    return {
+        "assessment": assessment,
+        "roadmap": {
+            "title": path.title,
+            "duration": path.duration,
+            "milestones": milestone_details,
+            "completion_percentage": (completed_count / len(milestone_details) * 100) if milestone_details else 0
+        },
+        "matches": matches,
+    }
+
+
+def path_matches(catalog, scores):
+    """Top-k paths by profile similarity, in the shape the dashboard and library render."""
+    return [
+        {"id": p.id, "trait_type": p.trait_type, "title": p.title, "duration": p.duration, "similarity": round(similarity, 4)}
+        for p, similarity in catalog.nearest(scores)
+    ]
+
+
+def get_user_snapshot(user, request=None):
+    """
+    Cached, versioned {"assessment", "roadmap", "matches"} for a user.
+
+    A hit costs two cache reads and no SQL. When `request` is given the
+    result is also memoized on it, so several callers in one request share it.
+    """
+    if request is not None and getattr(request, '_roadmap_snapshot', None) is not None:
+        return request._roadmap_snapshot
+
+    catalog = get_catalog()
+    user_version = cache.get(_user_version_key(user.id))
+    snapshot_key = f"roadmap:snapshot:{user.id}:{user_version}:{catalog.version}"
+
+    snapshot = cache.get(snapshot_key)
+    if snapshot is None:
+        snapshot = build_user_snapshot(user, catalog)
+        cache.set(snapshot_key, snapshot, timeout=SNAPSHOT_TTL)
+
+    if request is not None:
+        request._roadmap_snapshot = snapshot
+    return snapshot
+
+
+def get_user_roadmap_context(user, request=None):
+    return get_user_snapshot(user, request)["roadmap"]
@@ -22,7 +22,17 @@ class CareerPathSerializer(serializers.ModelSerializer):
     milestones = MilestoneSerializer(many=True, read_only=True)
     class Meta:
         model = CareerPath
-        fields = ['id', 'title', 'trait_type', 'duration', 'milestones']
+        fields = ['id', 'title', 'trait_type', 'duration', 'profile', 'milestones']
+
+    def validate_profile(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Profile must be an object of RIASEC weights.")
+        for code, weight in value.items():
+            if code not in 'RIASEC' or len(code) != 1:
+                raise serializers.ValidationError(f"Unknown RIASEC code '{code}'.")
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight < 0:
+                raise serializers.ValidationError("Weights must be non-negative numbers.")
+        return value
 
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
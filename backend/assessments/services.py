@@ -1,3 +1,10 @@
+import numpy as np
+
+# Column order of every batch matrix; also the tie-break order of calculate_scores
+RIASEC_ORDER = ('R', 'I', 'A', 'S', 'E', 'C')
+TYPE_INDEX = {code: i for i, code in enumerate(RIASEC_ORDER)}
+
+
 class RIASECService:
     @staticmethod
     def calculate_scores(answers):
@@ -26,4 +33,62 @@ class RIASECService:
         }
         
         # We return the primary trait name for display, and the blended_code for routing
-        return totals, mapping[primary_char], blended_code
\ No newline at end of file
+        return totals, mapping[primary_char], blended_code
+
+    @staticmethod
+    def answers_to_arrays(submissions):
+        """
+        Packs a list of answer lists into (types, values) arrays of shape
+        submissions x questions. Short submissions are padded with type -1,
+        which like an unknown type contributes nothing.
+        """
+        lengths = np.fromiter((len(answers) for answers in submissions), dtype=np.int64, count=len(submissions))
+        width = int(lengths.max()) if len(submissions) else 0
+        # Flatten in plain Python once, then scatter row-major into the padded matrix
+        flat_types = [TYPE_INDEX.get(a.get('type'), -1) for answers in submissions for a in answers]
+        flat_values = [a.get('value', 0) for answers in submissions for a in answers]
+        filled = np.arange(width) < lengths[:, None]
+        types = np.full((len(submissions), width), -1, dtype=np.int8)
+        values = np.zeros((len(submissions), width), dtype=np.float64)
+        types[filled] = flat_types
+        values[filled] = flat_values
+        return types, values
+
+    @staticmethod
+    def calculate_scores_batch(types, values):
+        """
+        Vectorised calculate_scores for many submissions at once.
+        Returns an (n, 6) totals matrix in RIASEC_ORDER plus the blended codes.
+        """
+        types = np.asarray(types)
+        values = np.asarray(values, dtype=np.float64)
+        rows = types.shape[0]
+        valid = types >= 0
+
+        # One bincount over (row * 6 + type) sums every trait of every submission
+        flat = (np.arange(rows)[:, None] * len(RIASEC_ORDER) + types)[valid]
+        totals = np.bincount(flat, weights=values[valid], minlength=rows * len(RIASEC_ORDER))
+        totals = totals.reshape(rows, len(RIASEC_ORDER))
+        return totals, RIASECService.codes_from_totals(totals)
+
+    @staticmethod
+    def codes_from_totals(totals):
+        """Blended codes for an (n, 6) totals matrix, ties broken like calculate_scores."""
+        # Stable argsort on the negated totals keeps R, I, A, S, E, C order for ties,
+        # exactly what sorted(..., reverse=True) does in the per-row path
+        order = np.argsort(-np.asarray(totals), axis=1, kind='stable')[:, :2]
+        letters = np.array(RIASEC_ORDER)[order]
+        return np.char.add(letters[:, 0], letters[:, 1]).tolist()
+
+    @staticmethod
+    def scores_to_dicts(totals):
+        """Totals matrix back to the {"R": 10, ...} shape stored on AssessmentResult."""
+        totals = np.asarray(totals)
+        if np.array_equal(totals, np.round(totals)):
+            totals = totals.astype(np.int64)
+        return [dict(zip(RIASEC_ORDER, row)) for row in totals.tolist()]
+
+    @staticmethod
+    def scores_to_matrix(scores):
+        """Stored score dicts to an (n, 6) totals matrix; missing traits count as 0."""
+        return np.array([[s.get(code, 0) for code in RIASEC_ORDER] for s in scores], dtype=np.float64).reshape(-1, len(RIASEC_ORDER))
@@ -1,54 +1,47 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import UserProgress, Achievement, UserAchievement
+from .models import (
+    UserProgress, UserAchievement,
+    AssessmentResult, CareerPath, Milestone, LearningResource
+)
+from .achievements import MILESTONE_COMPLETED, check_user
+from .roadmap import invalidate_user_roadmap
+from .catalog import invalidate_catalog
 
 @receiver(post_save, sender=UserProgress)
-def check_for_achievements(sender, instance, **kwargs):
-    # Only trigger if the milestone was JUST marked as COMPLETED
-    if instance.status == 'COMPLETED':
-        print(f"DEBUG: Awarding badge to {instance.user.username}")
-        user = instance.user
-        
-        # LOGIC 1: The "First Milestone" Badge
-        first_step_badge, _ = Achievement.objects.get_or_create(
-            title="First Step Taken",
-            defaults={
-                "description": "You've successfully completed your first roadmap milestone!",
-                "badge_icon": "Award",
-                "points": 50
-            }
-        )
-        UserAchievement.objects.get_or_create(user=user, achievement=first_step_badge)
-
-        # LOGIC 2: Path-Specific Badges (e.g., Infrastructure Specialist)
-        # Check if they've completed 3 milestones in the same path
-        completed_count = UserProgress.objects.filter(
-            user=user, 
-            status='COMPLETED', 
-            milestone__path=instance.milestone.path
-        ).count()
-
-        if completed_count >= 3:
-            specialist_badge, _ = Achievement.objects.get_or_create(
-                title=f"{instance.milestone.path.title} Specialist",
-                defaults={
-                    "description": f"Mastered 3 core milestones in {instance.milestone.path.title}.",
-                    "badge_icon": "ShieldCheck",
-                    "points": 150
-                }
-            )
-            UserAchievement.objects.get_or_create(user=user, achievement=specialist_badge)
+def check_for_achievements(sender, instance, created, **kwargs):
+    # Only on the move to COMPLETED; re-saving a completed row can't earn anything new
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if instance.status == 'COMPLETED' and previous != 'COMPLETED':
+        check_user(instance.user, MILESTONE_COMPLETED)
             
             
 @receiver(post_save, sender=UserProgress)
 def award_xp_on_completion(sender, instance, **kwargs):
     if instance.status == 'COMPLETED':
-        # Award 100 XP for every milestone completed
-        instance.user.add_xp(100)
+        # Award 100 XP for every milestone completed; the ledger makes re-saves a no-op
+        instance.user.add_xp(100, 'milestone', instance.milestone_id)
         
         
 @receiver(post_save, sender=UserAchievement)
 def award_xp_for_badge(sender, instance, created, **kwargs):
     if created:
         # Award the specific points defined in the Achievement model
-        instance.user.add_xp(instance.achievement.points)
\ No newline at end of file
+        instance.user.add_xp(instance.achievement.points, 'badge', instance.achievement_id)
+
+
+# --- Catalog / roadmap snapshot invalidation (see assessments.catalog, assessments.roadmap) ---
+
+@receiver([post_save, post_delete], sender=UserProgress)
+@receiver([post_save, post_delete], sender=AssessmentResult)
+def invalidate_roadmap_for_user(sender, instance, **kwargs):
+    invalidate_user_roadmap(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CareerPath)
+@receiver([post_save, post_delete], sender=Milestone)
+@receiver([post_save, post_delete], sender=LearningResource)
+def invalidate_catalog_on_admin_write(sender, instance, **kwargs):
+    # Snapshot keys include the catalog version, so this also retires every roadmap
+    invalidate_catalog()
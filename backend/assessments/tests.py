@@ -1,8 +1,33 @@
+import asyncio
+import json
+import threading
+import random
+import time
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from django.db import connection
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
 from django.contrib.auth import get_user_model
-from .models import AssessmentResult, CareerPath, Milestone, UserProgress, ChatMessage
+from django.core.management import call_command
+from .models import AssessmentResult, CareerPath, Milestone, UserProgress, ChatMessage, ChatSummary, LearningResource, Achievement, UserAchievement, Question
 from users.models import Notification, Thread
 from unittest.mock import patch, MagicMock
+from .roadmap import get_user_roadmap_context
+from .catalog import get_catalog, invalidate_catalog
+from .consumers import MentorStreamConsumer
+from .llm import LocalProvider, get_client, get_provider, reset_clients
+from .mentor_cache import mentor_cache, normalize_message
+from .prompting import TRUNCATION_MARK, count_tokens
+from .ai_service import CareerMentorService
+from .services import RIASECService, RIASEC_ORDER
+from .serializers import CareerPathSerializer
+from users import leaderboard
 from django.utils import timezone
 
 class AssessmentLogicTests(APITestCase):
@@ -126,6 +151,7 @@ class AIMentorTests(APITestCase):
         self.user = User.objects.create_user(email='mentor@test.com', username='mentor_user', password='password123')
         self.path = CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
         AssessmentResult.objects.create(user=self.user, top_trait='IR', scores={'I': 10, 'R': 5})
+        mentor_cache.clear()
 
     @patch('openai.resources.chat.completions.Completions.create')
     def test_chat_endpoint_logic(self, mock_chat_create):
@@ -145,4 +171,775 @@ class AIMentorTests(APITestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.post('/api/v1/assessments/chat/', {'message': 'Hello'}, format='json')
         self.assertEqual(response.status_code, 200)
-        self.assertIn("recharging", response.data['response'])
\ No newline at end of file
+        self.assertIn("recharging", response.data['response'])
+
+
+class RoadmapSnapshotTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='snap@test.com', username='snap_user', password='pass')
+        self.path = CareerPath.objects.create(trait_type='S', title='Leadership Path', duration='6 Weeks')
+        self.milestone = Milestone.objects.create(path=self.path, title='Agile Basics', order=1)
+        AssessmentResult.objects.create(user=self.user, top_trait='SE', scores={'S': 10, 'E': 8})
+
+    def test_cache_hit_runs_no_sql(self):
+        """A warm snapshot serves the roadmap without touching the database."""
+        first = get_user_roadmap_context(self.user)
+        with self.assertNumQueries(0):
+            second = get_user_roadmap_context(self.user)
+        self.assertEqual(first, second)
+        self.assertEqual(second['title'], 'Leadership Path')
+
+    def test_progress_write_invalidates_snapshot(self):
+        get_user_roadmap_context(self.user)
+        UserProgress.objects.create(user=self.user, milestone=self.milestone, status='COMPLETED')
+
+        roadmap = get_user_roadmap_context(self.user)
+        self.assertEqual(roadmap['milestones'][0]['status'], 'COMPLETED')
+        self.assertEqual(roadmap['completion_percentage'], 100)
+
+    def test_catalog_write_invalidates_snapshot(self):
+        get_user_roadmap_context(self.user)
+        Milestone.objects.create(path=self.path, title='Stakeholder Mapping', order=2)
+
+        roadmap = get_user_roadmap_context(self.user)
+        self.assertEqual(len(roadmap['milestones']), 2)
+
+
+class CareerCatalogTests(APITestCase):
+    def setUp(self):
+        self.infra = CareerPath.objects.create(trait_type='R', title='Infrastructure', duration='10 Weeks')
+        self.blended = CareerPath.objects.create(trait_type='RI', title='Site Reliability', duration='12 Weeks')
+        self.milestone = Milestone.objects.create(path=self.infra, title='Linux', order=1)
+
+    def test_catalog_is_loaded_once(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_catalog()
+        self.assertEqual(catalog.paths_by_id[self.infra.id].milestones[0].title, 'Linux')
+
+    def test_resolution_table_covers_all_pairs(self):
+        catalog = get_catalog()
+        self.assertEqual(len(catalog.resolution), 36)
+        self.assertEqual(catalog.resolve('RI').title, 'Site Reliability')
+        self.assertEqual(catalog.resolve('RC').title, 'Infrastructure')
+        self.assertIsNone(catalog.resolve('CA'))
+
+    def test_admin_write_reloads_catalog(self):
+        get_catalog()
+        CareerPath.objects.create(trait_type='C', title='Quality Path', duration='6 Weeks')
+        self.assertEqual(get_catalog().resolve('CA').title, 'Quality Path')
+
+    def test_admin_path_list_matches_serializer(self):
+        CareerPath.objects.filter(pk=self.blended.pk).update(profile={'R': 1, 'I': 0.7})
+        LearningResource.objects.create(
+            milestone=self.milestone, title='Linux Journey', url='https://linuxjourney.com/',
+            category='Course', resource_type='COURSE', trait_alignment='R'
+        )
+        invalidate_catalog()
+        User = get_user_model()
+        admin = User.objects.create_superuser(email='paths_admin@test.com', username='paths_admin', password='pass')
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get('/api/v1/assessments/admin/paths/')
+        expected = CareerPathSerializer(CareerPath.objects.order_by('id'), many=True).data
+        self.assertEqual(response.json(), json.loads(json.dumps(expected)))
+        self.assertEqual(response.data[1]['profile'], {'R': 1, 'I': 0.7})
+
+    def test_library_uses_catalog_resolution(self):
+        User = get_user_model()
+        student = User.objects.create_user(email='lib@test.com', username='lib_user', password='pass')
+        AssessmentResult.objects.create(user=student, top_trait='RC', scores={'R': 9, 'C': 7})
+        LearningResource.objects.create(
+            milestone=self.milestone, title='Linux Journey', url='https://linuxjourney.com/',
+            category='Course', resource_type='COURSE', trait_alignment='R'
+        )
+
+        self.client.force_authenticate(user=student)
+        response = self.client.get('/api/v1/assessments/library/')
+        self.assertEqual(response.data['path_title'], 'Infrastructure')
+        self.assertEqual(response.data['resources'][0]['title'], 'Linux Journey')
+
+
+class PathMatchingTests(APITestCase):
+    def setUp(self):
+        self.data = CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        self.sre = CareerPath.objects.create(trait_type='RI', title='Site Reliability', duration='12 Weeks')
+        self.design = CareerPath.objects.create(trait_type='A', title='Product Design', duration='8 Weeks',
+                                                profile={'A': 1, 'S': 0.8})
+        User = get_user_model()
+        self.student = User.objects.create_user(email='match@test.com', username='match_user', password='pass')
+        self.client.force_authenticate(user=self.student)
+
+    def test_near_tie_without_blended_path_uses_nearest_profile(self):
+        catalog = get_catalog()
+        scores = {'I': 10, 'R': 9.8}
+        # No IR path: the first-letter fallback would pick Data Science
+        self.assertEqual(catalog.resolve('IR').title, 'Data Science')
+        self.assertEqual(catalog.match('IR', scores).title, 'Site Reliability')
+        # An exact blended path still wins outright
+        self.assertEqual(catalog.match('I', scores).title, 'Data Science')
+        self.assertEqual(catalog.match('CA', {}), None)
+
+    def test_nearest_ranks_by_cosine_and_honours_explicit_profiles(self):
+        ranked = get_catalog().nearest({'A': 6, 'S': 5, 'I': 1}, k=2)
+        self.assertEqual([p.title for p, _ in ranked], ['Product Design', 'Data Science'])
+        self.assertGreater(ranked[0][1], 0.95)
+        self.assertEqual(get_catalog().nearest({'E': 0}), [])
+
+    def test_dashboard_and_library_return_ranked_matches(self):
+        AssessmentResult.objects.create(user=self.student, top_trait='IR', scores={'I': 10, 'R': 9})
+
+        response = self.client.get('/api/v1/assessments/dashboard-summary/')
+        self.assertEqual(response.data['roadmap']['title'], 'Site Reliability')
+        self.assertEqual([m['title'] for m in response.data['path_matches']], ['Site Reliability', 'Data Science'])
+
+        response = self.client.get('/api/v1/assessments/library/')
+        self.assertEqual(response.data['path_id'], self.sre.id)
+        self.assertEqual(len(response.data['path_matches']), 2)
+        response = self.client.get(f'/api/v1/assessments/library/?path={self.data.id}')
+        self.assertEqual(response.data['path_title'], 'Data Science')
+
+
+class DashboardQueryCountTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.mentor = User.objects.create_user(email='dm@test.com', username='dash_mentor', password='pass', role='MENTOR')
+        self.student = User.objects.create_user(email='ds@test.com', username='dash_student', password='pass', mentor=self.mentor)
+        path = CareerPath.objects.create(trait_type='E', title='Founder Path', duration='8 Weeks')
+        Milestone.objects.create(path=path, title='Pitching', order=1)
+        AssessmentResult.objects.create(user=self.student, top_trait='ES', scores={'E': 10, 'S': 8})
+        self.client.force_authenticate(user=self.student)
+
+    def award(self, count):
+        for i in range(count):
+            badge = Achievement.objects.create(title=f"Badge {i}", description="-", badge_icon="Star")
+            UserAchievement.objects.create(user=self.student, achievement=badge)
+
+    def test_query_count_does_not_grow_with_achievements(self):
+        """Warm snapshot: achievements + notified UPDATE + mentor name, whatever the badge count."""
+        self.client.get('/api/v1/assessments/dashboard-summary/')
+
+        self.award(2)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/assessments/dashboard-summary/')
+        self.assertEqual(len(response.data['new_achievements']), 2)
+        self.assertEqual(response.data['user']['mentor_username'], 'dash_mentor')
+        self.assertEqual(response.data['assessment']['top_trait'], 'ES')
+
+        self.award(10)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/assessments/dashboard-summary/')
+        self.assertEqual(len(response.data['achievements']), 12)
+        self.assertEqual(len(response.data['new_achievements']), 10)
+
+
+class LeaderboardTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        leaderboard._indexes.clear()
+        self.students = []
+        for name, xp in (('ada', 300), ('bola', 900), ('chi', 600)):
+            student = User.objects.create_user(email=f'{name}@test.com', username=name, password='pass')
+            student.add_xp(xp)
+            AssessmentResult.objects.create(user=student, top_trait='IR', scores={'I': 9, 'R': 7})
+            self.students.append(student)
+        self.client.force_authenticate(user=self.students[0])
+
+    def test_page_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/assessments/leaderboard/')
+        self.assertEqual([row['username'] for row in response.data], ['bola', 'chi', 'ada'])
+        self.assertEqual(response.data[0]['top_trait'], 'IR')
+
+    def test_pagination_and_weekly_window(self):
+        response = self.client.get('/api/v1/assessments/leaderboard/?window=week&page=2&page_size=2')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['username'], 'ada')
+        self.assertEqual(response.data[0]['rank'], 3)
+
+    def test_stale_index_is_served_while_it_reloads(self):
+        index = leaderboard.get_rank_index('all')
+        index.loaded_at -= leaderboard.RANK_INDEX_TTL + 1
+        get_user_model().objects.filter(pk=self.students[0].pk).update(xp_total=5000)
+
+        # Someone else holds the reload: no query in this request, old ranks
+        with leaderboard._reload_lock(('all', 'all')):
+            with self.assertNumQueries(0):
+                self.assertIs(leaderboard.get_rank_index('all'), index)
+
+        self.assertEqual(leaderboard.reload_stale_indexes(), 1)
+        fresh = leaderboard.get_rank_index('all')
+        self.assertIsNot(fresh, index)
+        self.assertEqual(fresh.rank_of(5000), 1)
+        self.assertEqual(leaderboard.reload_stale_indexes(), 0)
+
+    def test_my_rank_follows_xp_changes(self):
+        response = self.client.get('/api/v1/assessments/leaderboard/me/')
+        self.assertEqual(response.data['rank'], 3)
+        self.assertEqual(response.data['total'], 3)
+
+        self.students[0].add_xp(1000)
+        response = self.client.get('/api/v1/assessments/leaderboard/me/?window=month')
+        self.assertEqual(response.data['rank'], 1)
+        self.assertEqual(response.data['xp'], 1300)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    AI_MENTOR_PROVIDER='local',
+    AI_MENTOR_LOCAL_TOKEN_RATE=100,
+)
+class MentorStreamTests(TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='stream@test.com', username='stream_user', password='pass')
+        CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        AssessmentResult.objects.create(user=self.user, top_trait='IR', scores={'I': 10, 'R': 5})
+
+    def communicator(self):
+        communicator = WebsocketCommunicator(MentorStreamConsumer.as_asgi(), "/ws/mentor/")
+        communicator.scope['user'] = self.user
+        return communicator
+
+    def test_tokens_stream_then_pair_is_saved(self):
+        async def scenario():
+            ws = self.communicator()
+            await ws.connect()
+            await ws.send_json_to({'type': 'ask', 'message': 'How do I learn SQL?'})
+            frames = [await ws.receive_json_from()]
+            while frames[-1]['type'] not in ('done', 'error'):
+                frames.append(await ws.receive_json_from())
+            await ws.disconnect()
+            return frames
+
+        frames = async_to_sync(scenario)()
+        tokens = [f['content'] for f in frames if f['type'] == 'token']
+
+        self.assertEqual(frames[0]['type'], 'start')
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(frames[-1], {'type': 'done', 'response': "".join(tokens)})
+        self.assertEqual(list(ChatMessage.objects.values_list('role', flat=True)), ['user', 'assistant'])
+
+    def test_cancel_stops_stream_without_saving(self):
+        async def scenario():
+            ws = self.communicator()
+            await ws.connect()
+            await ws.send_json_to({'type': 'ask', 'message': 'Tell me everything'})
+            await ws.receive_json_from()  # start
+            await ws.receive_json_from()  # first token
+            await ws.send_json_to({'type': 'cancel'})
+            frame = await ws.receive_json_from()
+            while frame['type'] == 'token':
+                frame = await ws.receive_json_from()
+            await ws.disconnect()
+            return frame
+
+        self.assertEqual(async_to_sync(scenario)()['type'], 'cancelled')
+        self.assertEqual(ChatMessage.objects.count(), 0)
+
+
+class StandInLLMHandler(BaseHTTPRequestHandler):
+    """Minimal /chat/completions stand-in that sleeps `latency` and counts requests in flight."""
+    latency = 0.2
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            self.rfile.read(int(self.headers['Content-Length']))
+            time.sleep(cls.latency)
+            body = json.dumps({
+                "id": "chatcmpl-standin", "object": "chat.completion", "created": 0, "model": "gpt-3.5-turbo",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Stand-in mentor reply."}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out first
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledLLMClientTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInLLMHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='pool@test.com', username='pool_user', password='pass')
+        CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        AssessmentResult.objects.create(user=self.user, top_trait='IR', scores={'I': 10, 'R': 5})
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+
+        StandInLLMHandler.latency = 0.2
+        StandInLLMHandler.max_in_flight = 0
+        settings_patch = override_settings(
+            OPENAI_BASE_URL=f"http://127.0.0.1:{self.server.server_port}/v1",
+            OPENAI_MAX_RETRIES=0,
+            AI_MENTOR_MAX_CONCURRENCY=2,
+        )
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        reset_clients()
+        self.addCleanup(reset_clients)
+        mentor_cache.clear()
+
+    def test_sync_view_reuses_one_client(self):
+        self.client.force_authenticate(user=self.user)
+        first = self.client.post('/api/v1/assessments/chat/', {'message': 'Hi'}, format='json')
+        client = get_client()
+        self.client.post('/api/v1/assessments/chat/', {'message': 'Again'}, format='json')
+
+        self.assertEqual(first.data['response'], "Stand-in mentor reply.")
+        self.assertIs(get_client(), client)
+        self.assertEqual(ChatMessage.objects.count(), 4)
+
+    def test_async_view_bounds_concurrency(self):
+        async def burst():
+            client = AsyncClient()
+            return await asyncio.gather(*[
+                client.post('/api/v1/assessments/chat/async/', {'message': f'Q{i}'},
+                            content_type='application/json', headers={'Authorization': self.auth})
+                for i in range(6)
+            ])
+
+        started = time.perf_counter()
+        responses = async_to_sync(burst)()
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertEqual(responses[0].json()['response'], "Stand-in mentor reply.")
+        # Six calls through two slots: never more than two upstream, about three waves long
+        self.assertLessEqual(StandInLLMHandler.max_in_flight, 2)
+        self.assertGreaterEqual(elapsed, 0.55)
+        self.assertEqual(ChatMessage.objects.count(), 12)
+
+    def test_slow_upstream_times_out(self):
+        StandInLLMHandler.latency = 1.0
+        with override_settings(OPENAI_TIMEOUT=0.2):
+            reset_clients()
+            response = async_to_sync(AsyncClient().post)(
+                '/api/v1/assessments/chat/async/', {'message': 'Hi'},
+                content_type='application/json', headers={'Authorization': self.auth},
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(ChatMessage.objects.count(), 0)
+
+    def test_async_view_rejects_bad_bodies_before_the_provider(self):
+        post = async_to_sync(AsyncClient().post)
+        for body in ('[1]', '"x"', '{}', '{"message": 5}', '{"message": "  "}', '{bad'):
+            response = post('/api/v1/assessments/chat/async/', body,
+                            content_type='application/json', headers={'Authorization': self.auth})
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        self.assertEqual(StandInLLMHandler.max_in_flight, 0)
+        self.assertEqual(ChatMessage.objects.count(), 0)
+
+    def test_async_view_requires_token(self):
+        response = async_to_sync(AsyncClient().post)('/api/v1/assessments/chat/async/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class MentorResponseCacheTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.path = CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        self.users = []
+        for i in range(2):
+            user = User.objects.create_user(email=f'cache{i}@test.com', username=f'cache_user{i}', password='pass')
+            AssessmentResult.objects.create(user=user, top_trait='IR', scores={'I': 10, 'R': 5})
+            self.users.append(user)
+        mentor_cache.clear()
+        self.addCleanup(mentor_cache.clear)
+
+    def ask(self, user, message):
+        self.client.force_authenticate(user=user)
+        return self.client.post('/api/v1/assessments/chat/', {'message': message}, format='json')
+
+    def test_normalization(self):
+        self.assertEqual(normalize_message("  What should I learn FIRST?? "), "what should i learn first")
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_same_question_on_same_path_is_served_from_cache(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Start with Python."))])
+
+        first = self.ask(self.users[0], "What should I learn first?")
+        second = self.ask(self.users[1], "what should i learn FIRST")
+
+        self.assertEqual(mock_chat_create.call_count, 1)
+        self.assertEqual(second.data['response'], first.data['response'])
+        # Both students still get the exchange in their own history
+        self.assertEqual(ChatMessage.objects.filter(user=self.users[1]).count(), 2)
+        self.assertEqual(mentor_cache.get_stats()["hits"], 1)
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_personal_messages_bypass_cache(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Looks fine."))])
+        question = "Can you review my code?\n```python\nprint('hi')\n```"
+
+        self.ask(self.users[0], question)
+        self.ask(self.users[1], question)
+
+        self.assertEqual(mock_chat_create.call_count, 2)
+        self.assertEqual(mentor_cache.get_stats()["bypassed"], 2)
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_different_history_gets_its_own_answer(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Answer."))])
+        ChatMessage.objects.create(user=self.users[1], role='user', content="I prefer frontend work")
+        ChatMessage.objects.create(user=self.users[1], role='assistant', content="Noted.")
+
+        self.ask(self.users[0], "What next?")
+        self.ask(self.users[1], "What next?")
+
+        self.assertEqual(mock_chat_create.call_count, 2)
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_older_history_and_summary_are_part_of_the_key(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Answer."))])
+        for user, detail in zip(self.users, ("I live in Lagos", "I live in Accra")):
+            ChatMessage.objects.create(user=user, role='user', content=detail)
+            ChatMessage.objects.create(user=user, role='assistant', content="Noted.")
+            # The last two turns are identical for both students
+            ChatMessage.objects.create(user=user, role='user', content="Thanks")
+            ChatMessage.objects.create(user=user, role='assistant', content="Any time.")
+        ChatSummary.objects.create(user=self.users[0], content="- Student: works nights", covered_until=0)
+
+        self.ask(self.users[0], "What next?")
+        self.ask(self.users[1], "What next?")
+        self.assertEqual(mock_chat_create.call_count, 2)
+        self.assertEqual(mentor_cache.get_stats()["hits"], 0)
+
+
+@override_settings(OPENAI_MAX_RETRIES=0)
+class PromptBudgetTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='budget@test.com', username='budget_user', password='pass')
+        CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        AssessmentResult.objects.create(user=self.user, top_trait='IR', scores={'I': 10, 'R': 5})
+        mentor_cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_token_estimate(self):
+        self.assertEqual(count_tokens("Hello, world!"), 4)
+        self.assertEqual(count_tokens("internationalization"), 4)
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_long_history_fits_budget_and_is_summarized(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Keep going."))])
+        pasted = "```python\n" + "value = compute(value)\n" * 400 + "```"
+        for i in range(10):
+            ChatMessage.objects.create(user=self.user, role='user', content=f"Question {i}: {pasted}")
+            ChatMessage.objects.create(user=self.user, role='assistant', content=f"Answer {i}.")
+
+        response = self.client.post('/api/v1/assessments/chat/', {'message': 'What now?'}, format='json')
+
+        sent = mock_chat_create.call_args.kwargs['messages']
+        self.assertLessEqual(int(response['X-Prompt-Tokens']), int(response['X-Prompt-Budget']))
+        self.assertTrue(any(TRUNCATION_MARK in m['content'] for m in sent))
+        self.assertEqual(sent[-1]['content'], 'What now?')
+
+        # The turns that didn't fit are in the stored summary, which is sent instead
+        summary = ChatSummary.objects.get(user=self.user)
+        self.assertIn("Student: Question 0", summary.content)
+        self.assertIn(summary.content, sent[1]['content'])
+
+        # Next request only loads what the summary doesn't already cover
+        _, history = CareerMentorService.load_history(self.user)
+        self.assertTrue(all(m.id > summary.covered_until for m in history))
+
+    def test_turns_older_than_the_window_are_summarized_not_skipped(self):
+        from .prompting import HISTORY_WINDOW
+
+        for i in range(HISTORY_WINDOW + 15):
+            ChatMessage.objects.create(user=self.user, role='user', content=f"Turn {i}")
+
+        summary, history = CareerMentorService.load_history(self.user)
+        self.assertEqual(len(history), HISTORY_WINDOW)
+        self.assertEqual(history[0].content, "Turn 15")
+        self.assertIn("Student: Turn 0", summary.content)
+        self.assertIn("Student: Turn 14", summary.content)
+        self.assertEqual(summary.covered_until, history[0].id - 1)
+
+        # Caught up: the next load adds nothing and leaves the mark where it is
+        summary, _ = CareerMentorService.load_history(self.user)
+        self.assertEqual(summary.content.count("Turn 0"), 1)
+
+    @patch('openai.resources.chat.completions.Completions.create')
+    def test_short_history_is_sent_verbatim(self, mock_chat_create):
+        mock_chat_create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="Sure."))])
+        ChatMessage.objects.create(user=self.user, role='user', content="I like statistics")
+        ChatMessage.objects.create(user=self.user, role='assistant', content="Great fit for data science.")
+
+        response = self.client.post('/api/v1/assessments/chat/', {'message': 'Which course?'}, format='json')
+
+        sent = mock_chat_create.call_args.kwargs['messages']
+        self.assertEqual([m['content'] for m in sent[1:]], ["I like statistics", "Great fit for data science.", "Which course?"])
+        self.assertFalse(ChatSummary.objects.exists())
+        self.assertEqual(response['X-Prompt-Turns'], "2 sent, 0 summarized")
+
+
+class EchoProvider:
+    """Dotted-path provider used to check AI_MENTOR_PROVIDER plugging."""
+
+    def complete(self, messages):
+        return f"echo: {messages[-1]['content']}"
+
+
+class ProviderLayerTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='provider@test.com', username='provider_user', password='pass')
+        CareerPath.objects.create(trait_type='I', title='Data Science', duration='12 Weeks')
+        AssessmentResult.objects.create(user=self.user, top_trait='IR', scores={'I': 10, 'R': 5})
+        mentor_cache.clear()
+        self.client.force_authenticate(user=self.user)
+
+    def test_local_provider_is_deterministic_and_paced(self):
+        provider = LocalProvider(latency=0.05, tokens_per_second=200)
+        messages = [{"role": "user", "content": "How do I start?"}]
+
+        started = time.perf_counter()
+        reply = provider.complete(messages)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(reply, provider.complete(messages))
+        self.assertEqual(reply, async_to_sync(provider.acomplete)(messages))
+        expected = 0.05 + len(provider.tokens_for(messages)) / 200
+        self.assertGreaterEqual(elapsed, expected * 0.9)
+
+    @override_settings(AI_MENTOR_PROVIDER='local')
+    def test_chat_view_runs_offline_on_local_provider(self):
+        response = self.client.post('/api/v1/assessments/chat/', {'message': 'What first?'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('What first?', response.data['response'])
+
+    @override_settings(AI_MENTOR_PROVIDER='assessments.tests.EchoProvider')
+    def test_provider_selected_by_dotted_path(self):
+        self.assertIsInstance(get_provider(), EchoProvider)
+        response = self.client.post('/api/v1/assessments/chat/', {'message': 'ping'}, format='json')
+        self.assertEqual(response.data['response'], "echo: ping")
+
+
+class BatchScoringTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='rescore@test.com', username='rescore_user', password='pass')
+
+    def test_batch_matches_per_row_scoring_including_ties(self):
+        rng = random.Random(18)
+        submissions = [
+            [{"type": rng.choice(RIASEC_ORDER + ('X',)), "value": rng.randint(0, 3)} for _ in range(rng.randint(0, 12))]
+            for _ in range(300)
+        ]
+        # Exact ties and an empty submission must fall back to R, I, A, S, E, C order
+        submissions += [[{"type": "C", "value": 4}, {"type": "S", "value": 4}], []]
+
+        types, values = RIASECService.answers_to_arrays(submissions)
+        totals, codes = RIASECService.calculate_scores_batch(types, values)
+
+        for answers, scores, code in zip(submissions, RIASECService.scores_to_dicts(totals), codes):
+            expected_totals, _, expected_code = RIASECService.calculate_scores(answers)
+            self.assertEqual(scores, expected_totals)
+            self.assertEqual(code, expected_code)
+        self.assertEqual(codes[-2:], ["SC", "RI"])
+
+    def test_submit_stores_answers(self):
+        self.client.force_authenticate(user=self.user)
+        answers = [{"type": "S", "value": 5}, {"type": "E", "value": 3}]
+        self.client.post('/api/v1/assessments/submit/', {"answers": answers}, format='json')
+        self.assertEqual(AssessmentResult.objects.get(user=self.user).answers, answers)
+
+    def test_rescore_command_updates_stale_rows_in_chunks(self):
+        stale = AssessmentResult.objects.create(
+            user=self.user, top_trait='RI', scores={'R': 0},
+            answers=[{"type": "A", "value": 4}, {"type": "C", "value": 2}],
+        )
+        # No stored answers: totals are kept, only the code is re-derived
+        legacy = AssessmentResult.objects.create(user=self.user, top_trait='II', scores={'E': 7, 'S': 7})
+        current = AssessmentResult.objects.create(user=self.user, top_trait='AI', scores={'A': 10, 'I': 8})
+
+        out = StringIO()
+        call_command('rescore_assessments', '--dry-run', stdout=out)
+        self.assertIn('would change 2', out.getvalue())
+        stale.refresh_from_db()
+        self.assertEqual(stale.top_trait, 'RI')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rescore_assessments', '--chunk', '1', '--benchmark', stdout=StringIO())
+        for row in (stale, legacy, current):
+            row.refresh_from_db()
+        self.assertEqual(stale.top_trait, 'AC')
+        self.assertEqual(stale.scores, {'R': 0, 'I': 0, 'A': 4, 'S': 0, 'E': 0, 'C': 2})
+        self.assertEqual(legacy.top_trait, 'SE')
+        self.assertEqual(current.top_trait, 'AI')
+        self.assertEqual(current.scores, {'A': 10, 'I': 8})
+
+
+class BulkAssessmentIngestTests(APITestCase):
+    url = '/api/v1/assessments/admin/assessments/bulk/'
+
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(email='bulk_admin@test.com', username='bulk_admin', password='pass')
+        self.students = [
+            User.objects.create_user(email=f'cohort{i}@test.com', username=f'cohort{i}', password='pass')
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.admin)
+
+    def upload(self, body, content_type):
+        return self.client.generic('POST', self.url, body.encode(), content_type=content_type)
+
+    def test_jsonl_upload_reports_every_row(self):
+        lines = [
+            json.dumps({"user": "cohort0@test.com", "answers": [{"type": "A", "value": 5}, {"type": "I", "value": 3}]}),
+            json.dumps({"user": "cohort1", "answers": [{"type": "S", "value": 4}, {"type": "E", "value": 4}]}),
+            json.dumps({"user": str(self.students[2].id), "answers": [{"type": "C", "value": 2}]}),
+            json.dumps({"user": "nobody@test.com", "answers": [{"type": "R", "value": 1}]}),
+            json.dumps({"user": "cohort0", "answers": [{"type": "Z", "value": 1}]}),
+            "{not json",
+        ]
+        response = self.upload("\n".join(lines), 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 3))
+        rows = response.data['rows']
+        self.assertEqual([r['status'] for r in rows], ['created'] * 3 + ['error'] * 3)
+        self.assertEqual([r.get('code') for r in rows[:3]], ['AI', 'SE', 'CR'])
+        self.assertEqual(rows[3]['error'], 'unknown user')
+        self.assertEqual(rows[5]['line'], 6)
+
+        result = AssessmentResult.objects.get(user=self.students[1])
+        self.assertEqual(result.top_trait, 'SE')
+        self.assertEqual(result.scores, {'R': 0, 'I': 0, 'A': 0, 'S': 4, 'E': 4, 'C': 0})
+
+    def test_csv_upload_by_letter_or_question_id(self):
+        question = Question.objects.create(text='Fix engines?', riasec_type='R')
+        body = f"user,I,{question.id},A\ncohort0,2,5,1\ncohort1,3,,4\ncohort2,x,1,1\n"
+        response = self.upload(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r.get('code') for r in response.data['rows']], ['RI', 'AI', None])
+        self.assertEqual(response.data['rows'][2]['error'], 'answer values must be numbers')
+        self.assertEqual(AssessmentResult.objects.get(user=self.students[1]).answers,
+                         [{"type": "I", "value": 3}, {"type": "A", "value": 4}])
+
+    def test_bad_header_and_non_admin_rejected(self):
+        response = self.upload("email,R\ncohort0,1\n", 'text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('header', response.data['error'])
+
+        self.client.force_authenticate(user=self.students[0])
+        response = self.upload('{"user": "cohort0", "answers": [{"type": "R", "value": 1}]}', 'application/x-ndjson')
+        self.assertEqual(response.status_code, 403)
+
+    def test_upload_scales_in_constant_queries_and_refreshes_roadmap(self):
+        CareerPath.objects.create(trait_type='EC', title='Operations', duration='8 Weeks')
+        student = self.students[0]
+        self.assertIsNone(get_user_roadmap_context(student))
+
+        def upload_copies(copies):
+            lines = [json.dumps({"user": s.email, "answers": [{"type": "E", "value": 5}, {"type": "C", "value": 4}]})
+                     for s in self.students] * copies
+            with CaptureQueriesContext(connection) as queries:
+                response = self.upload("\n".join(lines), 'application/x-ndjson')
+            self.assertEqual(response.data['created'], len(lines))
+            return len(queries)
+
+        # One user lookup, the insert batch and its savepoint - not a query per row
+        self.assertEqual(upload_copies(1), upload_copies(40))
+        self.assertEqual(get_user_roadmap_context(student)['title'], 'Operations')
+
+
+class AchievementRuleTests(APITestCase):
+    def setUp(self):
+        User = get_user_model()
+        leaderboard._indexes.clear()
+        self.student = User.objects.create_user(email='ach@test.com', username='ach_student', password='pass')
+        self.path = CareerPath.objects.create(trait_type='R', title='Cloud Ops', duration='8 Weeks')
+        self.milestones = [Milestone.objects.create(path=self.path, title=f'Step {i}', order=i) for i in range(3)]
+
+    def complete(self, user, milestone):
+        progress, _ = UserProgress.objects.get_or_create(user=user, milestone=milestone)
+        progress.status = 'COMPLETED'
+        progress.save()
+        return progress
+
+    def titles(self, user):
+        return set(UserAchievement.objects.filter(user=user).values_list('achievement__title', flat=True))
+
+    def test_badges_follow_completed_milestones(self):
+        self.complete(self.student, self.milestones[0])
+        self.assertEqual(self.titles(self.student), {'First Step Taken'})
+        self.complete(self.student, self.milestones[1])
+        progress = self.complete(self.student, self.milestones[2])
+        self.assertEqual(self.titles(self.student), {'First Step Taken', 'Cloud Ops Specialist'})
+
+        self.student.refresh_from_db()
+        # 3 x 100 for the milestones, 50 + 150 for the badges
+        self.assertEqual(self.student.xp_total, 500)
+        self.assertEqual(self.student.level, 2)
+
+        # Re-saving a completed row doesn't run the rules again
+        progress = UserProgress.objects.get(pk=progress.pk)
+        progress.mentor_feedback = 'Nice'
+        with CaptureQueriesContext(connection) as ctx:
+            progress.save()
+        self.assertFalse(any('achievement' in q['sql'] for q in ctx.captured_queries))
+
+    def test_backfill_awards_missing_badges_in_chunks(self):
+        User = get_user_model()
+        students = [User.objects.create_user(email=f'bf{i}@test.com', username=f'bf{i}', password='pass') for i in range(5)]
+        # bulk_create skips the signals, like data loaded before a rule existed
+        UserProgress.objects.bulk_create([
+            UserProgress(user=s, milestone=m, status='COMPLETED')
+            for i, s in enumerate(students) for m in self.milestones[:1 + i % 3]
+        ])
+
+        out = StringIO()
+        call_command('award_achievements', '--rule', 'path_specialist', '--dry-run', stdout=out)
+        self.assertIn('Would award 1 badges across 5 users', out.getvalue())
+        self.assertFalse(UserAchievement.objects.exists())
+
+        out = StringIO()
+        call_command('award_achievements', '--chunk', '2', stdout=out)
+        self.assertIn('Awarded 6 badges across 5 users', out.getvalue())
+        self.assertEqual(self.titles(students[2]), {'First Step Taken', 'Cloud Ops Specialist'})
+        students[2].refresh_from_db()
+        self.assertEqual((students[2].xp_total, students[2].level), (200, 1))
+        self.assertEqual(leaderboard.get_user_rank(students[2], 'week')['xp'], 200)
+
+        # A second run finds nothing left to award
+        out = StringIO()
+        call_command('award_achievements', stdout=out)
+        self.assertIn('Awarded 0 badges', out.getvalue())
+
+    def test_unknown_rule_is_rejected(self):
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('award_achievements', '--rule', 'nope', stdout=StringIO())
@@ -1,9 +1,11 @@
 from django.urls import path
 from .views import (
     SubmitAssessmentView, 
+    AdminBulkAssessmentView,
     DashboardSummaryView, 
     ToggleMilestoneView, 
     ChatWithMentorView,
+    AsyncChatWithMentorView,
     AdminDashboardStatsView,
     SubmitMilestoneView,
     MentorReviewView,
@@ -17,6 +19,7 @@ from .views import (
     StudentLibraryView, 
     AchievementListView,
     LeaderboardView,
+    LeaderboardRankView,
     StudentPortfolioView,
     
 )
@@ -26,6 +29,7 @@ urlpatterns = [
     path('submit/', SubmitAssessmentView.as_view(), name='submit-assessment'),
     path('dashboard-summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
     path('chat/', ChatWithMentorView.as_view(), name='mentor-chat'),
+    path('chat/async/', AsyncChatWithMentorView.as_view(), name='mentor-chat-async'),
     
     # Simple Toggle (Backward Compatibility)
     path('milestone/<int:milestone_id>/toggle/', ToggleMilestoneView.as_view(), name='toggle-milestone'),
@@ -39,6 +43,7 @@ urlpatterns = [
 
     # Admin
     path('admin-stats/', AdminDashboardStatsView.as_view(), name='admin-stats'),
+    path('admin/assessments/bulk/', AdminBulkAssessmentView.as_view(), name='admin-bulk-assessments'),
     
     # Review List for Mentors
     path('reviews/pending/', PendingReviewsListView.as_view(), name='pending-reviews-list'),
@@ -53,6 +58,7 @@ urlpatterns = [
     path('library/', StudentLibraryView.as_view(), name='student-library'),
     path('achievements-list/', AchievementListView.as_view(), name='achievements-list'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardRankView.as_view(), name='leaderboard-me'),
     path('portfolio/', StudentPortfolioView.as_view(), name='student-portfolio'),
     
 ]
\ No newline at end of file
@@ -1,70 +1,28 @@
+import json
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from .models import AssessmentResult, CareerPath, UserProgress, Milestone, ChatMessage, Question, LearningResource
-from .serializers import QuestionSerializer, CareerPathSerializer, MilestoneSerializer, LearningResourceSerializer, StudentResourceSerializer
+from .serializers import QuestionSerializer, CareerPathSerializer, MilestoneSerializer, LearningResourceSerializer
 from .services import RIASECService
+from .ingest import IngestError, ingest
 from .ai_service import CareerMentorService
+from .llm import LLMBusyError
+from .roadmap import get_user_roadmap_context, get_user_snapshot
+from .catalog import get_catalog
 from django.contrib.auth import get_user_model
 from users.models import Notification, Thread 
 
-def get_user_roadmap_context(user):
-    latest_result = AssessmentResult.objects.filter(user=user).order_by('-created_at').first()
-    if not latest_result:
-        return None
-
-    trait_code = latest_result.top_trait 
-    
-    # OPTIMIZATION: prefetch_related reduces database hits from ~15 to 1.
-    path = CareerPath.objects.prefetch_related(
-        'milestones__resources'
-    ).filter(trait_type=trait_code).first()
-    
-    if not path and trait_code:
-        primary_char = trait_code[0]
-        path = CareerPath.objects.prefetch_related(
-            'milestones__resources'
-        ).filter(trait_type=primary_char).first()
-    
-    if not path:
-        return None
-
-    # Fetch all progress for this user in one hit to avoid querying inside the loop
-    user_progress_map = {
-        p.milestone_id: p for p in UserProgress.objects.filter(user=user, milestone__path=path)
-    }
-
-    milestone_details = []
-    completed_count = 0
-    
-    # This loop now runs entirely in memory because of the prefetch above
-    for m in path.milestones.all():
-        progress = user_progress_map.get(m.id)
-        current_status = progress.status if progress else 'IN_PROGRESS'
-        is_done = (current_status == 'COMPLETED')
-        
-        if is_done: completed_count += 1
-        
-        milestone_details.append({
-            "id": m.id,
-            "title": m.title,
-            "order": m.order,
-            "status": current_status,
-            "is_completed": is_done,
-            "submission_url": progress.submission_url if progress else None,
-            "feedback": progress.mentor_feedback if progress else None,
-            "resources": [{"title": r.title, "url": r.url, "resource_type": r.resource_type} for r in m.resources.all()]
-        })
-
-    return {
-        "title": path.title,
-        "duration": path.duration,
-        "milestones": milestone_details,
-        "completion_percentage": (completed_count / len(milestone_details) * 100) if milestone_details else 0
-    }
-
 class SubmitMilestoneView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -137,28 +95,101 @@ class AdminDashboardStatsView(APIView):
             }
         })
 
+def prompt_headers(prompt_stats):
+    """Prompt-size instrumentation for a mentor reply (absent on cache hits)."""
+    if not prompt_stats:
+        return None
+    return {
+        "X-Prompt-Tokens": str(prompt_stats["total_tokens"]),
+        "X-Prompt-Budget": str(prompt_stats["budget"]),
+        "X-Prompt-Turns": f'{prompt_stats["turns_sent"]} sent, {prompt_stats["turns_summarized"]} summarized',
+    }
+
+
 class ChatWithMentorView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
         user_message = request.data.get('message')
-        roadmap_data = get_user_roadmap_context(request.user)
+        roadmap_data = get_user_roadmap_context(request.user, request)
         
         if not roadmap_data:
             return Response({"error": "Please complete assessment."}, status=status.HTTP_400_BAD_REQUEST)
 
-        history = list(reversed(ChatMessage.objects.filter(user=request.user).order_by('-created_at')[:10]))
-
         try:
-            ai_response = CareerMentorService.get_response(request.user, user_message, history, roadmap_data)
+            # History is fitted to the token budget; older turns live in the rolling summary
+            messages, cache_key, ai_response, prompt_stats = CareerMentorService.prepare(request.user, user_message, roadmap_data)
+            if ai_response is None:
+                ai_response = CareerMentorService.complete(messages, cache_key)
             ChatMessage.objects.create(user=request.user, role='user', content=user_message)
             ChatMessage.objects.create(user=request.user, role='assistant', content=ai_response)
-            return Response({"response": ai_response})
+            return Response({"response": ai_response}, headers=prompt_headers(prompt_stats))
+        except LLMBusyError:
+            return Response({"error": "Mentor is busy, please retry shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             if "insufficient_quota" in str(e):
                 return Response({"response": "I'm currently recharging (OpenAI Quota)."}, status=status.HTTP_200_OK)
             return Response({"error": "Mentor service unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncChatWithMentorView(View):
+    """
+    Same contract as ChatWithMentorView, but the completion is awaited on the
+    event loop: under Daphne a slow upstream holds a coroutine, not a worker thread.
+    DRF views are sync-only, so JWT auth is done by hand here.
+    """
+
+    async def post(self, request):
+        # 1. Authenticate (JWTAuthentication reads the Authorization header)
+        try:
+            auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if auth is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+        user = auth[0]
+        # Lets the activity middleware see who this was, as DRF views do
+        request.user = user
+
+        try:
+            body = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        user_message = body.get('message') if isinstance(body, dict) else None
+        if not isinstance(user_message, str) or not user_message.strip():
+            return JsonResponse({"error": "A non-empty 'message' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. Roadmap, history, cache lookup and prompt in one thread hop
+        prepared = await sync_to_async(self.prepare)(user, user_message)
+        if prepared is None:
+            return JsonResponse({"error": "Please complete assessment."}, status=status.HTTP_400_BAD_REQUEST)
+        messages, cache_key, ai_response, prompt_stats = prepared
+
+        # 3. Completion on the pooled async client, unless the cache answered
+        try:
+            if ai_response is None:
+                ai_response = await CareerMentorService.aget_response(messages, cache_key)
+        except LLMBusyError:
+            return JsonResponse({"error": "Mentor is busy, please retry shortly."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            if "insufficient_quota" in str(e):
+                return JsonResponse({"response": "I'm currently recharging (OpenAI Quota)."}, status=status.HTTP_200_OK)
+            return JsonResponse({"error": "Mentor service unavailable."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        await ChatMessage.objects.abulk_create([
+            ChatMessage(user=user, role='user', content=user_message),
+            ChatMessage(user=user, role='assistant', content=ai_response),
+        ])
+        return JsonResponse({"response": ai_response}, headers=prompt_headers(prompt_stats))
+
+    @staticmethod
+    def prepare(user, user_message):
+        roadmap_data = get_user_roadmap_context(user)
+        if not roadmap_data:
+            return None
+        return CareerMentorService.prepare(user, user_message, roadmap_data)
+
 class SubmitAssessmentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -168,26 +199,60 @@ class SubmitAssessmentView(APIView):
             return Response({"error": "No answers provided"}, status=status.HTTP_400_BAD_REQUEST)
         
         scores, primary_trait, blended_code = RIASECService.calculate_scores(answers)
-        AssessmentResult.objects.create(user=request.user, scores=scores, top_trait=blended_code)
+        AssessmentResult.objects.create(user=request.user, scores=scores, top_trait=blended_code, answers=answers)
         
         return Response({"top_trait": primary_trait, "scores": scores, "code": blended_code}, status=status.HTTP_201_CREATED)
 
 
+class AdminBulkAssessmentView(APIView):
+    """
+    Cohort upload for schools. The body is read straight off the stream as
+    JSON lines ({"user": ..., "answers": [...]}) or, with Content-Type text/csv,
+    a `user,<R|I|A|S|E|C or question id>,...` CSV. Users are matched by email,
+    username or id; the response reports the outcome of every row.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        try:
+            report = ingest(request.stream or [], request.content_type or '')
+        except IngestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        code = status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=code)
+
 class DashboardSummaryView(APIView):
+    """
+    First call after login for every student, so it runs a fixed number of
+    queries: the cached roadmap snapshot (0 on a hit), one achievements
+    query, plus one UPDATE and one mentor lookup only when needed.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        roadmap_data = get_user_roadmap_context(request.user)
-        latest_result = AssessmentResult.objects.filter(user=request.user).order_by('-created_at').first()
-        
-        from .models import UserAchievement, UserProgress
+        from .models import UserAchievement
         from .serializers import UserAchievementSerializer
-        
-        all_earned = UserAchievement.objects.filter(user=request.user).select_related('achievement')
-        new_achievements = all_earned.filter(is_notified=False)
+        from users.models import CustomUser
+
+        snapshot = get_user_snapshot(request.user, request)
+        latest_result = snapshot["assessment"]
+
+        # One query for every badge; "new" ones are picked out in memory
+        all_earned = list(
+            UserAchievement.objects.filter(user=request.user).select_related('achievement')
+        )
+        new_achievements = [ua for ua in all_earned if not ua.is_notified]
         new_serialized = UserAchievementSerializer(new_achievements, many=True).data
-        
-        new_achievements.update(is_notified=True)
+
+        if new_achievements:
+            UserAchievement.objects.filter(id__in=[ua.id for ua in new_achievements]).update(is_notified=True)
+
+        mentor_username = None
+        if request.user.mentor_id:
+            mentor_username = CustomUser.objects.filter(
+                id=request.user.mentor_id
+            ).values_list('username', flat=True).first()
 
         return Response({
             "user": {
@@ -197,13 +262,14 @@ class DashboardSummaryView(APIView):
                 "level": request.user.level,
                 "has_seen_onboarding": request.user.has_seen_onboarding,      
                 "mentor": request.user.mentor_id,
-                "mentor_username": request.user.mentor.username if request.user.mentor else None, 
+                "mentor_username": mentor_username, 
             },
             "assessment": {
-                "top_trait": latest_result.top_trait if latest_result else None,
-                "scores": latest_result.scores if latest_result else None,
+                "top_trait": latest_result["top_trait"] if latest_result else None,
+                "scores": latest_result["scores"] if latest_result else None,
             },
-            "roadmap": roadmap_data,
+            "roadmap": snapshot["roadmap"],
+            "path_matches": snapshot.get("matches", []),
             "achievements": UserAchievementSerializer(all_earned, many=True).data,
             "new_achievements": new_serialized 
         })
@@ -273,6 +339,10 @@ class AdminCareerPathListView(generics.ListCreateAPIView):
     serializer_class = CareerPathSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    def list(self, request, *args, **kwargs):
+        # Same shape as CareerPathSerializer, served from the in-process catalog
+        return Response([p.to_dict() for p in get_catalog().paths])
+
 
 class AdminMilestoneCreateView(generics.CreateAPIView):
     queryset = Milestone.objects.all()
@@ -303,45 +373,51 @@ class StudentLibraryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        # 1. Try to find path from current progress
-        latest_progress = UserProgress.objects.filter(
-            user=request.user
-        ).select_related('milestone__path').first()
-        
+        catalog = get_catalog()
         active_path = None
-        
-        if latest_progress:
-            active_path = latest_progress.milestone.path
-        else:
+        snapshot = get_user_snapshot(request.user, request)
+
+        # 0. Browsing one of the ranked matches (?path=<id>)
+        requested = request.query_params.get('path')
+        if requested and requested.isdigit():
+            active_path = catalog.paths_by_id.get(int(requested))
+
+        # 1. Try to find path from current progress
+        latest_milestone_id = None
+        if not active_path:
+            latest_milestone_id = UserProgress.objects.filter(
+                user=request.user
+            ).values_list('milestone_id', flat=True).first()
+
+        if latest_milestone_id:
+            active_path = catalog.path_for_milestone(latest_milestone_id)
+        elif not active_path:
             # 2. Fallback: Find path matching their Assessment Result
-            result = AssessmentResult.objects.filter(user=request.user).order_by('-created_at').first()
+            # (exact blended code, then the nearest path profile to their scores)
+            result = snapshot["assessment"]
             if result:
-                # Check for exact match or first character (e.g., 'RI' matches 'R')
-                trait = result.top_trait
-                active_path = CareerPath.objects.filter(trait_type=trait).first()
-                if not active_path and trait:
-                    active_path = CareerPath.objects.filter(trait_type=trait[0]).first()
+                active_path = catalog.match(result["top_trait"], result["scores"])
 
         # 3. If still no path, just show the first available path so the page isn't empty
-        if not active_path:
-            active_path = CareerPath.objects.first()
+        if not active_path and catalog.paths:
+            active_path = catalog.paths[0]
 
         if not active_path:
             return Response({
                 "path_title": "General Resources",
-                "resources": []
+                "resources": [],
+                "path_matches": [],
             })
 
-        # 4. Fetch resources for ALL milestones in this path
-        resources = LearningResource.objects.filter(
-            milestone__path=active_path
-        ).order_by('milestone__order')
-        
-        serializer = StudentResourceSerializer(resources, many=True)
-        
+        # 4. Resources for ALL milestones in this path, already in milestone order
         return Response({
+            "path_id": active_path.id,
             "path_title": active_path.title,
-            "resources": serializer.data
+            "path_matches": snapshot.get("matches", []),
+            "resources": [
+                {"id": r.id, "title": r.title, "url": r.url, "resource_type": r.resource_type}
+                for r in active_path.resources
+            ]
         })
         
         
@@ -364,26 +440,38 @@ class AchievementListView(APIView):
     
     
 class LeaderboardView(APIView):
+    """
+    ?window=all|week|month (default all), ?page=N, ?page_size=N (max 100).
+    One query per page; the latest trait is joined in with a subquery.
+    """
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        from users.models import CustomUser
-        from .models import AssessmentResult 
-        
-        top_users = CustomUser.objects.filter(role='STUDENT').order_by('-xp_total')[:10]
-        
-        data = []
-        for u in top_users:
-            latest_assessment = AssessmentResult.objects.filter(user=u).order_by('-created_at').first()
-            data.append({
-                "username": u.username,
-                "xp": u.xp_total,
-                "level": u.level,
-                "top_trait": latest_assessment.top_trait if latest_assessment else "N/A",
-                "full_name": u.full_name
-            })
-            
-        return Response(data)
+        from users.leaderboard import WINDOWS, get_page
+
+        window = request.query_params.get('window', 'all')
+        if window not in WINDOWS:
+            return Response({"error": "Invalid window."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "Invalid page."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_page(window, offset=(page - 1) * page_size, limit=page_size))
+
+
+class LeaderboardRankView(APIView):
+    """ The logged-in user's own position, without loading the ranking. """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        from users.leaderboard import WINDOWS, get_user_rank
+
+        window = request.query_params.get('window', 'all')
+        if window not in WINDOWS:
+            return Response({"error": "Invalid window."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_user_rank(request.user, window))
     
     
 class StudentPortfolioView(APIView):
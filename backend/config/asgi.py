@@ -12,6 +12,9 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from config.middleware import TokenAuthMiddleware 
 import users.routing
+import assessments.routing
+from users.activity import start_background_flusher
+from users.leaderboard import start_background_reloader
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -19,7 +22,12 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": TokenAuthMiddleware(
         URLRouter(
-            users.routing.websocket_urlpatterns
+            users.routing.websocket_urlpatterns + assessments.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
+
+# Drains the buffered last_activity / presence writes (see users.activity)
+start_background_flusher()
+# Re-reads rank indexes past their TTL off the request path (see users.leaderboard)
+start_background_reloader()
@@ -1,26 +1,114 @@
+import time
+from urllib.parse import unquote_plus
+
 from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import get_user_model
 
+from .lru import TTLCache
+
 User = get_user_model()
 
+# Fields copied into the cached snapshot; enough for the consumers and for
+# using the rebuilt instance as a ForeignKey value.
+SNAPSHOT_FIELDS = ('id', 'username', 'full_name', 'role', 'is_active', 'is_staff', 'mentor_id')
+
+# from_db() wants the loaded fields in model order
+_SNAPSHOT_ATTNAMES = tuple(f.attname for f in User._meta.concrete_fields if f.attname in SNAPSHOT_FIELDS)
+
+# Validated token jti -> user snapshot. Bounded so a reconnect storm can't grow it forever.
+_token_cache = TTLCache(
+    maxsize=getattr(settings, 'WS_AUTH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'WS_AUTH_CACHE_TTL', 300),
+)
+
+
+def _auth_version_key(user_id):
+    return f"ws_auth_version:{user_id}"
+
+
+def bump_auth_version(user_id):
+    """
+    Invalidates every cached snapshot of this user (on all workers sharing
+    the cache). users.signals calls it when a saved user is deactivated,
+    changes role or is deleted.
+
+    QuerySet.update() sends no signals: code that changes role or is_active
+    that way must call this for each affected id, or sockets keep the old
+    identity until WS_AUTH_CACHE_TTL runs out.
+    """
+    key = _auth_version_key(user_id)
+    # Seed with a timestamp so an evicted counter can't come back as an old value
+    if not cache.add(key, time.time_ns(), timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def parse_query_string(query_string):
+    """
+    Splits on the first "=" only (tokens may contain "=") and skips the
+    percent-decoding work unless the value actually needs it.
+    """
+    params = {}
+    for pair in query_string.split("&"):
+        key, sep, value = pair.partition("=")
+        if not sep:
+            continue
+        if "%" in value or "+" in value:
+            value = unquote_plus(value)
+        params.setdefault(key, value)
+    return params
+
+
+def _user_from_snapshot(snapshot):
+    # Built the way a .only(*SNAPSHOT_FIELDS) row is: every other field is
+    # deferred rather than defaulted, so a save() can't overwrite the row
+    # with model defaults
+    return User.from_db('default', _SNAPSHOT_ATTNAMES, [snapshot[field] for field in _SNAPSHOT_ATTNAMES])
+
+
 @database_sync_to_async
-def get_user(token_key):
+def _load_snapshot(user_id):
+    return User.objects.filter(id=user_id, is_active=True).values(*SNAPSHOT_FIELDS).first()
+
+
+async def get_user(token_key):
+    if not token_key:
+        return AnonymousUser()
     try:
+        # Signature/expiry check is cheap CPU work; the DB hit is what we cache
         token = AccessToken(token_key)
         user_id = token['user_id']
-        return User.objects.get(id=user_id)
-    except Exception:
+        jti = token['jti']
+    except (TokenError, KeyError):
         return AnonymousUser()
 
+    version = await cache.aget(_auth_version_key(user_id))
+    cached = _token_cache.get(jti)
+    if cached is not None and cached['version'] == version:
+        return _user_from_snapshot(cached['user'])
+
+    snapshot = await _load_snapshot(user_id)
+    if snapshot is None:
+        return AnonymousUser()
+
+    # Never keep a snapshot past the token's own expiry
+    ttl = min(_token_cache.ttl, token['exp'] - time.time())
+    _token_cache.set(jti, {'user': snapshot, 'version': version}, ttl=ttl)
+    return _user_from_snapshot(snapshot)
+
 class TokenAuthMiddleware:
     def __init__(self, inner):
         self.inner = inner
 
     async def __call__(self, scope, receive, send):
-        query_string = scope.get("query_string", b"").decode()
-        query_params = dict(qp.split("=") for qp in query_string.split("&") if "=" in qp)
+        query_params = parse_query_string(scope.get("query_string", b"").decode())
         token_key = query_params.get("token")
         scope['user'] = await get_user(token_key)
-        return await self.inner(scope, receive, send)
\ No newline at end of file
+        return await self.inner(scope, receive, send)
@@ -32,6 +32,33 @@ environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 
 
 OPENAI_API_KEY = env('OPENAI_API_KEY')
+# Pooled OpenAI clients (assessments.llm): timeouts in seconds, pool size,
+# and how many completions may be in flight per process before callers queue.
+OPENAI_BASE_URL = env('OPENAI_BASE_URL', default=None)
+OPENAI_TIMEOUT = env.float('OPENAI_TIMEOUT', default=30.0)
+OPENAI_CONNECT_TIMEOUT = env.float('OPENAI_CONNECT_TIMEOUT', default=5.0)
+OPENAI_MAX_RETRIES = env.int('OPENAI_MAX_RETRIES', default=2)
+OPENAI_MAX_CONNECTIONS = env.int('OPENAI_MAX_CONNECTIONS', default=20)
+AI_MENTOR_MAX_CONCURRENCY = env.int('AI_MENTOR_MAX_CONCURRENCY', default=20)
+AI_MENTOR_QUEUE_TIMEOUT = env.float('AI_MENTOR_QUEUE_TIMEOUT', default=10.0)
+# Per-worker cache of mentor answers (assessments.mentor_cache)
+AI_MENTOR_CACHE_SIZE = env.int('AI_MENTOR_CACHE_SIZE', default=2000)
+AI_MENTOR_CACHE_TTL = env.int('AI_MENTOR_CACHE_TTL', default=6 * 60 * 60)
+# Mentor prompt assembly (assessments.prompting), in estimated tokens
+AI_MENTOR_PROMPT_BUDGET = env.int('AI_MENTOR_PROMPT_BUDGET', default=2000)
+AI_MENTOR_SUMMARY_BUDGET = env.int('AI_MENTOR_SUMMARY_BUDGET', default=300)
+AI_MENTOR_MAX_TURN_TOKENS = env.int('AI_MENTOR_MAX_TURN_TOKENS', default=400)
+# Mentor LLM backend (assessments.llm): 'openai', 'local' (deterministic, offline)
+# or a dotted path to a provider class. The local one sleeps LATENCY seconds before
+# the first token, then emits TOKEN_RATE tokens/sec (0 = instantly).
+AI_MENTOR_PROVIDER = env('AI_MENTOR_PROVIDER', default='openai')
+AI_MENTOR_MODEL = env('AI_MENTOR_MODEL', default='gpt-3.5-turbo')
+AI_MENTOR_LOCAL_LATENCY = env.float('AI_MENTOR_LOCAL_LATENCY', default=0.0)
+AI_MENTOR_LOCAL_TOKEN_RATE = env.float('AI_MENTOR_LOCAL_TOKEN_RATE', default=0)
+# Row cap for one cohort upload (assessments.ingest)
+BULK_ASSESSMENT_MAX_ROWS = env.int('BULK_ASSESSMENT_MAX_ROWS', default=20000)
+# Ranked path matches shown on the dashboard and library (assessments.catalog)
+PATH_MATCH_TOP_K = env.int('PATH_MATCH_TOP_K', default=3)
 
 
 # Quick-start development settings - unsuitable for production
@@ -110,6 +137,20 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache (presence store, etc.). Point CACHE_URL at Redis in production
+# so every Daphne worker sees the same state, e.g. redis://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Chat write-behind (see users.chatlog): sockets get ids/timestamps immediately
+# and rows are persisted in micro-batches. Required when it is on: a
+# CHAT_WORKER_ID (0-127) unique to each worker process across every host, so
+# generated message ids never collide. Turning it off again on Postgres needs
+# `manage.py reset_message_sequence` first (system check users.E003).
+CHAT_WRITE_BEHIND = env.bool('CHAT_WRITE_BEHIND', default=False)
+CHAT_WORKER_ID = env.int('CHAT_WORKER_ID', default=None)
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -179,6 +220,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
+# Message history cursors are returned as headers
+CORS_EXPOSE_HEADERS = ['X-Before-Cursor', 'X-Since-Cursor', 'X-Has-More']
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Drains the buffered last_activity / presence writes (see users.activity)
+from users.activity import start_background_flusher
+start_background_flusher()
+
+# Re-reads rank indexes past their TTL off the request path (see users.leaderboard)
+from users.leaderboard import start_background_reloader
+start_background_reloader()
@@ -0,0 +1,110 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, When, Value, DateTimeField
+from django.utils import timezone
+
+from .presence import presence
+
+logger = logging.getLogger(__name__)
+
+# Record at most one last_activity per user per RESOLUTION seconds
+RESOLUTION = getattr(settings, 'ACTIVITY_RESOLUTION', 30)
+FLUSH_INTERVAL = getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 10)
+
+
+class ActivityBuffer:
+    """
+    Process-local buffer for CustomUser.last_activity.
+
+    Requests only touch a dict; a flusher writes everything collected since
+    the last flush with a single UPDATE ... CASE. `stats` counts how many
+    writes were coalesced away.
+    """
+
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self._lock = threading.Lock()
+        self._pending = {}          # user_id -> datetime to write
+        self._last_recorded = {}    # user_id -> monotonic time of the last accepted record
+        self.stats = {"recorded": 0, "coalesced": 0, "flushes": 0, "rows_written": 0}
+
+    def record(self, user_id):
+        """Returns True when the hit was buffered, False when it was coalesced."""
+        mono = time.monotonic()
+        with self._lock:
+            if mono - self._last_recorded.get(user_id, float('-inf')) < self.resolution:
+                self.stats["coalesced"] += 1
+                return False
+            self._last_recorded[user_id] = mono
+            self._pending[user_id] = timezone.now()
+            self.stats["recorded"] += 1
+            return True
+
+    def flush(self):
+        from .models import CustomUser
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            # Forget users whose window has passed so the dict stays bounded
+            cutoff = time.monotonic() - self.resolution
+            self._last_recorded = {uid: t for uid, t in self._last_recorded.items() if t > cutoff}
+        if not pending:
+            return 0
+
+        CustomUser.objects.filter(id__in=pending.keys()).update(
+            last_activity=Case(
+                *[When(id=uid, then=Value(ts)) for uid, ts in pending.items()],
+                output_field=DateTimeField(),
+            )
+        )
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(pending)
+        return len(pending)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))
+
+
+activity_buffer = ActivityBuffer()
+
+
+def flush_all():
+    """Writes out every buffered users-table update (activity + presence)."""
+    written = 0
+    for buffer in (activity_buffer, presence):
+        try:
+            written += buffer.flush()
+        except Exception:
+            logger.exception("Buffered user write failed")
+    return written
+
+
+_flusher_started = False
+
+
+def start_background_flusher(interval=FLUSH_INTERVAL):
+    """
+    Starts the daemon thread that drains the buffers every `interval` seconds.
+    Called from the ASGI/WSGI entrypoints only, so tests and management
+    commands never have a thread writing behind their back.
+    """
+    global _flusher_started
+    if _flusher_started:
+        return
+    _flusher_started = True
+
+    def run():
+        while True:
+            time.sleep(interval)
+            flush_all()
+            close_old_connections()
+
+    threading.Thread(target=run, name="user-write-flusher", daemon=True).start()
+    atexit.register(flush_all)
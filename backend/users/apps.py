@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from django.core import checks
+        from .chatlog import check_message_sequence, check_worker_id
+
+        import users.signals
+        checks.register(check_worker_id)
+        checks.register(check_message_sequence, checks.Tags.database)
@@ -0,0 +1,294 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'CHAT_WRITE_BEHIND_BATCH_SIZE', 200)
+FLUSH_INTERVAL = getattr(settings, 'CHAT_WRITE_BEHIND_INTERVAL', 0.2)
+
+# A row that keeps failing is dropped from the queue after this many flushes
+MAX_ROW_ATTEMPTS = getattr(settings, 'CHAT_WRITE_BEHIND_MAX_ATTEMPTS', 5)
+
+# Message ids: 40 bits of milliseconds since EPOCH_MS (until 2058), 7 bits of
+# worker id, 6 bits of per-millisecond sequence. 53 bits in all, so they stay
+# exact as JavaScript numbers; they sort by time and sit far above any
+# auto-increment id already in the table.
+#
+# Turning write-behind back off hands ids back to the database. SQLite and
+# MySQL continue past MAX(id) on their own, but a Postgres identity sequence
+# would restart far below the generated ids - and below every read mark built
+# from them, so new messages would count as read. check_message_sequence
+# flags that and `manage.py reset_message_sequence` moves the sequence past
+# MAX(id).
+EPOCH_MS = 1704067200000  # 2024-01-01
+WORKER_BITS = 7
+SEQUENCE_BITS = 6
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+
+
+def write_behind_enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+def flush_before_read():
+    """
+    Writes out this process's pending messages before a reader is handed the
+    thread's latest id, as a read mark or a ?since= cursor. Otherwise a pending
+    row (id 100) lands after a stored one (id 101) was seen, below the mark
+    and the cursor, and is never shown as unread or returned to the poller.
+
+    Pending rows of *other* workers can still land up to FLUSH_INTERVAL (plus
+    the flush itself) behind a newer stored id; that window is accepted.
+    """
+    if write_behind_enabled():
+        chat_writer.flush()
+
+
+def check_worker_id(app_configs, **kwargs):
+    """System check: write-behind refuses to start without an explicit worker id."""
+    from django.core import checks
+
+    worker_id = getattr(settings, 'CHAT_WORKER_ID', None)
+    if not write_behind_enabled():
+        return []
+    if worker_id is None:
+        return [checks.Error(
+            "CHAT_WRITE_BEHIND is on but CHAT_WORKER_ID is not set.",
+            hint="Give every worker process a distinct CHAT_WORKER_ID so message ids never collide.",
+            id='users.E001',
+        )]
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        return [checks.Error(f"CHAT_WORKER_ID must be between 0 and {MAX_WORKER_ID}.", id='users.E002')]
+    return []
+
+
+def check_message_sequence(app_configs, databases=None, **kwargs):
+    """Database check (migrate, check --database): the id sequence must be past MAX(id)."""
+    from django.core import checks
+    from django.db import connections
+
+    from .models import Message
+
+    if write_behind_enabled():
+        return []
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            continue
+        table = Message._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            sequence = cursor.fetchone()[0]
+            if sequence is None:
+                continue
+            cursor.execute(f"SELECT last_value, is_called FROM {sequence}")
+            last_value, is_called = cursor.fetchone()
+            cursor.execute(f"SELECT MAX(id) FROM {connection.ops.quote_name(table)}")
+            max_id = cursor.fetchone()[0]
+        if max_id is not None and max_id >= last_value + int(is_called):
+            errors.append(checks.Error(
+                f"The {table} id sequence ({alias}) is behind MAX(id), left there by chat write-behind.",
+                hint="Run `manage.py reset_message_sequence` before serving with CHAT_WRITE_BEHIND off.",
+                id='users.E003',
+            ))
+    return errors
+
+
+class MessageIdGenerator:
+    def __init__(self, worker_id):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ImproperlyConfigured(f"CHAT_WORKER_ID must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            # Never step back if the wall clock does
+            ms = max(int(time.time() * 1000) - EPOCH_MS, self._last_ms)
+            if ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # 64 ids in one millisecond: borrow the next one
+                    ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = ms
+            return (ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+class ChatWriter:
+    """
+    Write-behind buffer for chat messages.
+
+    submit() builds the Message with its final id and created_at and returns
+    it straight away, so the consumer can broadcast before anything hits the
+    database. flush() persists everything pending with one bulk_create and one
+    Thread.updated_at UPDATE. If the batch fails its rows are retried one by
+    one, so a single bad row can't hold up the rest; rows still failing after
+    MAX_ROW_ATTEMPTS flushes are logged and moved to `dead_letters`.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, autostart=True, worker_id=None):
+        self.batch_size = batch_size
+        self.interval = interval
+        # The flusher thread starts on first submit; tests pass autostart=False and flush by hand
+        self.autostart = autostart
+        self.worker_id = worker_id
+        self._ids = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._attempts = {}
+        self.dead_letters = deque(maxlen=1000)
+        self._wake = threading.Event()
+        self._flusher = None
+        self.stats = {"submitted": 0, "flushes": 0, "rows_written": 0, "failed_flushes": 0, "dead_lettered": 0}
+
+    @property
+    def ids(self):
+        # Resolved on first use so only processes that generate ids need a worker id
+        if self._ids is None:
+            worker_id = self.worker_id
+            if worker_id is None:
+                worker_id = getattr(settings, 'CHAT_WORKER_ID', None)
+            if worker_id is None:
+                raise ImproperlyConfigured(
+                    "CHAT_WRITE_BEHIND needs a CHAT_WORKER_ID that is unique to this worker process"
+                )
+            self._ids = MessageIdGenerator(worker_id)
+        return self._ids
+
+    def submit(self, thread_id, sender, content):
+        from .models import Message
+
+        message = Message(
+            id=self.ids.next_id(), thread_id=thread_id, sender=sender,
+            content=content, created_at=timezone.now(),
+        )
+        with self._lock:
+            self._pending.append(message)
+            self.stats["submitted"] += 1
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+        return message
+
+    def flush(self):
+        from .models import Message, Thread
+
+        # One flush at a time so a re-queued row keeps its place in line
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    Message.objects.bulk_create(batch, batch_size=500)
+                    Thread.objects.filter(id__in={m.thread_id for m in batch}).update(updated_at=timezone.now())
+                written, retry = batch, []
+            except Exception:
+                logger.warning("Chat write-behind batch of %d failed; retrying row by row", len(batch), exc_info=True)
+                written, retry = self._write_rows(batch)
+                with self._lock:
+                    self.stats["failed_flushes"] += 1
+
+            with self._lock:
+                self._pending[:0] = retry
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(written)
+            for message in written:
+                self._attempts.pop(message.id, None)
+            return len(written)
+
+    def _write_rows(self, batch):
+        """(written, retry) after trying each row in its own transaction."""
+        written, retry = [], []
+        for message in batch:
+            try:
+                if self._write_row(message):
+                    written.append(message)
+                    continue
+            except Exception:
+                logger.warning("Chat write-behind row %s failed", message.id, exc_info=True)
+
+            attempts = self._attempts.get(message.id, 0) + 1
+            if attempts >= MAX_ROW_ATTEMPTS:
+                self._attempts.pop(message.id, None)
+                self.dead_letters.append(message)
+                with self._lock:
+                    self.stats["dead_lettered"] += 1
+                logger.error(
+                    "Chat write-behind dropped message %s (thread %s) after %d attempts",
+                    message.id, message.thread_id, attempts,
+                )
+            else:
+                self._attempts[message.id] = attempts
+                retry.append(message)
+        return written, retry
+
+    def _write_row(self, message):
+        """True once the row is stored; raises if it can't be."""
+        from .models import Message, Thread
+
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create([message])
+                Thread.objects.filter(id=message.thread_id).update(updated_at=timezone.now())
+            return True
+        except IntegrityError:
+            existing = Message.objects.filter(id=message.id).values_list('thread_id', 'sender_id', 'content').first()
+            if existing is None:
+                raise
+            if existing == (message.thread_id, message.sender_id, message.content):
+                # An earlier attempt did commit
+                return True
+            # Another process used this id (misconfigured CHAT_WORKER_ID); never overwrite its row
+            old_id, message.id = message.id, self.ids.next_id()
+            # The row's failed attempts follow it to the new id
+            if old_id in self._attempts:
+                self._attempts[message.id] = self._attempts.pop(old_id)
+            logger.error("Chat message id %s already taken; re-issued as %s", old_id, message.id)
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))
+
+    def _ensure_flusher(self):
+        if not self.autostart or self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+        self._flusher.start()
+        atexit.register(self._flush_quietly)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_quietly()
+            close_old_connections()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Chat write-behind flush failed")
+
+
+chat_writer = ChatWriter()
@@ -1,9 +1,14 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from .models import Thread, Message
+from .realtime import user_group_name
+from .presence import presence
+from .chatlog import chat_writer, flush_before_read, write_behind_enabled
 
 User = get_user_model()
 
@@ -11,8 +16,11 @@ class PresenceConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
         if self.user.is_authenticated:
+            # Each socket only listens on its owner's group, so events are
+            # routed by the channel layer instead of filtered here.
+            self.user_group_name = user_group_name(self.user.id)
             await self.update_user_status(True)
-            await self.channel_layer.group_add("presence_tracking", self.channel_name)
+            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
             await self.accept()
         else:
             await self.close()
@@ -20,51 +28,68 @@ class PresenceConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         if self.user.is_authenticated:
             await self.update_user_status(False)
-            await self.channel_layer.group_discard("presence_tracking", self.channel_name)
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
 
     # Handler for the "Bell" icon updates
     async def bell_notification(self, event):
-        if str(self.user.id) == event["recipient_id"]:
-            await self.send(text_data=json.dumps({
-                "type": "UPDATE_BELL_COUNT",
-                "message": event["message"]
-            }))
+        await self.send(text_data=json.dumps({
+            "type": "UPDATE_BELL_COUNT",
+            "message": event["message"]
+        }))
 
     async def task_notification(self, event):
-        if str(self.user.id) == event["recipient_id"]:
-            await self.send(text_data=json.dumps({
-                "type": "NEW_TASK_ASSIGNED",
-                "message": event["message"],
-                "mentor": event["mentor_name"]
-            }))
+        await self.send(text_data=json.dumps({
+            "type": "NEW_TASK_ASSIGNED",
+            "message": event["message"],
+            "mentor": event["mentor_name"]
+        }))
 
-    @database_sync_to_async
-    def update_user_status(self, is_online):
-        User.objects.filter(id=self.user.id).update(
-            is_online_status=is_online,
-            last_seen=timezone.now() if not is_online else self.user.last_seen,
-            last_activity=timezone.now()
-        )
+    async def update_user_status(self, is_online):
+        # Refcounted in the presence store: a second tab closing keeps the user online
+        if is_online:
+            await sync_to_async(presence.connect)(self.user.id)
+        else:
+            await sync_to_async(presence.disconnect)(self.user.id)
+        if presence.flush_due():
+            await database_sync_to_async(presence.flush)()
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Read state is a high-water mark per participant (Thread.*_last_read_id).
+    Marks are advanced at most once per CHAT_READ_RECEIPT_DEBOUNCE seconds per
+    connection, so a fast conversation costs one UPDATE and one receipt per
+    window instead of one of each per message.
+    """
+
     async def connect(self):
         self.thread_id = self.scope['url_route']['kwargs']['thread_id']
         self.thread_group_name = f'chat_{self.thread_id}'
         self.user = self.scope["user"]
+        self.pending_read_id = 0
+        self.receipt_task = None
 
-        if self.user.is_authenticated:
-            await self.channel_layer.group_add(self.thread_group_name, self.channel_name)
-            await self.accept()
-            # Mark messages as read the moment we join the chat
-            await self.mark_messages_as_read()
-            # Notify the other person that we've seen their messages
-            await self.channel_layer.group_send(
-                self.thread_group_name, {"type": "messages_read_receipt"}
-            )
-        else:
+        if not self.user.is_authenticated:
             await self.close()
+            return
+
+        self.thread = await self.get_thread()
+        if self.thread is None or self.user.id not in (self.thread.student_id, self.thread.mentor_id):
+            await self.close()
+            return
+
+        await self.channel_layer.group_add(self.thread_group_name, self.channel_name)
+        await self.accept()
+        # Mark messages as read the moment we join the chat
+        await self.read_up_to(await self.latest_message_id(), immediate=True)
 
     async def disconnect(self, close_code):
+        if write_behind_enabled():
+            # Don't let a closing socket leave its last messages only in memory
+            await self.flush_pending_messages()
+        if self.receipt_task is not None:
+            self.receipt_task.cancel()
+            self.receipt_task = None
+            await self.flush_read_mark()
         await self.channel_layer.group_discard(self.thread_group_name, self.channel_name)
 
     async def receive(self, text_data):
@@ -75,10 +100,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # Handle explicit "I have read these" signal from frontend
         if data.get('type') == 'read_messages':
-            await self.mark_messages_as_read()
-            await self.channel_layer.group_send(
-                self.thread_group_name, {"type": "messages_read_receipt"}
-            )
+            read_id = await self.clamp_read_id(data.get('last_read_id'))
+            if read_id is not None:
+                await self.read_up_to(read_id)
             return
 
         content = data.get('message')
@@ -90,14 +114,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         message = event['message']
-        # Also mark as read if the recipient is currently connected to this socket
-        # This handles the "I'm looking at the screen while you type" blue tick
+        # The recipient is looking at the screen, so it counts as read;
+        # debounced so a burst of messages yields a single receipt
         if message['sender_username'] != self.user.username:
-            await self.mark_messages_as_read()
-            # Send a signal back to the sender that it was seen immediately
-            await self.channel_layer.group_send(
-                self.thread_group_name, {"type": "messages_read_receipt"}
-            )
+            await self.read_up_to(message['id'])
 
         await self.send(text_data=json.dumps({
             'message': message
@@ -105,28 +125,87 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     # Handler for the Blue Ticks
     async def messages_read_receipt(self, event):
-        await self.send(text_data=json.dumps({'type': 'MESSAGES_READ'}))
+        if event['reader_id'] == str(self.user.id):
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'MESSAGES_READ',
+            'last_read_id': event['last_read_id'],
+        }))
+
+    async def clamp_read_id(self, requested):
+        """
+        The client's read mark, made safe: absent means "everything so far",
+        anything but a positive int is ignored, and it can't point past the
+        thread's latest message. read_up_to() already refuses to go backwards.
+        """
+        latest = await self.latest_message_id()
+        if requested is None:
+            return latest
+        if not isinstance(requested, int) or isinstance(requested, bool) or requested <= 0:
+            return None
+        return min(requested, latest or 0)
+
+    async def read_up_to(self, message_id, immediate=False):
+        if not message_id or message_id <= self.pending_read_id:
+            return
+        self.pending_read_id = message_id
+        if immediate:
+            await self.flush_read_mark()
+        elif self.receipt_task is None:
+            self.receipt_task = asyncio.create_task(self.flush_after_debounce())
+
+    async def flush_after_debounce(self):
+        await asyncio.sleep(getattr(settings, 'CHAT_READ_RECEIPT_DEBOUNCE', 1.0))
+        self.receipt_task = None
+        await self.flush_read_mark()
+
+    async def flush_read_mark(self):
+        mark = self.pending_read_id
+        if await self.advance_read_mark(mark):
+            await self.channel_layer.group_send(self.thread_group_name, {
+                "type": "messages_read_receipt",
+                "reader_id": str(self.user.id),
+                "last_read_id": mark,
+            })
+
+    async def heartbeat_activity(self):
+        # Throttled inside the store; no users-table write per frame
+        await sync_to_async(presence.touch)(self.user.id)
 
     @database_sync_to_async
-    def heartbeat_activity(self):
-        User.objects.filter(id=self.user.id).update(
-            is_online_status=True, last_activity=timezone.now()
-        )
+    def get_thread(self):
+        return Thread.objects.filter(id=self.thread_id).first()
 
     @database_sync_to_async
-    def mark_messages_as_read(self):
-        Message.objects.filter(
-            thread_id=self.thread_id, is_read=False
-        ).exclude(sender=self.user).update(is_read=True)
+    def latest_message_id(self):
+        # Read marks are built from this id, so this worker's queued rows go in first
+        flush_before_read()
+        return Message.objects.filter(thread_id=self.thread_id).order_by('-id').values_list('id', flat=True).first()
 
     @database_sync_to_async
-    def save_message(self, content):
-        thread = Thread.objects.get(id=self.thread_id)
-        msg = Message.objects.create(thread=thread, sender=self.user, content=content)
+    def advance_read_mark(self, message_id):
+        return self.thread.advance_read_mark(self.user.id, message_id)
+
+    async def save_message(self, content):
+        if write_behind_enabled():
+            # Id and timestamp are final now; the row lands with the next batch
+            msg = chat_writer.submit(self.thread_id, self.user, content)
+        else:
+            msg = await self.create_message(content)
         return {
             'id': msg.id,
             'content': msg.content,
-            'sender_username': msg.sender.username,
+            'sender_username': self.user.username,
             'created_at': msg.created_at.isoformat(),
-            'is_read': msg.is_read
-        }
\ No newline at end of file
+            'is_read': False
+        }
+
+    @database_sync_to_async
+    def create_message(self, content):
+        msg = Message.objects.create(thread_id=self.thread_id, sender=self.user, content=content)
+        Thread.objects.filter(id=self.thread_id).update(updated_at=msg.created_at)
+        return msg
+
+    @database_sync_to_async
+    def flush_pending_messages(self):
+        chat_writer.flush()
@@ -0,0 +1,316 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from assessments.catalog import bump_version_now_and_on_commit
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = ('all', 'week', 'month')
+# How long a worker trusts its in-memory rank index before re-reading it.
+# Writes made by this worker are applied to the index immediately.
+RANK_INDEX_TTL = getattr(settings, 'LEADERBOARD_RANK_INDEX_TTL', 30)
+# How often the background reloader looks for indexes past their TTL
+RANK_RELOAD_INTERVAL = getattr(settings, 'LEADERBOARD_RANK_RELOAD_INTERVAL', 5)
+# Bumped by batch writers so every worker re-reads its indexes, TTL or not
+RANK_VERSION_KEY = "leaderboard:version"
+
+
+def period_for(window, when=None):
+    when = timezone.localtime(when or timezone.now())
+    if window == 'week':
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    if window == 'month':
+        return when.strftime('%Y-%m')
+    return 'all'
+
+
+def period_start(window, when=None):
+    """Local midnight opening the week (Monday) or month that contains `when`."""
+    when = timezone.localtime(when or timezone.now())
+    start = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == 'week':
+        return start - timedelta(days=start.weekday())
+    if window == 'month':
+        return start.replace(day=1)
+    return None
+
+
+def _latest_trait_subquery(user_ref):
+    from assessments.models import AssessmentResult
+    return Subquery(
+        AssessmentResult.objects.filter(user=OuterRef(user_ref)).order_by('-created_at').values('top_trait')[:1]
+    )
+
+
+def _scores_queryset(window, period):
+    """(user_id, xp) rows for ranked students in a window."""
+    from .models import CustomUser, LeaderboardEntry
+
+    if window == 'all':
+        return CustomUser.objects.filter(role='STUDENT').values_list('id', 'xp_total')
+    return LeaderboardEntry.objects.filter(
+        window=window, period=period, user__role='STUDENT'
+    ).values_list('user_id', 'xp')
+
+
+class RankIndex:
+    """
+    Sorted XP values for one (window, period). rank_of() is a bisect, so a
+    "my rank" lookup is O(log n) no matter how many students there are.
+    """
+
+    def __init__(self, scores, version=None):
+        self.scores = sorted(scores)
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def rank_of(self, xp):
+        # 1 + number of students strictly ahead
+        with self._lock:
+            return len(self.scores) - bisect.bisect_right(self.scores, xp) + 1
+
+    def move(self, old_xp, new_xp):
+        # Requests of this worker move scores concurrently; the delete and insort go together
+        with self._lock:
+            if old_xp is not None:
+                i = bisect.bisect_left(self.scores, old_xp)
+                if i < len(self.scores) and self.scores[i] == old_xp:
+                    del self.scores[i]
+            bisect.insort(self.scores, new_xp)
+
+    def is_stale(self, version):
+        return self.version != version or time.monotonic() - self.loaded_at > RANK_INDEX_TTL
+
+    def __len__(self):
+        with self._lock:
+            return len(self.scores)
+
+
+_indexes = {}
+_reload_locks = {}   # (window, period) -> Lock held by whoever is re-reading that ranking
+_lock = threading.Lock()
+_reloader_started = False
+
+
+def _reload_lock(key):
+    with _lock:
+        return _reload_locks.setdefault(key, threading.Lock())
+
+
+def get_rank_version():
+    return cache.get(RANK_VERSION_KEY)
+
+
+def invalidate_rank_indexes():
+    """Call after writes that move many scores at once, or behind record_xp's back."""
+    bump_version_now_and_on_commit(RANK_VERSION_KEY)
+
+
+def _load(window, period):
+    # Version read first: a bump landing during the read leaves the index stale
+    version = get_rank_version()
+    index = RankIndex((xp for _, xp in _scores_queryset(window, period)), version)
+    with _lock:
+        # Drop indexes of past periods while we're here
+        for stale in [k for k in _indexes if k[0] == window and k[1] != period]:
+            del _indexes[stale]
+            _reload_locks.pop(stale, None)
+        _indexes[(window, period)] = index
+    return index
+
+
+def get_rank_index(window, period=None):
+    """
+    This worker's index for a window. Only a cold start reads the ranking
+    inside the request; a stale index keeps serving while the background
+    reloader (or, without one, a single request) re-reads it.
+    """
+    period = period or period_for(window)
+    key = (window, period)
+    version = get_rank_version()
+    index = _indexes.get(key)
+    if index is not None and not index.is_stale(version):
+        return index
+
+    reload_lock = _reload_lock(key)
+    if index is None:
+        reload_lock.acquire()
+    elif _reloader_started or not reload_lock.acquire(blocking=False):
+        return index
+    try:
+        current = _indexes.get(key)
+        if current is not None and current is not index and not current.is_stale(version):
+            # Loaded by whoever held the lock before us
+            return current
+        return _load(window, period)
+    finally:
+        reload_lock.release()
+
+
+def reload_stale_indexes():
+    """Re-reads every index past its TTL or version; the stale one serves until the swap."""
+    version = get_rank_version()
+    with _lock:
+        keys = [key for key, index in _indexes.items() if index.is_stale(version)]
+    for window, period in keys:
+        if period != period_for(window):
+            # A new week or month began; get_rank_index loads the new one on first use
+            with _lock:
+                _indexes.pop((window, period), None)
+            continue
+        with _reload_lock((window, period)):
+            _load(window, period)
+    return len(keys)
+
+
+def start_background_reloader(interval=RANK_RELOAD_INTERVAL):
+    """
+    Starts the daemon thread that keeps this worker's rank indexes fresh, so
+    requests never wait on a full re-read. Called from the ASGI/WSGI
+    entrypoints only; elsewhere get_rank_index reloads lazily.
+    """
+    global _reloader_started
+    if _reloader_started:
+        return
+    _reloader_started = True
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                reload_stale_indexes()
+            except Exception:
+                logger.exception("Rank index reload failed")
+            close_old_connections()
+
+    threading.Thread(target=run, name="rank-index-reloader", daemon=True).start()
+
+
+def record_xp(user, amount, when=None):
+    """
+    Adds `amount` to the user's weekly and monthly buckets with an atomic
+    F() increment, and keeps this worker's rank indexes in step.
+    Expects user.xp_total to already include `amount`.
+    """
+    from .models import LeaderboardEntry
+
+    created = {}
+    for window in ('week', 'month'):
+        filters = {'user_id': user.id, 'window': window, 'period': period_for(window, when)}
+        created[window] = False
+        if not LeaderboardEntry.objects.filter(**filters).update(xp=F('xp') + amount):
+            try:
+                with transaction.atomic():
+                    LeaderboardEntry.objects.create(xp=amount, **filters)
+                created[window] = True
+            except IntegrityError:
+                # Another request created the bucket first
+                LeaderboardEntry.objects.filter(**filters).update(xp=F('xp') + amount)
+
+    if user.role != 'STUDENT':
+        return
+
+    # In-process indexes only; other workers catch up within RANK_INDEX_TTL
+    index = _indexes.get(('all', 'all'))
+    if index is not None:
+        index.move(user.xp_total - amount, user.xp_total)
+
+    for window in ('week', 'month'):
+        period = period_for(window, when)
+        index = _indexes.get((window, period))
+        if index is None:
+            continue
+        new_xp = LeaderboardEntry.objects.filter(
+            user_id=user.id, window=window, period=period
+        ).values_list('xp', flat=True).first() or 0
+        index.move(None if created[window] else new_xp - amount, new_xp)
+
+
+def record_xp_many(amounts, when=None):
+    """
+    Batch form of record_xp for {user_id: amount}, used by bulk XP grants.
+    Updates existing buckets one UPDATE per distinct amount and bulk-inserts
+    the missing ones, then has every worker re-read its rank indexes.
+    """
+    from .models import LeaderboardEntry
+
+    amounts = {user_id: amount for user_id, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    for window in ('week', 'month'):
+        period = period_for(window, when)
+        bucket = LeaderboardEntry.objects.filter(window=window, period=period)
+        existing = set(bucket.filter(user_id__in=amounts).values_list('user_id', flat=True))
+
+        by_amount = {}
+        for user_id in existing:
+            by_amount.setdefault(amounts[user_id], []).append(user_id)
+        for amount, user_ids in by_amount.items():
+            bucket.filter(user_id__in=user_ids).update(xp=F('xp') + amount)
+
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(user_id=user_id, window=window, period=period, xp=amount)
+            for user_id, amount in amounts.items() if user_id not in existing
+        ], batch_size=2000)
+
+    # Many scores moved at once; cheaper to re-read than to move them one by one
+    invalidate_rank_indexes()
+
+
+def get_page(window='all', offset=0, limit=10):
+    """One query: a page of the ranking with each student's latest trait joined in."""
+    from .models import CustomUser, LeaderboardEntry
+
+    if window == 'all':
+        rows = CustomUser.objects.filter(role='STUDENT').order_by('-xp_total', 'id').annotate(
+            latest_trait=_latest_trait_subquery('pk')
+        )[offset:offset + limit]
+        entries = [(u, u.xp_total, u.latest_trait) for u in rows]
+    else:
+        rows = LeaderboardEntry.objects.filter(
+            window=window, period=period_for(window), user__role='STUDENT'
+        ).select_related('user').order_by('-xp', 'user_id').annotate(
+            latest_trait=_latest_trait_subquery('user_id')
+        )[offset:offset + limit]
+        entries = [(e.user, e.xp, e.latest_trait) for e in rows]
+
+    return [{
+        "rank": offset + position + 1,
+        "username": u.username,
+        "xp": xp,
+        "level": u.level,
+        "top_trait": trait or "N/A",
+        "full_name": u.full_name,
+    } for position, (u, xp, trait) in enumerate(entries)]
+
+
+def get_user_rank(user, window='all'):
+    from .models import LeaderboardEntry
+
+    period = period_for(window)
+    if window == 'all':
+        xp = user.xp_total
+    else:
+        xp = LeaderboardEntry.objects.filter(
+            user_id=user.id, window=window, period=period
+        ).values_list('xp', flat=True).first() or 0
+
+    index = get_rank_index(window, period)
+    return {
+        "window": window,
+        "period": period,
+        "xp": xp,
+        "rank": index.rank_of(xp) if user.role == 'STUDENT' else None,
+        "total": len(index),
+    }
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.chatlog import MAX_WORKER_ID, ChatWriter
+from users.models import Thread, Message
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: chat message persistence throughput (messages/sec per worker), direct vs write-behind'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=5000, help='Messages to persist per mode')
+        parser.add_argument('--threads', type=int, default=50, help='Threads to spread the messages over')
+        parser.add_argument('--batch', type=int, default=200, help='Write-behind batch size')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            threads = self.seed(options['threads'])
+            self.run_direct(threads, options['messages'])
+            self.run_write_behind(threads, options['messages'], options['batch'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Seeded rows rolled back (use --keep to retain them).'))
+
+    def seed(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        mentor = User.objects.create(username="bench_chat_mentor", email="bench_chat_mentor@bench.local",
+                                     password=password, role='MENTOR')
+        students = User.objects.bulk_create([
+            User(username=f"bench_chat_{i}", email=f"bench_chat_{i}@bench.local", password=password, role='STUDENT')
+            for i in range(count)
+        ])
+        return Thread.objects.bulk_create([Thread(student=s, mentor=mentor) for s in students])
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<13} {count} messages in {elapsed:.2f}s -> {count / elapsed:,.0f} msg/s")
+
+    def run_direct(self, threads, count):
+        # What the consumer does with write-behind off: one INSERT + one thread bump per frame
+        start = time.perf_counter()
+        for i in range(count):
+            thread = threads[i % len(threads)]
+            msg = Message.objects.create(thread_id=thread.id, sender_id=thread.student_id, content=f"direct {i}")
+            Thread.objects.filter(id=thread.id).update(updated_at=msg.created_at)
+        self.report("direct", count, time.perf_counter() - start)
+
+    def run_write_behind(self, threads, count, batch_size):
+        # Highest worker id is kept for benchmarks so --keep rows can't clash with a live worker's
+        writer = ChatWriter(batch_size=batch_size, autostart=False, worker_id=MAX_WORKER_ID)
+        start = time.perf_counter()
+        for i in range(count):
+            thread = threads[i % len(threads)]
+            writer.submit(thread.id, thread.student, f"buffered {i}")
+            if i % batch_size == batch_size - 1:
+                writer.flush()
+        writer.flush()
+        self.report("write-behind", count, time.perf_counter() - start)
+        self.stdout.write(f"writer stats: {writer.get_stats()}")
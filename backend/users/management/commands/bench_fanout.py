@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from users.realtime import user_group_name
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: cost of one notification vs. connected sockets (global broadcast vs. per-user groups)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sockets',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 5000],
+            help='Connected-socket counts to measure',
+        )
+        parser.add_argument(
+            '--notifications',
+            type=int,
+            default=20,
+            help='Notifications sent per scenario (results are averaged)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'sockets':>8} | {'mode':<10} | {'deliveries':>10} | {'ms / notification':>17}")
+        self.stdout.write('-' * 56)
+        for count in options['sockets']:
+            for mode in ('broadcast', 'per_user'):
+                deliveries, elapsed = asyncio.run(self.run_scenario(mode, count, options['notifications']))
+                per_note_ms = elapsed / options['notifications'] * 1000
+                self.stdout.write(f"{count:>8} | {mode:<10} | {deliveries:>10} | {per_note_ms:>17.3f}")
+
+    async def run_scenario(self, mode, socket_count, notifications):
+        # In-memory layer so the numbers measure fan-out itself, not Redis round trips
+        layer = InMemoryChannelLayer(capacity=notifications + 1)
+        for i in range(socket_count):
+            channel = await layer.new_channel()
+            group = "presence_tracking" if mode == 'broadcast' else user_group_name(i)
+            await layer.group_add(group, channel)
+
+        deliveries = 0
+        start = time.perf_counter()
+        for n in range(notifications):
+            recipient = n % socket_count
+            group = "presence_tracking" if mode == 'broadcast' else user_group_name(recipient)
+            await layer.group_send(group, {"type": "bell_notification", "message": "New task assigned"})
+
+            # Every socket in the group has to pull and handle the event
+            for channel in list(layer.groups.get(group, {})):
+                await layer.receive(channel)
+                deliveries += 1
+        elapsed = time.perf_counter() - start
+
+        await layer.flush()
+        return deliveries // notifications, elapsed
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import Thread, Message
+from users.views import ThreadListView
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: ThreadListView latency and query count for a mentor with many threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=200, help='Threads in the mentor inbox')
+        parser.add_argument('--messages', type=int, default=20, help='Messages per thread')
+        parser.add_argument('--requests', type=int, default=100, help='Inbox requests to time')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mentor = self.seed(options['threads'], options['messages'])
+            self.run(mentor, options['requests'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING('Seeded rows rolled back (use --keep to retain them).'))
+
+    def seed(self, thread_count, message_count):
+        User = get_user_model()
+        password = make_password(None)
+        start = time.perf_counter()
+        mentor = User.objects.create(username="bench_inbox_mentor", email="bench_inbox_mentor@bench.local",
+                                     password=password, role='MENTOR')
+        students = User.objects.bulk_create([
+            User(username=f"bench_inbox_{i}", email=f"bench_inbox_{i}@bench.local", password=password, role='STUDENT')
+            for i in range(thread_count)
+        ], batch_size=2000)
+        threads = Thread.objects.bulk_create([Thread(student=s, mentor=mentor) for s in students], batch_size=2000)
+        Message.objects.bulk_create([
+            Message(thread=t, sender=t.student if n % 2 else mentor, content=f"message {n}")
+            for t in threads for n in range(message_count)
+        ], batch_size=2000)
+        self.stdout.write(f"Seeded {thread_count} threads x {message_count} messages in {time.perf_counter() - start:.1f}s")
+        return mentor
+
+    def run(self, mentor, requests):
+        factory = APIRequestFactory()
+        view = ThreadListView.as_view()
+
+        timings, queries = [], []
+        for _ in range(requests):
+            request = factory.get('/api/v1/users/threads/')
+            force_authenticate(request, user=mentor)
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                view(request).render()
+                timings.append((time.perf_counter() - t0) * 1000)
+            queries.append(len(ctx.captured_queries))
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms "
+            f"queries/request min={min(queries)} max={max(queries)}"
+        )
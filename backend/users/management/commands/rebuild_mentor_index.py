@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.matching import invalidate_mentor_index, mentor_tokens
+from users.models import CustomUser, MentorSkillToken
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MentorSkillToken matching index from every mentor profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help='Mentors tokenized per batch')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        mentors = CustomUser.objects.filter(role='MENTOR').only('id', 'expertise', 'job_title', 'skills').order_by('pk')
+        indexed = tokens = 0
+
+        with transaction.atomic():
+            # Also drops postings of users who are no longer mentors
+            MentorSkillToken.objects.all().delete()
+            buffer = []
+            for mentor in mentors.iterator(chunk_size=options['chunk']):
+                buffer.extend(MentorSkillToken(mentor_id=mentor.id, token=t, weight=w) for t, w in mentor_tokens(mentor).items())
+                indexed += 1
+                if indexed % options['chunk'] == 0:
+                    MentorSkillToken.objects.bulk_create(buffer, batch_size=2000)
+                    tokens += len(buffer)
+                    buffer = []
+            MentorSkillToken.objects.bulk_create(buffer, batch_size=2000)
+            tokens += len(buffer)
+            invalidate_mentor_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} mentors ({tokens} tokens) in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users import leaderboard
+from users.models import XP_PER_LEVEL, CustomUser, LeaderboardEntry, XPLedgerEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every xp_total / level and the current leaderboard buckets from the XP ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help='Users repaired per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted users')
+
+    def handle(self, *args, **options):
+        ledger = XPLedgerEntry.objects.filter(user=OuterRef('pk')).order_by().values('user')
+        true_xp = Coalesce(Subquery(ledger.annotate(total=Sum('amount')).values('total')), Value(0))
+        true_level = true_xp / XP_PER_LEVEL + 1
+
+        drifted = list(
+            CustomUser.objects.annotate(true_xp=true_xp, true_level=true_level)
+            .exclude(xp_total=F('true_xp'), level=F('true_level'))
+            .values_list('id', flat=True)
+        )
+        buckets = {window: self.drifted_buckets(window) for window in ('week', 'month')}
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} users have drifted XP totals")
+            for window, (rebuilt, emptied) in buckets.items():
+                self.stdout.write(f"{len(rebuilt) + len(emptied)} {window} buckets have drifted")
+            return
+
+        for start in range(0, len(drifted), options['chunk']):
+            with transaction.atomic():
+                CustomUser.objects.filter(id__in=drifted[start:start + options['chunk']]).update(
+                    xp_total=true_xp, level=true_level
+                )
+        for window, (rebuilt, emptied) in buckets.items():
+            self.rewrite_buckets(window, rebuilt, emptied, options['chunk'])
+
+        # All-time ranks read xp_total and the windows read the buckets; every worker re-reads
+        leaderboard.invalidate_rank_indexes()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed XP for {len(drifted)} users and "
+            f"{sum(len(r) + len(e) for r, e in buckets.values())} leaderboard buckets"
+        ))
+
+    def drifted_buckets(self, window):
+        """
+        ({user_id: xp} to rewrite, [user_id] to drop) for the current period of
+        `window`, from the ledger rows created since the period began.
+        """
+        earned = dict(
+            XPLedgerEntry.objects.filter(created_at__gte=leaderboard.period_start(window))
+            .order_by().values('user').annotate(total=Sum('amount')).values_list('user', 'total')
+        )
+        stored = dict(
+            LeaderboardEntry.objects.filter(window=window, period=leaderboard.period_for(window))
+            .values_list('user_id', 'xp')
+        )
+        rebuilt = {user_id: xp for user_id, xp in earned.items() if stored.get(user_id, 0) != xp}
+        emptied = [user_id for user_id, xp in stored.items() if xp and user_id not in earned]
+        return rebuilt, emptied
+
+    def rewrite_buckets(self, window, rebuilt, emptied, chunk):
+        period = leaderboard.period_for(window)
+        user_ids = list(rebuilt) + emptied
+        for start in range(0, len(user_ids), chunk):
+            batch = user_ids[start:start + chunk]
+            with transaction.atomic():
+                LeaderboardEntry.objects.filter(window=window, period=period, user_id__in=batch).delete()
+                LeaderboardEntry.objects.bulk_create([
+                    LeaderboardEntry(user_id=user_id, window=window, period=period, xp=rebuilt[user_id])
+                    for user_id in batch if user_id in rebuilt
+                ])
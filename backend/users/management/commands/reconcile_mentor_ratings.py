@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from users.models import CustomUser, MentorFeedback
+
+
+class Command(BaseCommand):
+    help = 'Recompute every mentor rating_count / rating_sum from MentorFeedback and fix the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=1000, help='Users repaired per UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted users')
+
+    def handle(self, *args, **options):
+        feedback = MentorFeedback.objects.filter(mentor=OuterRef('pk')).order_by().values('mentor')
+        true_count = Coalesce(Subquery(feedback.annotate(n=Count('id')).values('n')), Value(0))
+        true_sum = Coalesce(Subquery(feedback.annotate(total=Sum('rating')).values('total')), Value(0))
+
+        # Anyone holding totals or receiving feedback; usually just the mentors
+        candidates = CustomUser.objects.filter(
+            Q(role='MENTOR') | Q(rating_count__gt=0) | Q(rating_sum__gt=0)
+        ).annotate(true_count=true_count, true_sum=true_sum)
+        drifted = list(
+            candidates.exclude(rating_count=F('true_count'), rating_sum=F('true_sum'))
+            .values_list('id', flat=True)
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(drifted)} users have drifted rating totals")
+            return
+
+        for start in range(0, len(drifted), options['chunk']):
+            with transaction.atomic():
+                CustomUser.objects.filter(id__in=drifted[start:start + options['chunk']]).update(
+                    rating_count=true_count, rating_sum=true_sum
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled rating totals for {len(drifted)} users"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from users.models import Message
+
+
+class Command(BaseCommand):
+    help = 'Move the Message id sequence past MAX(id), e.g. after turning chat write-behind off'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to reset')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the SQL')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        statements = connection.ops.sequence_reset_sql(no_style(), [Message])
+        if not statements:
+            self.stdout.write(f"{connection.vendor} needs no sequence reset")
+            return
+
+        if options['dry_run']:
+            for sql in statements:
+                self.stdout.write(sql)
+            return
+
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS("Message id sequence now starts past MAX(id)"))
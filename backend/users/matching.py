@@ -0,0 +1,209 @@
+"""
+Mentor matching: ranks available mentors for a student.
+
+Mentor profiles (expertise, job_title, skills) are tokenized into the
+MentorSkillToken inverted index when they are saved. Each process keeps the
+postings of available mentors in memory as NumPy arrays, reloaded only when the
+index version is bumped, so a ranking is a handful of array adds over the
+student's tokens plus one query for the k winning mentor rows.
+"""
+import math
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from assessments.catalog import bump_version_now_and_on_commit, get_catalog
+from assessments.models import AssessmentResult
+from .models import CustomUser, MentorSkillToken, MentorshipConnection
+
+INDEX_VERSION_KEY = "mentor_index:version"
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+MAX_TOKEN_LENGTH = 64
+STOPWORDS = frozenset({
+    'and', 'the', 'for', 'with', 'of', 'in', 'on', 'at', 'to', 'an', 'or', 'as', 'by', 'is', 'my', 'me',
+    'senior', 'junior', 'lead', 'principal', 'staff', 'head', 'intern', 'engineer', 'engineering',
+    'developer', 'specialist', 'expert', 'professional',
+})
+
+# Where a mentor's token came from decides its weight; a token keeps its best field.
+# Skills and expertise name what a mentor works on (1.0); a job title mostly
+# says seniority and role, so its tokens count for less (0.6).
+MENTOR_FIELD_WEIGHTS = {'skills': 1.0, 'expertise': 1.0, 'job_title': 0.6}
+MENTOR_INDEX_FIELDS = tuple(MENTOR_FIELD_WEIGHTS)
+
+STUDENT_FIELD_WEIGHTS = {'skills': 1.0, 'career_interest': 1.0}
+PATH_WEIGHT = 0.5
+TRAIT_WEIGHTS = (0.5, 0.25)  # primary, secondary letter of the blended code
+
+# What each RIASEC type tends to look like on a tech mentor's profile
+TRAIT_KEYWORDS = {
+    'R': ('devops', 'infrastructure', 'hardware', 'networking', 'cloud', 'linux', 'embedded', 'systems'),
+    'I': ('data', 'research', 'science', 'analytics', 'machine', 'learning', 'ai', 'security'),
+    'A': ('design', 'ux', 'ui', 'frontend', 'creative', 'product', 'animation', 'content'),
+    'S': ('teaching', 'support', 'community', 'mentoring', 'advocacy', 'training', 'hr'),
+    'E': ('management', 'product', 'business', 'startup', 'strategy', 'sales', 'leadership'),
+    'C': ('qa', 'testing', 'compliance', 'operations', 'database', 'administration', 'audit'),
+}
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 50
+
+
+def tokenize(text):
+    """Lower-cased skill tokens; keeps things like c++, c# and node.js whole."""
+    tokens = set()
+    for raw in TOKEN_RE.findall((text or '').lower()):
+        token = raw.rstrip('.')
+        if len(token) > 1 and token not in STOPWORDS:
+            tokens.add(token[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def mentor_tokens(mentor):
+    """{token: weight} for one mentor profile."""
+    weights = {}
+    for field, weight in MENTOR_FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(mentor, field)):
+            weights[token] = max(weights.get(token, 0), weight)
+    return weights
+
+
+def index_mentor(mentor):
+    """Rewrites one mentor's postings; call after their profile fields change."""
+    with transaction.atomic():
+        MentorSkillToken.objects.filter(mentor=mentor).delete()
+        if mentor.role == 'MENTOR':
+            MentorSkillToken.objects.bulk_create([
+                MentorSkillToken(mentor=mentor, token=token, weight=weight)
+                for token, weight in mentor_tokens(mentor).items()
+            ])
+        invalidate_mentor_index()
+
+
+def student_tokens(student):
+    """{token: weight} from the student's profile and latest assessment."""
+    weights = defaultdict(float)
+    for field, weight in STUDENT_FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(student, field)):
+            weights[token] = max(weights[token], weight)
+
+    result = AssessmentResult.objects.filter(user=student).order_by('-created_at').values('top_trait', 'scores').first()
+    if result:
+        for letter, weight in zip(result['top_trait'] or '', TRAIT_WEIGHTS):
+            for token in TRAIT_KEYWORDS.get(letter, ()):
+                weights[token] = max(weights[token], weight)
+        path = get_catalog().match(result['top_trait'], result['scores'])
+        if path:
+            for token in tokenize(path.title):
+                weights[token] = max(weights[token], PATH_WEIGHT)
+    return dict(weights)
+
+
+@dataclass(frozen=True)
+class MentorIndex:
+    """
+    Process-wide snapshot of the postings of every available mentor:
+    token -> (mentor positions, weights) as NumPy arrays. Rebuilt only when
+    the shared index version moves, like the career catalog.
+    """
+    version: object
+    mentor_ids: tuple
+    positions: MappingProxyType
+    postings: MappingProxyType
+
+    def rank(self, wanted, exclude=(), k=DEFAULT_TOP_K):
+        """[(mentor_id, score, matched_tokens)] for a {token: weight} query, best first."""
+        scores = np.zeros(len(self.mentor_ids))
+        hits = []
+        for token, student_weight in wanted.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            positions, weights = posting
+            # Rare skills say more about a match than ones every mentor lists
+            idf = math.log(1 + len(self.mentor_ids) / len(positions))
+            scores[positions] += weights * (student_weight * idf)
+            hits.append((token, positions))
+
+        for mentor_id in exclude:
+            position = self.positions.get(mentor_id)
+            if position is not None:
+                scores[position] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Best score first, mentor id breaks ties so the order is stable across rebuilds
+        ranked = sorted(candidates.tolist(), key=lambda i: (-scores[i], str(self.mentor_ids[i])))
+
+        matched = defaultdict(list)
+        for token, positions in hits:
+            for i in np.asarray(ranked)[np.isin(ranked, positions)].tolist():
+                matched[i].append(token)
+        return [(self.mentor_ids[i], round(float(scores[i]), 4), sorted(matched[i])) for i in ranked]
+
+
+def _build_index(version):
+    positions, entries = {}, defaultdict(list)
+    rows = MentorSkillToken.objects.filter(
+        mentor__role='MENTOR', mentor__is_available=True,
+    ).values_list('mentor_id', 'token', 'weight')
+    for mentor_id, token, weight in rows:
+        entries[token].append((positions.setdefault(mentor_id, len(positions)), weight))
+
+    return MentorIndex(
+        version=version,
+        mentor_ids=tuple(positions),
+        positions=MappingProxyType(positions),
+        postings=MappingProxyType({
+            token: (np.array([p for p, _ in pairs], dtype=np.int32), np.array([w for _, w in pairs]))
+            for token, pairs in entries.items()
+        }),
+    )
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_mentor_index():
+    global _index
+    version = cache.get(INDEX_VERSION_KEY)
+    current = _index
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = _build_index(version)
+        return _index
+
+
+def invalidate_mentor_index():
+    """Call after postings change or a mentor's role / availability flips."""
+    bump_version_now_and_on_commit(INDEX_VERSION_KEY)
+
+
+def rank_mentors(student, k=DEFAULT_TOP_K):
+    """
+    Top-k available, non-blocking mentors for a student as
+    [(mentor, score, matched_tokens)], best first.
+    """
+    wanted = student_tokens(student)
+    if not wanted:
+        return []
+
+    blocked = MentorshipConnection.objects.filter(student=student, status='BLOCKED').values_list('mentor_id', flat=True)
+    ranked = get_mentor_index().rank(wanted, exclude=set(blocked), k=k)
+    if not ranked:
+        return []
+
+    # Re-checked here so a snapshot that is a moment stale can't surface a mentor who just went away
+    mentors = CustomUser.objects.filter(role='MENTOR', is_available=True).in_bulk([mentor_id for mentor_id, _, _ in ranked])
+    return [(mentors[mentor_id], score, tokens) for mentor_id, score, tokens in ranked if mentor_id in mentors]
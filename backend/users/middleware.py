@@ -1,14 +1,47 @@
-from django.utils import timezone
-from .models import CustomUser
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.functional import SimpleLazyObject, empty
+
+from .activity import activity_buffer
+from .presence import presence
 
 class UpdateLastActivityMiddleware:
+    # Async-capable so an ASGI request to an async view never hops to a thread for us
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if request.user.is_authenticated:
-            # We use .filter().update() because it's faster, 
-            # but we must ensure it hits the DB immediately.
-            CustomUser.objects.filter(id=request.user.id).update(last_activity=timezone.now())
-        
-        return self.get_response(request)
\ No newline at end of file
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+
+        # Checked after the view runs: DRF's JWT authentication sets
+        # request.user during the view, so API calls are counted too.
+        # The write itself is buffered and coalesced (see users.activity).
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            activity_buffer.record(user.id)
+            # Only refreshes users with an open socket; HTTP alone never marks anyone online
+            presence.touch(user.id, require_connection=True)
+
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+
+        user = getattr(request, 'user', None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            # Session user nobody looked at yet: resolve it without blocking the loop
+            user = await request.auser()
+        if user is not None and user.is_authenticated:
+            # record() only touches a dict; the presence check may hit the shared cache
+            activity_buffer.record(user.id)
+            if presence.touch_due(user.id):
+                await sync_to_async(presence.touch)(user.id, force=True, require_connection=True)
+
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-17 20:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0015_mentortask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('week', 'Weekly'), ('month', 'Monthly')], max_length=10)),
+                ('period', models.CharField(max_length=10)),
+                ('xp', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', '-xp_total'], name='users_role_xp_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['window', 'period', '-xp'], name='users_lb_window_xp_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardentry',
+            unique_together={('user', 'window', 'period')},
+        ),
+    ]
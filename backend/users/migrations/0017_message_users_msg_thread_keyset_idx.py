@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_leaderboardentry_customuser_users_role_xp_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'created_at', 'id'], name='users_msg_thread_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:30
+
+from django.db import migrations, models
+from django.db.models import F, Max, Q
+
+
+def backfill_read_marks(apps, schema_editor):
+    # Each side's mark starts at the newest message they had already flagged as read
+    Thread = apps.get_model('users', 'Thread')
+    threads = Thread.objects.annotate(
+        student_mark=Max('messages__id', filter=Q(messages__is_read=True) & ~Q(messages__sender_id=F('student_id'))),
+        mentor_mark=Max('messages__id', filter=Q(messages__is_read=True) & ~Q(messages__sender_id=F('mentor_id'))),
+    )
+    changed = []
+    for thread in threads.iterator():
+        if thread.student_mark or thread.mentor_mark:
+            thread.student_last_read_id = thread.student_mark or 0
+            thread.mentor_last_read_id = thread.mentor_mark or 0
+            changed.append(thread)
+    Thread.objects.bulk_update(changed, ['student_last_read_id', 'mentor_last_read_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_message_users_msg_thread_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='mentor_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='thread',
+            name='student_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_read_marks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_message_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorSkillToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.FloatField(default=1.0)),
+                ('mentor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token'], name='users_skill_token_idx')],
+                'unique_together': {('mentor', 'token')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:40
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0020_mentorskilltoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorFeedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)])),
+                ('comment', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role', 'is_available', '-years_of_experience', 'id'], name='users_mentor_dir_idx'),
+        ),
+        migrations.AddField(
+            model_name='mentorfeedback',
+            name='mentor',
+            field=models.ForeignKey(limit_choices_to={'role': 'MENTOR'}, on_delete=django.db.models.deletion.CASCADE, related_name='received_feedbacks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='mentorfeedback',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='given_feedbacks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='mentorfeedback',
+            index=models.Index(fields=['mentor', 'rating'], name='users_feedback_mentor_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mentorfeedback',
+            unique_together={('student', 'mentor')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:20
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    MentorFeedback = apps.get_model('users', 'MentorFeedback')
+    totals = MentorFeedback.objects.values('mentor_id').annotate(n=Count('id'), total=Sum('rating'))
+    mentors = []
+    for row in totals.iterator():
+        mentors.append(CustomUser(id=row['mentor_id'], rating_count=row['n'], rating_sum=row['total']))
+    CustomUser.objects.bulk_update(mentors, ['rating_count', 'rating_sum'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_mentorfeedback_mentor_directory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-17 21:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_ledger(apps, schema_editor):
+    """
+    Ledger rows for what was already awarded, so those awards stay idempotent,
+    plus an opening balance for whatever xp_total held beyond them.
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    MentorTask = apps.get_model('users', 'MentorTask')
+    XPLedgerEntry = apps.get_model('users', 'XPLedgerEntry')
+    UserProgress = apps.get_model('assessments', 'UserProgress')
+    UserAchievement = apps.get_model('assessments', 'UserAchievement')
+
+    entries = []
+    for user_id, milestone_id in UserProgress.objects.filter(status='COMPLETED').values_list('user_id', 'milestone_id').iterator():
+        entries.append(XPLedgerEntry(user_id=user_id, amount=100, source='milestone', ref=str(milestone_id)))
+    for user_id, achievement_id, points in UserAchievement.objects.values_list('user_id', 'achievement_id', 'achievement__points').iterator():
+        entries.append(XPLedgerEntry(user_id=user_id, amount=points, source='badge', ref=str(achievement_id)))
+    for user_id, task_id, reward in MentorTask.objects.filter(status='APPROVED').values_list('student_id', 'id', 'xp_reward').iterator():
+        entries.append(XPLedgerEntry(user_id=user_id, amount=reward, source='task', ref=str(task_id)))
+
+    derived = {}
+    for entry in entries:
+        derived[entry.user_id] = derived.get(entry.user_id, 0) + entry.amount
+    for user_id, xp_total in CustomUser.objects.values_list('id', 'xp_total').iterator():
+        if xp_total != derived.get(user_id, 0):
+            entries.append(XPLedgerEntry(user_id=user_id, amount=xp_total - derived.get(user_id, 0), source='opening', ref='opening'))
+    XPLedgerEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_customuser_rating_totals'),
+        ('assessments', '0013_careerpath_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('source', models.CharField(choices=[('milestone', 'Milestone completed'), ('badge', 'Achievement earned'), ('task', 'Mentor task approved'), ('opening', 'Balance before the ledger'), ('manual', 'Manual award')], max_length=20)),
+                ('ref', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'source', 'ref'), name='users_xp_ledger_once')],
+            },
+        ),
+        migrations.RunPython(seed_ledger, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,15 @@
 import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.conf import settings
 from django.utils import timezone
 import datetime
-from django.db.models import Avg
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.db.models import F
+from django.core.validators import MinValueValidator, MaxValueValidator
+from .realtime import push_to_user
+from .presence import presence
+
+XP_PER_LEVEL = 500
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, username, password=None, **extra_fields):
@@ -60,34 +63,112 @@ class CustomUser(AbstractUser):
         limit_choices_to={'role': 'MENTOR'}
     )
     has_celebrated_mentor = models.BooleanField(default=False)
+    # Running totals of received MentorFeedback, kept in step by its post_save and
+    # post_delete hooks (users.signals); `reconcile_mentor_ratings` repairs any drift
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # All-time leaderboard page and rank lookups (see users.leaderboard)
+            models.Index(fields=['role', '-xp_total'], name='users_role_xp_idx'),
+            # Mentor directory: filter on role/availability, keyset on experience then id
+            models.Index(fields=['role', 'is_available', '-years_of_experience', 'id'], name='users_mentor_dir_idx'),
+        ]
+
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the WebSocket auth cache depends on (see users.signals)
+        instance._auth_state = (instance.__dict__.get('role'), instance.__dict__.get('is_active'))
+        # ... and what the mentor-matching snapshot depends on (see users.matching)
+        instance._match_state = (instance.__dict__.get('role'), instance.__dict__.get('is_available'))
+        instance._index_state = instance.mentor_index_state()
+        return instance
+
+    def mentor_index_state(self):
+        """Role plus the profile fields a mentor's skill-token postings are built from."""
+        from .matching import MENTOR_INDEX_FIELDS
+        return (self.__dict__.get('role'),) + tuple(self.__dict__.get(field) for field in MENTOR_INDEX_FIELDS)
     
-    def add_xp(self, amount):
-        self.xp_total += amount
-        # Simple leveling logic: every 500 XP is a new level
-        self.level = (self.xp_total // 500) + 1
-        self.save()
+    def add_xp(self, amount, source='manual', ref=None):
+        """
+        Records an award in the XP ledger and bumps xp_total / level with one
+        F() UPDATE. Idempotent per (source, ref): awarding the same milestone,
+        badge or task twice is a no-op that returns False. Without a ref every
+        call is a separate award.
+        """
+        from .leaderboard import record_xp
+
+        ref = str(uuid.uuid4()) if ref is None else str(ref)
+        try:
+            with transaction.atomic():
+                XPLedgerEntry.objects.create(user=self, amount=amount, source=source, ref=ref)
+                CustomUser.objects.filter(pk=self.pk).update(
+                    xp_total=F('xp_total') + amount,
+                    # Simple leveling logic: every 500 XP is a new level
+                    level=(F('xp_total') + amount) / XP_PER_LEVEL + 1,
+                )
+                self.xp_total, self.level = CustomUser.objects.filter(pk=self.pk).values_list('xp_total', 'level').get()
+                record_xp(self, amount)
+        except IntegrityError:
+            # Already awarded for this source and ref
+            return False
+        return True
+
+    @classmethod
+    def add_xp_many(cls, awards):
+        """
+        Batch form of add_xp for [(user_id, amount, source, ref)]: one ledger
+        insert, then one UPDATE per distinct per-user total instead of a save
+        per user, for jobs like the achievement backfill. Awards already in
+        the ledger are skipped. Returns {user_id: amount} actually granted.
+        """
+        from .leaderboard import record_xp_many
+
+        awards = [(user_id, amount, source, str(ref)) for user_id, amount, source, ref in awards]
+        held = set()
+        if awards:
+            held = set(XPLedgerEntry.objects.filter(
+                user_id__in={a[0] for a in awards}, source__in={a[2] for a in awards}, ref__in={a[3] for a in awards},
+            ).values_list('user_id', 'source', 'ref'))
+        fresh = {(user_id, source, ref): amount for user_id, amount, source, ref in awards if (user_id, source, ref) not in held}
+        XPLedgerEntry.objects.bulk_create([
+            XPLedgerEntry(user_id=user_id, amount=amount, source=source, ref=ref)
+            for (user_id, source, ref), amount in fresh.items()
+        ], batch_size=2000)
+
+        amounts = {}
+        for (user_id, _, _), amount in fresh.items():
+            amounts[user_id] = amounts.get(user_id, 0) + amount
+        by_amount = {}
+        for user_id, amount in amounts.items():
+            if amount:
+                by_amount.setdefault(amount, []).append(user_id)
+        for amount, user_ids in by_amount.items():
+            cls.objects.filter(id__in=user_ids).update(
+                xp_total=F('xp_total') + amount,
+                level=(F('xp_total') + amount) / XP_PER_LEVEL + 1,
+            )
+        record_xp_many(amounts)
+        return amounts
     
     @property
     def average_rating(self):
-        # Calculates rating from real student feedback
-        avg = self.received_feedbacks.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0.0
+        # Read from the denormalized totals, no aggregate query
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0.0
     
     @property
     def is_currently_online(self):
         """
-        Hard check for WebSocket status. 
-        Falls back to last_activity if socket is disconnected but active within 2 mins.
+        Reads from the presence store: an open socket AND recent activity.
         """
-        # Must have the socket status AND have been active in the last 60 seconds
-        if self.is_online_status and self.last_activity:
-            return timezone.now() < self.last_activity + datetime.timedelta(seconds=60)
-        return False
+        return presence.is_online(self.id)
     
     
 class MentorshipConnection(models.Model):
@@ -146,15 +227,10 @@ class Notification(models.Model):
         if is_new:
             # Automatically push to WebSocket whenever a new notification is created
             try:
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    "presence_tracking",
-                    {
-                        "type": "bell_notification", # Handled in PresenceConsumer
-                        "recipient_id": str(self.recipient.id),
-                        "message": self.message,
-                    }
-                )
+                push_to_user(self.recipient_id, {
+                    "type": "bell_notification", # Handled in PresenceConsumer
+                    "message": self.message,
+                })
             except Exception as e:
                 print(f"WebSocket notification failed: {e}")
 
@@ -179,6 +255,10 @@ class Thread(models.Model):
     # Useful for sorting the inbox by the most recent activity
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Read state as a high-water mark: id of the newest message each side has read.
+    # A message is read once its id is <= the recipient's mark.
+    student_last_read_id = models.BigIntegerField(default=0)
+    mentor_last_read_id = models.BigIntegerField(default=0)
 
     class Meta:
         # A student and mentor should only ever have ONE thread together
@@ -188,6 +268,24 @@ class Thread(models.Model):
     def __str__(self):
         return f"Chat: {self.student.username} & {self.mentor.username}"
 
+    def read_field_for(self, user_id):
+        return 'student_last_read_id' if user_id == self.student_id else 'mentor_last_read_id'
+
+    def is_read_by_recipient(self, message_id, sender_id):
+        mark = self.mentor_last_read_id if sender_id == self.student_id else self.student_last_read_id
+        return message_id <= mark
+
+    def advance_read_mark(self, user_id, message_id):
+        """
+        Moves the user's mark forward to message_id in one conditional UPDATE.
+        Never moves it backwards. Returns True if the mark moved.
+        """
+        field = self.read_field_for(user_id)
+        moved = Thread.objects.filter(id=self.id, **{f"{field}__lt": message_id}).update(**{field: message_id})
+        if moved:
+            setattr(self, field, message_id)
+        return bool(moved)
+
 
 class Message(models.Model):
     """
@@ -196,11 +294,17 @@ class Message(models.Model):
     thread = models.ForeignKey(Thread, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
+    # Legacy flag, no longer written: read state lives on Thread.*_last_read_id
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so write-behind batches keep the send time
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Keyset pagination in MessageView walks (thread, created_at, id)
+            models.Index(fields=['thread', 'created_at', 'id'], name='users_msg_thread_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.sender.username} at {self.created_at}"
@@ -229,4 +333,131 @@ class MentorTask(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.title} - {self.student.username}"
\ No newline at end of file
+        return f"{self.title} - {self.student.username}"
+
+
+class XPLedgerEntry(models.Model):
+    """
+    Append-only record of every XP award. A user's xp_total is the sum of
+    their rows; `recompute_xp` rebuilds the totals from here.
+    """
+    SOURCE_CHOICES = (
+        ('milestone', 'Milestone completed'),
+        ('badge', 'Achievement earned'),
+        ('task', 'Mentor task approved'),
+        ('opening', 'Balance before the ledger'),
+        ('manual', 'Manual award'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='xp_entries')
+    amount = models.IntegerField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    ref = models.CharField(max_length=64) # e.g. the milestone, achievement or task id
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # One award per thing earned, however often the signal fires
+            models.UniqueConstraint(fields=['user', 'source', 'ref'], name='users_xp_ledger_once'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} +{self.amount} ({self.source}:{self.ref})"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    XP earned per user inside a time window (this week / this month).
+    All-time rankings read CustomUser.xp_total directly.
+    """
+    WINDOW_CHOICES = (
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    window = models.CharField(max_length=10, choices=WINDOW_CHOICES)
+    period = models.CharField(max_length=10) # e.g. "2026-W42" or "2026-10"
+    xp = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'window', 'period')
+        indexes = [
+            models.Index(fields=['window', 'period', '-xp'], name='users_lb_window_xp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.window} {self.period}: {self.xp} XP"
+
+
+class MentorFeedback(models.Model):
+    """A student's 1-5 star rating of a mentor; one per student/mentor pair."""
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='given_feedbacks')
+    mentor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='received_feedbacks',
+        limit_choices_to={'role': 'MENTOR'}
+    )
+    rating = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'mentor')
+        indexes = [
+            # Covers the per-mentor AVG/COUNT the directory runs for each page
+            models.Index(fields=['mentor', 'rating'], name='users_feedback_mentor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} -> {self.mentor_id}: {self.rating}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What this row currently adds to the mentor's totals (see users.signals)
+        instance._counted = (instance.__dict__.get('mentor_id'), instance.__dict__.get('rating'))
+        return instance
+
+    @classmethod
+    def submit(cls, student, mentor, rating, comment=''):
+        """
+        Creates or replaces the student's rating of a mentor, in one transaction;
+        the post_save hook moves the mentor's totals. Returns (feedback, created).
+        """
+        with transaction.atomic():
+            feedback = cls.objects.select_for_update().filter(student=student, mentor=mentor).first()
+            if feedback is None:
+                try:
+                    with transaction.atomic():
+                        return cls.objects.create(student=student, mentor=mentor, rating=rating, comment=comment), True
+                except IntegrityError:
+                    # A concurrent first rating won the insert; update that row instead
+                    feedback = cls.objects.select_for_update().get(student=student, mentor=mentor)
+
+            feedback.rating, feedback.comment = rating, comment
+            feedback.save(update_fields=['rating', 'comment', 'updated_at'])
+            return feedback, False
+
+
+class MentorSkillToken(models.Model):
+    """
+    Inverted index of mentor profiles (see users.matching): one row per
+    distinct token in a mentor's expertise / job_title / skills.
+    Rewritten whenever the mentor saves their profile.
+    """
+    mentor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='skill_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.FloatField(default=1.0)
+
+    class Meta:
+        unique_together = ('mentor', 'token')
+        indexes = [
+            models.Index(fields=['token'], name='users_skill_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mentor_id}: {self.token} ({self.weight})"
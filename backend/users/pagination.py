@@ -0,0 +1,57 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+
+# Keyset pagination over (created_at, id) for chat history. Cursors are
+# opaque to clients: urlsafe base64 of "<iso timestamp>|<id>".
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+def encode_cursor(message):
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value):
+    """Returns (created_at, id); raises ValueError on anything malformed."""
+    created_at, _, pk = base64.urlsafe_b64decode(value.encode()).decode().partition("|")
+    return datetime.fromisoformat(created_at), int(pk)
+
+
+def before(cursor):
+    created_at, pk = cursor
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def after(cursor):
+    created_at, pk = cursor
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+class MentorCursorPagination(CursorPagination):
+    """
+    Keyset pages for the mentor directory. The default ordering walks
+    users_mentor_dir_idx; ?ordering= may pick any of the view's ordering_fields.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = ('-years_of_experience', 'id')
+
+
+class TiebreakOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that always ends on 'id'. Cursor pages skip ahead by an
+    offset within equal values (most mentors share a 0.0 rating), which
+    only works if the order inside those ties is deterministic.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        return ordering
@@ -0,0 +1,161 @@
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, When, Value, BooleanField, DateTimeField
+from django.utils import timezone
+
+# A user counts as online while at least one socket is open AND they were
+# active inside this window (same rule the old is_currently_online used).
+ACTIVE_WINDOW = datetime.timedelta(seconds=getattr(settings, 'PRESENCE_ACTIVE_WINDOW', 120))
+# Safety net: a worker that dies without running disconnect() leaves its
+# refcount behind, so the counter key expires on its own.
+CONNECTION_TTL = getattr(settings, 'PRESENCE_CONNECTION_TTL', 60 * 60 * 24)
+# Chat frames arrive many times per second; only refresh the shared store
+# once per user per TOUCH_RESOLUTION seconds.
+TOUCH_RESOLUTION = getattr(settings, 'PRESENCE_TOUCH_RESOLUTION', 5)
+FLUSH_INTERVAL = getattr(settings, 'PRESENCE_FLUSH_INTERVAL', 30)
+FLUSH_BATCH_SIZE = getattr(settings, 'PRESENCE_FLUSH_BATCH_SIZE', 500)
+
+
+def _conn_key(user_id):
+    return f"presence:conn:{user_id}"
+
+
+def _seen_key(user_id):
+    return f"presence:seen:{user_id}"
+
+
+class PresenceStore:
+    """
+    Tracks who is online without touching the users table on every event.
+
+    Connection refcounts and last-seen timestamps live in the Django cache
+    (LocMem in dev, Redis in production so every worker shares them).
+    `last_seen` is written back to CustomUser lazily, in one batched UPDATE.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}      # user_id -> (last_seen, is_online) waiting for flush
+        self._touched = {}      # user_id -> monotonic time of last shared-store write
+        self._last_flush = time.monotonic()
+
+    # --- Connection lifecycle ---
+
+    def connect(self, user_id):
+        key = _conn_key(user_id)
+        cache.add(key, 0, timeout=CONNECTION_TTL)
+        count = cache.incr(key)
+        self.touch(user_id, force=True)
+        return count
+
+    def disconnect(self, user_id):
+        key = _conn_key(user_id)
+        try:
+            count = cache.decr(key)
+        except ValueError:
+            # Key already expired; treat as the last connection
+            count = 0
+
+        now = timezone.now()
+        cache.set(_seen_key(user_id), now, timeout=None)
+        if count <= 0:
+            # Only the last tab closing takes the user offline
+            cache.delete(key)
+            self._touched.pop(user_id, None)
+            self._queue(user_id, now, False)
+        return max(count, 0)
+
+    def touch(self, user_id, force=False, require_connection=False):
+        """
+        Records activity (chat frame, HTTP hit) for a connected user.
+
+        Callers that can't know whether a socket is open (the HTTP middleware)
+        pass require_connection=True: without one, the user stays offline and
+        a pending offline write-back is left alone.
+        """
+        if not force and not self.touch_due(user_id):
+            return
+        if require_connection and not self.connection_count(user_id):
+            return
+        now = timezone.now()
+        cache.set(_seen_key(user_id), now, timeout=None)
+        self._queue(user_id, now, True)
+
+    def touch_due(self, user_id):
+        """Claims this user's next touch slot; False inside TOUCH_RESOLUTION of the last one."""
+        mono = time.monotonic()
+        with self._lock:
+            if mono - self._touched.get(user_id, 0) < TOUCH_RESOLUTION:
+                return False
+            self._touched[user_id] = mono
+            return True
+
+    def connection_count(self, user_id):
+        return cache.get(_conn_key(user_id)) or 0
+
+    # --- Reads ---
+
+    def status_many(self, user_ids):
+        """
+        Returns {user_id: (is_online, last_seen)} in two cache round trips.
+        last_seen is None when the store has never seen the user; callers
+        fall back to the persisted CustomUser.last_seen.
+        """
+        user_ids = list(user_ids)
+        counts = cache.get_many([_conn_key(uid) for uid in user_ids])
+        seen = cache.get_many([_seen_key(uid) for uid in user_ids])
+        cutoff = timezone.now() - ACTIVE_WINDOW
+
+        result = {}
+        for uid in user_ids:
+            last_seen = seen.get(_seen_key(uid))
+            connected = (counts.get(_conn_key(uid)) or 0) > 0
+            result[uid] = (bool(connected and last_seen and last_seen > cutoff), last_seen)
+        return result
+
+    def status(self, user_id):
+        return self.status_many([user_id])[user_id]
+
+    def is_online(self, user_id):
+        return self.status(user_id)[0]
+
+    # --- Lazy write-back ---
+
+    def _queue(self, user_id, last_seen, is_online):
+        with self._lock:
+            self._pending[user_id] = (last_seen, is_online)
+
+    def flush_due(self):
+        return (
+            len(self._pending) >= FLUSH_BATCH_SIZE
+            or (self._pending and time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+        )
+
+    def flush(self):
+        """Writes every pending last_seen in one UPDATE ... CASE statement."""
+        from .models import CustomUser
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        CustomUser.objects.filter(id__in=pending.keys()).update(
+            last_seen=Case(
+                *[When(id=uid, then=Value(seen)) for uid, (seen, _) in pending.items()],
+                output_field=DateTimeField(),
+            ),
+            is_online_status=Case(
+                *[When(id=uid, then=Value(online)) for uid, (_, online) in pending.items()],
+                output_field=BooleanField(),
+            ),
+        )
+        return len(pending)
+
+
+presence = PresenceStore()
@@ -0,0 +1,19 @@
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+
+def user_group_name(user_id):
+    """
+    Every PresenceConsumer joins the group of its own user, so a push
+    to one recipient is a single delivery instead of a broadcast.
+    """
+    return f"user_{user_id}"
+
+
+def push_to_user(user_id, event):
+    """
+    Sends a channel-layer event only to the sockets of `user_id`.
+    Safe to call from sync code (views, model.save).
+    """
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(user_group_name(user_id), event)
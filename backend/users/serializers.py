@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import CustomUser, Thread, Message, MentorTask, Notification # Added Notification
+from .models import CustomUser, Thread, Message, MentorTask, Notification, MentorFeedback
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,23 +17,52 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 class MentorPublicSerializer(serializers.ModelSerializer):
-    rating = serializers.ReadOnlyField(source='average_rating')
+    rating = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
         fields = [
             'id', 'username', 'email', 'full_name', 
             'bio', 'expertise', 'job_title', 'company', 
-            'years_of_experience', 'rating'
+            'years_of_experience', 'is_available', 'rating', 'rating_count'
+        ]
+
+    def get_rating(self, obj):
+        # Straight from the denormalized rating_sum / rating_count columns
+        return obj.average_rating
+
+
+class MentorFeedbackSerializer(serializers.ModelSerializer):
+    student_username = serializers.ReadOnlyField(source='student.username')
+
+    class Meta:
+        model = MentorFeedback
+        fields = ['id', 'student_username', 'rating', 'comment', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+class MentorMatchSerializer(serializers.ModelSerializer):
+    """Public mentor card for ranked matches; the view adds score and matched_on."""
+
+    class Meta:
+        model = CustomUser
+        fields = [
+            'id', 'username', 'full_name', 'bio', 'expertise',
+            'job_title', 'company', 'years_of_experience'
         ]
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_username = serializers.ReadOnlyField(source='sender.username')
+    is_read = serializers.SerializerMethodField()
 
     class Meta:
         model = Message
         fields = ['id', 'thread', 'sender', 'sender_username', 'content', 'is_read', 'created_at']
-        read_only_fields = ['sender', 'thread', 'is_read']
+        read_only_fields = ['sender', 'thread', 'is_read', 'created_at']
+
+    def get_is_read(self, obj):
+        # Derived from the thread's read marks; pass the thread in the context
+        thread = self.context.get('thread') or obj.thread
+        return thread.is_read_by_recipient(obj.id, obj.sender_id)
 
 class ThreadSerializer(serializers.ModelSerializer):
     other_user = serializers.SerializerMethodField()
@@ -50,27 +79,21 @@ class ThreadSerializer(serializers.ModelSerializer):
             'updated_at', 'is_active', 'student_name', 'mentor_name'
         ]
         
+    # ThreadListView annotates unread/last_msg_* and passes presence in the
+    # context, so none of these methods run a query of their own.
+
     def get_is_active(self, obj):
         return obj.student.mentor_id == obj.mentor_id
 
     def get_unread_count(self, obj):
-        request_user = self.context['request'].user
-        return obj.messages.filter(is_read=False).exclude(sender=request_user).count()
+        return obj.unread
 
     def get_other_user(self, obj):
         request_user = self.context['request'].user
-        other = obj.mentor if obj.student == request_user else obj.student
-        
-        from django.utils import timezone
-        import datetime
-        from .models import CustomUser
-
-        latest_data = CustomUser.objects.filter(id=other.id).values('last_activity').first()
-        actual_last_activity = latest_data['last_activity'] if latest_data else None
+        other = obj.mentor if obj.student_id == request_user.id else obj.student
 
-        is_online = False
-        if actual_last_activity:
-            is_online = timezone.now() < actual_last_activity + datetime.timedelta(minutes=2)
+        # Live status comes from the presence store, not a per-thread user query
+        is_online, last_seen = self.context['presence'].get(other.id, (False, None))
 
         return {
             "id": str(other.id),
@@ -78,19 +101,18 @@ class ThreadSerializer(serializers.ModelSerializer):
             "full_name": other.full_name,
             "role": other.role,
             "is_online": is_online,
-            "last_seen": actual_last_activity
+            "last_seen": last_seen or other.last_seen or other.last_activity
         }
 
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
-        if last_msg:
-            return {
-                "content": last_msg.content[:50],
-                "created_at": last_msg.created_at,
-                "is_read": last_msg.is_read,
-                "sender_id": str(last_msg.sender.id)
-            }
-        return None
+        if obj.last_msg_created_at is None:
+            return None
+        return {
+            "content": obj.last_msg_content[:50],
+            "created_at": obj.last_msg_created_at,
+            "is_read": obj.is_read_by_recipient(obj.last_msg_id, obj.last_msg_sender_id),
+            "sender_id": str(obj.last_msg_sender_id)
+        }
 
 class MentorTaskSerializer(serializers.ModelSerializer):
     student_username = serializers.ReadOnlyField(source='student.username')
@@ -0,0 +1,83 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from config.middleware import bump_auth_version
+from .models import CustomUser, MentorFeedback
+from .matching import MENTOR_INDEX_FIELDS, index_mentor, invalidate_mentor_index
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_ws_auth_cache(sender, instance, created, **kwargs):
+    # Only a role change or (de)activation makes a cached socket identity stale
+    current = (instance.role, instance.is_active)
+    if not created and getattr(instance, '_auth_state', None) != current:
+        bump_auth_version(instance.id)
+    instance._auth_state = current
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_ws_auth_cache_on_delete(sender, instance, **kwargs):
+    bump_auth_version(instance.id)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_mentor_index_on_status(sender, instance, created, **kwargs):
+    # Matching snapshots only hold available mentors (see users.matching)
+    current = (instance.role, instance.is_available)
+    if not created and getattr(instance, '_match_state', None) != current:
+        invalidate_mentor_index()
+    instance._match_state = current
+
+
+@receiver(post_save, sender=CustomUser)
+def reindex_mentor_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Every write path (registration, admin promotion, profile edits) keeps the postings in step
+    if update_fields is not None and not {'role', *MENTOR_INDEX_FIELDS} & set(update_fields):
+        return
+    current = instance.mentor_index_state()
+    previous = None if created else getattr(instance, '_index_state', None)
+    instance._index_state = current
+    if current == previous:
+        return
+    # Students' profiles aren't indexed; only act when a mentor is (or was) involved
+    was_mentor = previous is not None and previous[0] == 'MENTOR'
+    if instance.role == 'MENTOR' or was_mentor:
+        index_mentor(instance)
+
+
+def _move_rating_totals(mentor_id, count, total):
+    # A decrement that would go below zero means the totals already drifted;
+    # it is skipped and left for reconcile_mentor_ratings.
+    rows = CustomUser.objects.filter(pk=mentor_id)
+    if count < 0:
+        rows = rows.filter(rating_count__gte=-count)
+    if total < 0:
+        rows = rows.filter(rating_sum__gte=-total)
+    rows.update(rating_count=F('rating_count') + count, rating_sum=F('rating_sum') + total)
+
+
+@receiver(post_save, sender=MentorFeedback)
+def add_rating_to_totals(sender, instance, created, update_fields=None, **kwargs):
+    # Every save path (submit, admin, shell) moves the totals by what changed
+    if update_fields is not None and not {'mentor', 'rating'} & set(update_fields):
+        return
+    current = (instance.mentor_id, instance.rating)
+    previous = None if created else getattr(instance, '_counted', None)
+    if not created and previous is None:
+        # Saved without being loaded first, so the stored rating is unknown
+        return
+    instance._counted = current
+    if previous is None:
+        _move_rating_totals(instance.mentor_id, 1, instance.rating)
+    elif previous[0] == current[0]:
+        if current[1] != previous[1]:
+            _move_rating_totals(instance.mentor_id, 0, current[1] - previous[1])
+    else:
+        _move_rating_totals(previous[0], -1, -previous[1])
+        _move_rating_totals(current[0], 1, current[1])
+
+
+@receiver(post_delete, sender=MentorFeedback)
+def remove_rating_from_totals(sender, instance, **kwargs):
+    # Also runs for cascades; a mentor deleted in the same cascade just matches no row
+    mentor_id, rating = getattr(instance, '_counted', None) or (instance.mentor_id, instance.rating)
+    _move_rating_totals(mentor_id, -1, -rating)
@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import LoginView, RegisterView, RequestPasswordResetView, VerifyOTPView, ConfirmPasswordResetView, ProfileView, MentorListView, ConnectionRequestView,MentorDashboardView, AdminGlobalStatsView, AdminUserManagementView, ExportAuditLogView, SystemHealthView, StudentRequestHistoryView, StudentNotificationView, MentorNotificationView, NotificationView, ThreadListView, MessageView, CompleteOnboardingView, MarkCelebratedView, MentorTaskListCreateView, MentorTaskUpdateStatusView
+from .views import LoginView, RegisterView, RequestPasswordResetView, VerifyOTPView, ConfirmPasswordResetView, ProfileView, MentorListView, MentorMatchView, MentorFeedbackView, ConnectionRequestView,MentorDashboardView, AdminGlobalStatsView, AdminUserManagementView, ExportAuditLogView, SystemHealthView, StudentRequestHistoryView, StudentNotificationView, MentorNotificationView, NotificationView, ThreadListView, MessageView, CompleteOnboardingView, MarkCelebratedView, MentorTaskListCreateView, MentorTaskUpdateStatusView
 
 urlpatterns = [
     
@@ -12,6 +12,8 @@ urlpatterns = [
     path('password-reset/confirm/', ConfirmPasswordResetView.as_view(), name='password-reset-confirm'),
     path('profile/', ProfileView.as_view(), name='user-profile'),
     path('mentors/', MentorListView.as_view(), name='mentor-list'),
+    path('mentors/matches/', MentorMatchView.as_view(), name='mentor-matches'),
+    path('mentors/<uuid:mentor_id>/feedback/', MentorFeedbackView.as_view(), name='mentor-feedback'),
     path('connect/', ConnectionRequestView.as_view(), name='mentor-connect'),
     path('mentor-dashboard/', MentorDashboardView.as_view(), name='mentor-dashboard'),
     path('mentor-dashboard/<uuid:pk>/', MentorDashboardView.as_view(), name='mentor-action'),
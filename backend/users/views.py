@@ -11,20 +11,27 @@ from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
 from django.db import connection
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Avg, F, Q, OuterRef, Subquery, UUIDField, FloatField, Value, Case, When
 from django.shortcuts import get_object_or_404
 
-from rest_framework import generics, permissions, status
+from rest_framework import generics, permissions, status, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .serializers import UserSerializer, MentorPublicSerializer, ThreadSerializer, MessageSerializer, MentorTaskSerializer, NotificationSerializer
-from .models import CustomUser, PasswordResetOTP, MentorshipConnection, Notification, Thread, MentorTask
+from .serializers import UserSerializer, MentorPublicSerializer, MentorMatchSerializer, MentorFeedbackSerializer, ThreadSerializer, MessageSerializer, MentorTaskSerializer, NotificationSerializer
+from .models import CustomUser, PasswordResetOTP, MentorshipConnection, Notification, Thread, Message, MentorTask, MentorFeedback
 from assessments.models import UserProgress
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from assessments.mentor_cache import mentor_cache
+from assessments.prompting import prompt_metrics
+from .realtime import push_to_user
+from .activity import activity_buffer
+from .presence import presence
+from .chatlog import chat_writer, flush_before_read, write_behind_enabled
+from .matching import DEFAULT_TOP_K, MAX_TOP_K, rank_mentors
+from .pagination import MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE, MentorCursorPagination, TiebreakOrderingFilter, encode_cursor, decode_cursor, before, after
 
 
 User = get_user_model()
@@ -108,6 +115,7 @@ class ProfileView(APIView):
                 
                 setattr(user, field, val)
         
+        # Saving reindexes a mentor's matching postings (see users.signals)
         user.save()
         
         # VERY IMPORTANT: Return the data in the response to confirm save
@@ -182,22 +190,113 @@ class ConfirmPasswordResetView(APIView):
 # --- MENTORSHIP & DISCOVERY ---
 
 class MentorListView(generics.ListAPIView):
+    """
+    Mentor directory. ?search= matches name, expertise, company, job title
+    and skills; ?min_experience=, ?max_experience=, ?min_rating= and
+    ?available= (true by default, false or all) filter; ?ordering= takes
+    years_of_experience, rating or username (prefix - to reverse).
+    Keyset pages via ?cursor= (see MentorCursorPagination).
+    """
     serializer_class = MentorPublicSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MentorCursorPagination
+    filter_backends = [filters.SearchFilter, TiebreakOrderingFilter]
+    search_fields = ['username', 'full_name', 'expertise', 'company', 'job_title', 'skills']
+    ordering_fields = ['years_of_experience', 'rating', 'username']
+    ordering = MentorCursorPagination.ordering
 
     def get_queryset(self):
         user = self.request.user
-        # 1. Get IDs of mentors who have blocked this student
+        params = self.request.query_params
+
+        # 1. Mentors who have blocked this student never show up
         blocked_mentor_ids = MentorshipConnection.objects.filter(
             student=user, 
             status='BLOCKED'
-        ).values_list('mentor_id', flat=True)
-        
-        # 2. Return mentors who are available AND haven't blocked this user
-        return CustomUser.objects.filter(
-            role='MENTOR', 
-            is_available=True
-        ).exclude(id__in=blocked_mentor_ids)
+        ).values('mentor_id')
+        queryset = CustomUser.objects.filter(role='MENTOR').exclude(id__in=blocked_mentor_ids)
+
+        # 2. Availability: only open mentors unless asked otherwise
+        available = params.get('available', 'true').lower()
+        if available != 'all':
+            queryset = queryset.filter(is_available=(available != 'false'))
+
+        # 3. Rating is derived from the row's own running totals (no join),
+        # so it can be filtered and ordered on like any column
+        queryset = queryset.annotate(
+            rating=Case(
+                When(rating_count=0, then=Value(0.0)),
+                default=F('rating_sum') * 1.0 / F('rating_count'),
+                output_field=FloatField(),
+            )
+        )
+
+        try:
+            if 'min_experience' in params:
+                queryset = queryset.filter(years_of_experience__gte=int(params['min_experience']))
+            if 'max_experience' in params:
+                queryset = queryset.filter(years_of_experience__lte=int(params['max_experience']))
+            if 'min_rating' in params:
+                queryset = queryset.filter(rating__gte=float(params['min_rating']))
+        except ValueError:
+            raise ValidationError({"error": "min_experience, max_experience and min_rating must be numbers."})
+        return queryset
+
+
+class MentorFeedbackView(APIView):
+    """
+    GET: a mentor's rating summary and latest reviews.
+    POST: the requesting student rates the mentor (1-5); rating again replaces their earlier rating.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, mentor_id):
+        mentor = get_object_or_404(CustomUser, id=mentor_id, role='MENTOR')
+        latest = MentorFeedback.objects.filter(mentor=mentor).select_related('student').order_by('-updated_at')[:20]
+        return Response({
+            "rating": mentor.average_rating,
+            "rating_count": mentor.rating_count,
+            "feedback": MentorFeedbackSerializer(latest, many=True).data,
+        })
+
+    def post(self, request, mentor_id):
+        mentor = get_object_or_404(CustomUser, id=mentor_id, role='MENTOR')
+
+        # Only students who actually worked with this mentor can rate them
+        is_mentee = request.user.mentor_id == mentor.id or MentorshipConnection.objects.filter(
+            student=request.user, mentor=mentor, status='ACCEPTED'
+        ).exists()
+        if not is_mentee:
+            return Response({"error": "You can only rate your own mentors."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = MentorFeedbackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        feedback, created = MentorFeedback.submit(
+            request.user, mentor, serializer.validated_data['rating'], serializer.validated_data.get('comment', '')
+        )
+
+        mentor.refresh_from_db(fields=['rating_count', 'rating_sum'])
+        return Response({
+            "feedback": MentorFeedbackSerializer(feedback).data,
+            "rating": mentor.average_rating,
+            "rating_count": mentor.rating_count,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class MentorMatchView(APIView):
+    """Mentors ranked for the requesting student (see users.matching), ?k= up to 50."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            k = min(max(int(request.query_params.get('k', DEFAULT_TOP_K)), 1), MAX_TOP_K)
+        except ValueError:
+            return Response({"error": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response([
+            {**MentorMatchSerializer(mentor).data, "score": score, "matched_on": tokens}
+            for mentor, score, tokens in rank_mentors(request.user, k)
+        ])
 
 
 class MentorDashboardView(APIView):
@@ -505,6 +604,11 @@ class SystemHealthView(APIView):
             "uptime": str(timedelta(seconds=uptime_seconds)),
             "memory_usage": f"{psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024:.2f} MB"
         }
+        # Coalesced last_activity writes for this worker
+        health_stats["activity_buffer"] = activity_buffer.get_stats()
+        # AI mentor answer cache for this worker
+        health_stats["mentor_cache"] = mentor_cache.get_stats()
+        health_stats["mentor_prompts"] = prompt_metrics.get_stats()
         return Response(health_stats)
     
     
@@ -573,10 +677,29 @@ class ThreadListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        threads = Thread.objects.filter(
-            Q(student=request.user) | Q(mentor=request.user)
-        ).order_by('-updated_at')
-        serializer = ThreadSerializer(threads, many=True, context={'request': request})
+        user = request.user
+        last_msg = Message.objects.filter(thread=OuterRef('pk')).order_by('-created_at', '-id')
+
+        # One query: participants joined, unread count and last message annotated
+        threads = list(Thread.objects.filter(
+            Q(student=user) | Q(mentor=user)
+        ).select_related('student', 'mentor').annotate(
+            # Unread = from the other side and past this user's read mark
+            unread=Count('messages', filter=~Q(messages__sender=user) & (
+                Q(student=user, messages__id__gt=F('student_last_read_id'))
+                | Q(mentor=user, messages__id__gt=F('mentor_last_read_id'))
+            )),
+            last_msg_id=Subquery(last_msg.values('id')[:1]),
+            last_msg_content=Subquery(last_msg.values('content')[:1]),
+            last_msg_created_at=Subquery(last_msg.values('created_at')[:1]),
+            last_msg_sender_id=Subquery(last_msg.values('sender_id')[:1], output_field=UUIDField()),
+        ).order_by('-updated_at'))
+
+        # Online status for every counterpart in one presence-store read
+        other_ids = [t.mentor_id if t.student_id == user.id else t.student_id for t in threads]
+        context = {'request': request, 'presence': presence.status_many(other_ids)}
+
+        serializer = ThreadSerializer(threads, many=True, context=context)
         return Response(serializer.data)
 
 
@@ -590,16 +713,51 @@ class MessageView(APIView):
         thread = get_object_or_404(Thread, id=thread_id)
         
         # Security Guard: Ensure user belongs to this thread
-        if request.user != thread.student and request.user != thread.mentor:
+        if request.user.id not in (thread.student_id, thread.mentor_id):
             return Response({"error": "Unauthorized"}, status=403)
-            
-        messages = thread.messages.all().order_by('created_at')
-        
-        # Pro-Level: Mark unread messages as read when opened
-        thread.messages.filter(~Q(sender=request.user), is_read=False).update(is_read=True)
-        
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+
+        # 1. Parse paging params: ?before=<cursor> pages back, ?since=<cursor> catches up
+        try:
+            page_size = min(int(request.query_params.get('page_size', MESSAGE_PAGE_SIZE)), MAX_MESSAGE_PAGE_SIZE)
+            before_cursor = request.query_params.get('before')
+            since_cursor = request.query_params.get('since')
+            before_key = decode_cursor(before_cursor) if before_cursor else None
+            since_key = decode_cursor(since_cursor) if since_cursor else None
+        except ValueError:
+            return Response({"error": "Invalid cursor or page_size."}, status=400)
+        if page_size < 1:
+            return Response({"error": "Invalid cursor or page_size."}, status=400)
+
+        # 2. Keyset slice on (created_at, id) - one index range scan however long the thread is.
+        # The page moves the read mark and the since-cursor, so queued rows must be stored first
+        flush_before_read()
+        messages = thread.messages.select_related('sender')
+        if since_key:
+            page = list(messages.filter(after(since_key)).order_by('created_at', 'id')[:page_size + 1])
+            has_more = len(page) > page_size
+            page = page[:page_size]
+        else:
+            if before_key:
+                messages = messages.filter(before(before_key))
+            page = list(messages.order_by('-created_at', '-id')[:page_size + 1])
+            has_more = len(page) > page_size
+            page = page[:page_size][::-1]
+
+        # Pro-Level: Mark unread messages as read when opened (older pages were already seen)
+        if page and not before_key:
+            thread.advance_read_mark(request.user.id, max(m.id for m in page))
+
+        # 3. The body stays a plain ascending list; cursors travel in headers
+        response = Response(MessageSerializer(page, many=True, context={'thread': thread}).data)
+        if page:
+            response['X-Since-Cursor'] = encode_cursor(page[-1])
+        elif since_cursor:
+            response['X-Since-Cursor'] = since_cursor
+        if since_key:
+            response['X-Has-More'] = 'true' if has_more else 'false'
+        elif has_more:
+            response['X-Before-Cursor'] = encode_cursor(page[0])
+        return response
 
     def post(self, request, thread_id):
         thread = get_object_or_404(Thread, id=thread_id)
@@ -616,8 +774,14 @@ class MessageView(APIView):
 
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(sender=request.user, thread=thread)
-            thread.save() 
+            if write_behind_enabled():
+                # Same queue as socket messages, flushed before answering: this row
+                # never lands ahead of a lower id still waiting in this worker
+                message = chat_writer.submit(thread.id, request.user, serializer.validated_data['content'])
+                chat_writer.flush()
+                return Response(MessageSerializer(message, context={'thread': thread}).data, status=201)
+            message = serializer.save(sender=request.user, thread=thread)
+            Thread.objects.filter(id=thread.id).update(updated_at=message.created_at)
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
     
@@ -668,16 +832,11 @@ class MentorTaskListCreateView(APIView):
             )
         
             # 3. TRIGGER REAL-TIME NOTIFICATION via WebSocket
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "presence_tracking",
-                {
-                    "type": "task_notification",
-                    "recipient_id": str(task.student.id),
-                    "message": f"New task assigned: {task.title}",
-                    "mentor_name": request.user.username
-                }
-            )
+            push_to_user(task.student_id, {
+                "type": "task_notification",
+                "message": f"New task assigned: {task.title}",
+                "mentor_name": request.user.username
+            })
         
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -709,20 +868,15 @@ class MentorTaskUpdateStatusView(APIView):
             notif_message = f"Task '{task.title}' was {new_status.lower()}!"
             
             if new_status == 'APPROVED':
-                task.student.add_xp(task.xp_reward)
+                task.student.add_xp(task.xp_reward, 'task', task.id)
 
         task.save()
 
         # Trigger the Bell Notification via WebSocket
         if recipient:
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "presence_tracking",
-                {
-                    "type": "bell_notification",
-                    "recipient_id": str(recipient.id),
-                    "message": notif_message,
-                }
-            )
+            push_to_user(recipient.id, {
+                "type": "bell_notification",
+                "message": notif_message,
+            })
 
         return Response(MentorTaskSerializer(task).data)
\ No newline at end of file
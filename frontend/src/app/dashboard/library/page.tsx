@@ -16,17 +16,19 @@ export default function LearningLibrary() {
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState("");
 
+  // pathId switches to another of the ranked path matches; null = the user's own path
+  const fetchLibrary = async (pathId: number | null = null) => {
+    try {
+      const res = await api.get("assessments/library/", { params: pathId ? { path: pathId } : {} });
+      setData(res.data);
+    } catch (err) {
+      toast.error("Failed to load library resources");
+    } finally {
+      setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    const fetchLibrary = async () => {
-      try {
-        const res = await api.get("assessments/library/");
-        setData(res.data);
-      } catch (err) {
-        toast.error("Failed to load library resources");
-      } finally {
-        setLoading(false);
-      }
-    };
     fetchLibrary();
   }, []);
 
@@ -58,6 +60,24 @@ export default function LearningLibrary() {
             </p>
           </motion.div>
 
+          {data?.path_matches?.length > 1 && (
+            <div className="flex flex-wrap gap-2">
+              {data.path_matches.map((match: any) => (
+                <button
+                  key={match.id}
+                  onClick={() => fetchLibrary(match.id)}
+                  className={`px-4 py-2 rounded-full text-xs font-black uppercase tracking-widest transition-colors ${
+                    match.id === data.path_id
+                      ? 'bg-indigo-600 text-white'
+                      : 'bg-white dark:bg-slate-800 text-gray-400 hover:text-indigo-600 border border-gray-100 dark:border-slate-700'
+                  }`}
+                >
+                  {match.title} · {Math.round(match.similarity * 100)}%
+                </button>
+              ))}
+            </div>
+          )}
+
           <div className="relative w-full md:w-96">
             <Search className="absolute left-5 top-1/2 -translate-y-1/2 text-gray-400" size={20} />
             <input 
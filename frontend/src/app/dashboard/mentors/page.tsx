@@ -15,6 +15,8 @@ export default function FindMentors() {
   const router = useRouter();
   const { user } = useAuth();
   const [mentors, setMentors] = useState<any[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null); // Cursor URL of the next directory page
+  const [matches, setMatches] = useState<any[]>([]); // Ranked by users/mentors/matches/
   const [myRequests, setMyRequests] = useState<any[]>([]); // NEW: History state
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState("");
@@ -26,12 +28,12 @@ export default function FindMentors() {
   const fetchData = async () => {
     try {
       // Fetch both mentors and the student's own request history
-      const [mentorRes, historyRes] = await Promise.all([
-        api.get("users/mentors/"),
-        api.get("users/student-requests/") // Matches the URL defined above
+      const [historyRes, matchRes] = await Promise.all([
+        api.get("users/student-requests/"), // Matches the URL defined above
+        api.get("users/mentors/matches/", { params: { k: 3 } })
       ]);
-      setMentors(mentorRes.data);
       setMyRequests(historyRes.data);
+      setMatches(matchRes.data);
     } catch (err) {
       toast.error("Failed to sync mentorship data.");
     } finally {
@@ -39,10 +41,28 @@ export default function FindMentors() {
     }
   };
 
+  // The directory is searched and paged server-side; a new search starts from page one
+  const fetchMentors = async (cursorUrl: string | null = null) => {
+    try {
+      const res = cursorUrl
+        ? await api.get(cursorUrl)
+        : await api.get("users/mentors/", { params: searchTerm ? { search: searchTerm } : {} });
+      setMentors(prev => cursorUrl ? [...prev, ...res.data.results] : res.data.results);
+      setNextPage(res.data.next);
+    } catch (err) {
+      toast.error("Failed to load mentors.");
+    }
+  };
+
   useEffect(() => {
     fetchData();
   }, []);
 
+  useEffect(() => {
+    const timer = setTimeout(() => fetchMentors(), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
   const handleSendRequest = async () => {
     if (!selectedMentor) return;
     
@@ -141,13 +161,43 @@ export default function FindMentors() {
         </div>
       </section>
 
+      {/* Best Matches */}
+      {matches.length > 0 && (
+        <section className="max-w-7xl mx-auto mb-16">
+          <h2 className="text-2xl font-black text-[#1F2937] dark:text-white mb-6">Best matches for you</h2>
+          <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
+            {matches.map((mentor) => (
+              <motion.div
+                key={mentor.id}
+                initial={{ opacity: 0, y: 10 }}
+                animate={{ opacity: 1, y: 0 }}
+                className="bg-white dark:bg-[#1E293B] p-6 rounded-[2rem] border-2 border-[#10B981]/30 shadow-sm"
+              >
+                <h3 className="text-lg font-black text-[#1F2937] dark:text-white">{mentor.full_name || mentor.username}</h3>
+                <p className="text-sm text-gray-500 dark:text-gray-400 font-bold mb-4">{mentor.job_title || "Professional"}</p>
+                <div className="flex flex-wrap gap-2 mb-6">
+                  {mentor.matched_on.map((token: string) => (
+                    <span key={token} className="text-[10px] font-black uppercase tracking-widest bg-emerald-50 dark:bg-emerald-900/20 text-[#10B981] px-3 py-1 rounded-full">
+                      {token}
+                    </span>
+                  ))}
+                </div>
+                <button
+                  onClick={() => setSelectedMentor(mentor)}
+                  className="w-full py-3 bg-[#10B981] text-white rounded-xl font-black flex items-center justify-center gap-2 hover:bg-[#3730A3] transition-all"
+                >
+                  Send Request <ChevronRight size={18} />
+                </button>
+              </motion.div>
+            ))}
+          </div>
+        </section>
+      )}
+
       {/* Mentor Grid */}
       <div className="max-w-7xl mx-auto grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8">
         <AnimatePresence>
-          {mentors.filter(m => 
-            m.username.toLowerCase().includes(searchTerm.toLowerCase()) || 
-            m.expertise?.toLowerCase().includes(searchTerm.toLowerCase())
-          ).map((mentor) => (
+          {mentors.map((mentor) => (
             <motion.div
               key={mentor.id}
               initial={{ opacity: 0, y: 20 }}
@@ -187,7 +237,7 @@ export default function FindMentors() {
                 
                 <div className="flex items-center gap-3 text-gray-500 dark:text-gray-400 font-medium">
                   <Star size={18} className="text-yellow-400" />
-                  <span>{mentor.average_rating > 0 ? `${mentor.average_rating} Rating` : "New Mentor"}</span>
+                  <span>{mentor.rating > 0 ? `${mentor.rating} Rating (${mentor.rating_count})` : "New Mentor"}</span>
                 </div>
               </div>
 
@@ -202,6 +252,17 @@ export default function FindMentors() {
         </AnimatePresence>
       </div>
 
+      {nextPage && (
+        <div className="max-w-7xl mx-auto mt-12 flex justify-center">
+          <button
+            onClick={() => fetchMentors(nextPage)}
+            className="px-10 py-4 bg-white dark:bg-[#1E293B] text-[#3730A3] dark:text-indigo-400 rounded-2xl font-black border border-gray-100 dark:border-slate-800 shadow-sm hover:shadow-lg transition-all"
+          >
+            Load more mentors
+          </button>
+        </div>
+      )}
+
       {/* Connection Request Modal */}
       <AnimatePresence>
         {selectedMentor && (
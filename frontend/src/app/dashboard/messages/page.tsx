@@ -6,7 +6,7 @@ import { useAuth } from "@/context/AuthContext";
 import { motion, AnimatePresence } from "framer-motion";
 import { 
   Send, MessageSquare, ArrowLeft, Loader2, CheckCheck, 
-  ChevronLeft, ShieldAlert, ListChecks, Plus, X, Target, Award, Clock 
+  ChevronLeft, ChevronUp, ShieldAlert, ListChecks, Plus, X, Target, Award, Clock 
 } from "lucide-react";
 import { toast } from "sonner";
 import { useRouter } from "next/navigation";
@@ -21,7 +21,12 @@ export default function InboxPage() {
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
   const [refreshKey, setRefreshKey] = useState(0); 
+  // Keyset cursor for the page before the oldest loaded message (X-Before-Cursor), null when there is none
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const scrollRef = useRef<HTMLDivElement>(null);
+  const keepScrollRef = useRef(false);
+  const openThreadIdRef = useRef<number | null>(null);
   const socketRef = useRef<WebSocket | null>(null);
 
   // --- Task System States ---
@@ -60,11 +65,31 @@ export default function InboxPage() {
     try {
       const res = await api.get(`users/threads/${threadId}/messages/`);
       setMessages(res.data);
+      setOlderCursor(res.headers['x-before-cursor'] ?? null);
     } catch (err) {
       console.error("Message sync error");
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!activeThread || !olderCursor || loadingOlder) return;
+    const threadId = activeThread.id;
+    setLoadingOlder(true);
+    try {
+      const res = await api.get(`users/threads/${threadId}/messages/`, { params: { before: olderCursor } });
+      // The user may have switched threads while this page was in flight
+      if (openThreadIdRef.current !== threadId) return;
+      // Prepending history shouldn't yank the view down to the newest message
+      keepScrollRef.current = true;
+      setMessages(prev => [...res.data, ...prev]);
+      setOlderCursor(res.headers['x-before-cursor'] ?? null);
+    } catch (err) {
+      toast.error("Couldn't load older messages.");
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const fetchTasks = async () => {
     if (!activeThread) return;
     try {
@@ -99,15 +124,12 @@ export default function InboxPage() {
         if (data.message) {
             setMessages((prev) => [...prev, data.message]);
             fetchThreads();
-            // If the message is from someone else while we are active, mark it read
-            if (data.message.sender_username !== user.username) {
-                socketRef.current?.send(JSON.stringify({ type: 'read_messages' }));
-            }
+            // Incoming messages are marked read server-side while this socket is open
         }
         
-        // Handle Read Receipt Signal (The Blue Ticks)
+        // Handle Read Receipt Signal (The Blue Ticks): everything up to last_read_id was seen
         if (data.type === 'MESSAGES_READ') {
-            setMessages(prev => prev.map(m => ({ ...m, is_read: true })));
+            setMessages(prev => prev.map(m => (m.id <= data.last_read_id ? { ...m, is_read: true } : m)));
         }
       };
 
@@ -120,13 +142,19 @@ export default function InboxPage() {
   }, [activeThread?.id]);
 
   useEffect(() => {
+    openThreadIdRef.current = activeThread?.id ?? null;
     if (activeThread) {
+      setOlderCursor(null);
       fetchMessages(activeThread.id);
       fetchTasks();
     }
   }, [activeThread?.id]);
 
   useEffect(() => {
+    if (keepScrollRef.current) {
+      keepScrollRef.current = false;
+      return;
+    }
     scrollRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
@@ -276,6 +304,17 @@ export default function InboxPage() {
               </header>
 
               <div className="flex-1 overflow-y-auto p-6 space-y-6 custom-scrollbar">
+                {olderCursor && (
+                  <div className="flex justify-center">
+                    <button
+                      onClick={loadOlderMessages}
+                      disabled={loadingOlder}
+                      className="flex items-center gap-2 px-4 py-2 rounded-2xl font-bold text-xs bg-indigo-50 text-indigo-600 dark:bg-slate-800 hover:bg-indigo-100 dark:hover:bg-slate-700 transition-all disabled:opacity-50"
+                    >
+                      {loadingOlder ? <Loader2 className="animate-spin" size={14} /> : <ChevronUp size={14} />} Load older messages
+                    </button>
+                  </div>
+                )}
                 {messages.map((m) => {
                   const isMe = m.sender_username === user?.username;
                   return (
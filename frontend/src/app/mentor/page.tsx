@@ -12,22 +12,30 @@ import { useRouter } from "next/navigation";
 
 export default function MentorDiscovery() {
   const [mentors, setMentors] = useState<any[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null); // Cursor URL of the next directory page
   const [searchTerm, setSearchTerm] = useState("");
   const [selectedMentor, setSelectedMentor] = useState<any>(null);
   const [connectMessage, setConnectMessage] = useState("");
   const [isSending, setIsSending] = useState(false);
   const router = useRouter();
 
-  const fetchMentors = async () => {
+  // The directory is searched and paged server-side; a new search starts from page one
+  const fetchMentors = async (cursorUrl: string | null = null) => {
     try {
-      const res = await api.get("users/mentors/");
-      setMentors(res.data);
+      const res = cursorUrl
+        ? await api.get(cursorUrl)
+        : await api.get("users/mentors/", { params: searchTerm ? { search: searchTerm } : {} });
+      setMentors(prev => cursorUrl ? [...prev, ...res.data.results] : res.data.results);
+      setNextPage(res.data.next);
     } catch (err) {
       toast.error("Failed to load mentors.");
     }
   };
 
-  useEffect(() => { fetchMentors(); }, []);
+  useEffect(() => {
+    const timer = setTimeout(() => fetchMentors(), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
   const handleConnect = async () => {
     if (!selectedMentor) return;
@@ -47,12 +55,6 @@ export default function MentorDiscovery() {
     }
   };
 
-  const filteredMentors = mentors.filter(m => 
-    m.username.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    m.job_title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    m.skills?.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
   return (
     <div className="min-h-screen bg-[#F8FAFC] p-8 lg:p-12 relative overflow-hidden">
       {/* Background Decorative Element */}
@@ -82,7 +84,7 @@ export default function MentorDiscovery() {
 
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-8">
           <AnimatePresence mode="popLayout">
-            {filteredMentors.map((mentor) => (
+            {mentors.map((mentor) => (
               <motion.div
                 layout
                 key={mentor.id}
@@ -129,6 +131,17 @@ export default function MentorDiscovery() {
             ))}
           </AnimatePresence>
         </div>
+
+        {nextPage && (
+          <div className="mt-12 flex justify-center">
+            <button
+              onClick={() => fetchMentors(nextPage)}
+              className="px-10 py-4 bg-white text-[#3730A3] rounded-2xl font-black border border-gray-100 shadow-sm hover:shadow-lg transition-all"
+            >
+              Load more mentors
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Connection Modal */}